@@ -0,0 +1,383 @@
+"""Бенчмарки генератора паролей
+
+Запуск:
+    python benchmark.py                 # счётчики от 1 до 10^7
+    python benchmark.py --max-count 100000
+    python benchmark.py workers --number 10000000
+    python benchmark.py startup --max-import-ms 20
+    python benchmark.py suite --json results.json
+    python benchmark.py suite --quick --compare baseline.json --max-regression 0.2
+    python benchmark.py suite --quick --max-entropy-us 5
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import password_generator
+from password_generator import DEFAULT_COMPLEXITY_LEVELS, PasswordGenerator, PasswordPolicy
+
+SUITE_LENGTHS = (8, 16, 32)
+SUITE_BATCH_SIZES = (1, 1000, 100000)
+SUITE_CLI_NUMBERS = (1000, 100000, 1000000)
+SUITE_CALLS = 2000
+SUITE_REPEAT = 5
+# Порог пакетной оценки энтропии случайных паролей без кэша, мкс на пароль
+ENTROPY_BUDGET_LENGTH = 12
+ENTROPY_BUDGET_US = 5.0
+
+
+def _measure(func):
+    """Время выполнения func() в секундах"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_batch(max_count, loop_limit, length, complexity):
+    """Сравнение generate_batch с циклом вызовов generate_password"""
+    generator = PasswordGenerator()
+    print(f"Длина: {length}, сложность: {complexity}")
+    print(f"{'count':>10} {'цикл, пар/с':>16} {'пакет, пар/с':>16} {'ускорение':>10}")
+    print("-" * 56)
+
+    count = 1
+    while count <= max_count:
+        batch_time = _measure(lambda: generator.generate_batch(count, length, complexity))
+        batch_rate = count / batch_time
+
+        if count <= loop_limit:
+            loop_time = _measure(lambda: [generator.generate_password(length, complexity)
+                                          for _ in range(count)])
+            loop_rate = count / loop_time
+            print(f"{count:>10} {loop_rate:>16,.0f} {batch_rate:>16,.0f} {batch_rate / loop_rate:>9.1f}x")
+        else:
+            print(f"{count:>10} {'—':>16} {batch_rate:>16,.0f} {'—':>10}")
+        count *= 10
+
+
+def bench_workers(number, length, complexity, workers_list):
+    """Масштабирование потоковой генерации по числу процессов"""
+    generator = PasswordGenerator()
+    print(f"Паролей: {number}, длина: {length}, сложность: {complexity}, ядер: {os.cpu_count()}")
+    print(f"{'workers':>8} {'время, с':>10} {'пар/с':>14} {'ускорение':>10}")
+    print("-" * 46)
+
+    base_time = None
+    with open(os.devnull, 'w') as out:
+        for workers in workers_list:
+            elapsed = _measure(lambda: generator.stream_passwords(
+                out, number, length, complexity, workers=workers))
+            base_time = base_time or elapsed
+            print(f"{workers:>8} {elapsed:>10.2f} {number / elapsed:>14,.0f} {base_time / elapsed:>9.2f}x")
+
+
+def _import_time_us(module):
+    """Накопленное время импорта модуля по данным python -X importtime, мкс"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise RuntimeError(f"Модуль {module} не найден в выводе -X importtime")
+
+
+def bench_startup(runs, max_import_ms):
+    """Время импорта модуля и запуска CLI; ненулевой код при регрессии"""
+    import_ms = min(_import_time_us('password_generator') for _ in range(runs)) / 1000
+    print(f"Импорт password_generator: {import_ms:.1f} мс (лучший из {runs})")
+
+    commands = [
+        ('python -c pass', ['-c', 'pass']),
+        ('pypassgen.py -q', ['pypassgen.py', '-q']),
+        ('password_generator.py -q', ['password_generator.py', '-q']),
+        ('password_generator.py -n 1', ['password_generator.py', '-n', '1']),
+    ]
+    for name, command in commands:
+        best = min(_measure(lambda: subprocess.run([sys.executable] + command, check=True,
+                                                   stdout=subprocess.DEVNULL))
+                   for _ in range(runs))
+        print(f"{name:28} {best * 1000:>8.1f} мс")
+
+    if max_import_ms is not None and import_ms > max_import_ms:
+        print(f"❌ Импорт дольше порога {max_import_ms} мс")
+        sys.exit(1)
+
+
+class CountingEntropy:
+    """Источник энтропии, считающий выданные байты"""
+    
+    def __init__(self, source):
+        self.source = source
+        self.bytes_read = 0
+    
+    def read(self, n):
+        self.bytes_read += n
+        return self.source.read(n)
+    
+    def fork(self, key):
+        return self.source.fork(key)
+
+
+def _case(results, name, params, count, func, entropy=None, repeat=SUITE_REPEAT):
+    """Замер сценария: лучшее время из repeat, затем отдельный прогон под tracemalloc
+    
+    count — число паролей (или оценок) за один вызов func. С entropy
+    в результат добавляется число байтов энтропии на пароль. Предупреждения
+    о короткой длине уходят в /dev/null, но их стоимость входит в замер.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        seconds = min(_measure(func) for _ in range(repeat))
+        result = {'name': name, 'params': params, 'count': count,
+                  'seconds': seconds, 'per_sec': count / seconds}
+        
+        if entropy is not None:
+            entropy.bytes_read = 0
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_kib'] = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    if entropy is not None:
+        result['entropy_bytes'] = entropy.bytes_read / count
+    
+    results.append(result)
+    extra = f" {result['entropy_bytes']:>7.1f} Б энтр." if entropy is not None else ''
+    params_text = ' '.join(f'{key}={value}' for key, value in params.items())
+    print(f"{name:26} {params_text:40} {result['per_sec']:>14,.0f}/с "
+          f"{result['peak_kib']:>10,.0f} КиБ{extra}")
+
+
+# Пиковая память процесса CLI: VmHWM из /proc считается с момента exec,
+# тогда как ru_maxrss дочернего процесса включает память, унаследованную
+# при fork от процесса бенчмарка
+_PEAK_RSS_WRAPPER = """
+import atexit, runpy, sys
+def report():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                sys.stderr.write('VmHWM ' + line.split()[1] + '\\n')
+atexit.register(report)
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+
+def _cli_peak_kib(command):
+    """Пиковый RSS процесса CLI в КиБ или None без /proc"""
+    if not os.path.exists('/proc/self/status'):
+        return None
+    result = subprocess.run([sys.executable, '-c', _PEAK_RSS_WRAPPER, 'password_generator.py'] + command,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    for line in reversed(result.stderr.splitlines()):
+        if line.startswith('VmHWM '):
+            return int(line.split()[1])
+    return None
+
+
+def _cli_case(results, name, command, count, repeat):
+    """Время CLI от запуска до выхода (лучшее из repeat) и пиковая память"""
+    best = min(_measure(lambda: subprocess.run([sys.executable, 'password_generator.py'] + command,
+                                               stdout=subprocess.DEVNULL, check=True))
+               for _ in range(repeat))
+    peak = _cli_peak_kib(command)
+    
+    result = {'name': name, 'params': {'command': ' '.join(command)}, 'count': count,
+              'seconds': best, 'per_sec': count / best, 'peak_kib': peak}
+    results.append(result)
+    peak_text = f"{peak:>10,.0f} КиБ" if peak is not None else ''
+    print(f"{name:26} {result['params']['command']:40} {best * 1000:>12,.1f} мс {peak_text}")
+
+
+def bench_suite(quick=False):
+    """Набор замеров генерации, оценки и CLI; возвращает список результатов"""
+    results = []
+    lengths = SUITE_LENGTHS[1:2] if quick else SUITE_LENGTHS
+    batch_sizes = SUITE_BATCH_SIZES[:2] if quick else SUITE_BATCH_SIZES
+    cli_numbers = SUITE_CLI_NUMBERS[:2] if quick else SUITE_CLI_NUMBERS
+    repeat = SUITE_REPEAT
+    levels = DEFAULT_COMPLEXITY_LEVELS.names()
+    
+    entropy = CountingEntropy(password_generator.OSEntropy())
+    generator = PasswordGenerator(entropy)
+    
+    print("Генерация")
+    for complexity in levels:
+        for length in lengths:
+            params = {'complexity': complexity, 'length': length}
+            _case(results, 'generate_password', params, SUITE_CALLS,
+                  lambda: [generator.generate_password(length, complexity) for _ in range(SUITE_CALLS)],
+                  entropy, repeat)
+            for batch in batch_sizes:
+                calls = max(1, SUITE_BATCH_SIZES[-1] // 100 // batch)
+                _case(results, 'generate_batch', dict(params, batch=batch), batch * calls,
+                      lambda: [generator.generate_batch(batch, length, complexity) for _ in range(calls)],
+                      entropy, repeat)
+    
+    policy = PasswordPolicy(1, 1, 1, 1)
+    for length in lengths:
+        _case(results, 'generate_policy_batch', {'complexity': 'very-high', 'length': length, 'batch': 10000},
+              10000, lambda: generator.generate_policy_batch(10000, length, 'very-high', policy),
+              entropy, repeat)
+    
+    print("Оценка")
+    for length in lengths:
+        with contextlib.redirect_stdout(None):
+            passwords = generator.generate_batch(SUITE_CALLS, length, 'very-high')
+            big = generator.generate_batch(SUITE_BATCH_SIZES[-1], length, 'very-high')
+        params = {'length': length}
+        _case(results, 'calculate_strength', params, SUITE_CALLS,
+              lambda: [generator.calculate_strength(p) for p in passwords], repeat=repeat)
+        _case(results, 'calculate_strength_entropy', params, SUITE_CALLS,
+              lambda: [generator.calculate_strength(p, 'entropy') for p in passwords], repeat=repeat)
+        
+        for use_numpy in (False, True):
+            if use_numpy and password_generator._numpy() is None:
+                continue
+            _case(results, 'calculate_strength_batch', dict(params, numpy=use_numpy), len(big),
+                  lambda: generator.calculate_strength_batch(big, use_numpy=use_numpy), repeat=repeat)
+    
+    with contextlib.redirect_stdout(None):
+        big = generator.generate_batch(SUITE_BATCH_SIZES[-1], ENTROPY_BUDGET_LENGTH, 'very-high')
+    for use_numpy in (False, True):
+        if use_numpy and password_generator._numpy() is None:
+            continue
+        _case(results, 'calculate_strength_batch_entropy',
+              {'length': ENTROPY_BUDGET_LENGTH, 'numpy': use_numpy}, len(big),
+              lambda: generator.calculate_strength_batch(big, use_numpy=use_numpy, mode='entropy'),
+              repeat=repeat)
+    
+    print("CLI")
+    for number in cli_numbers:
+        _cli_case(results, 'cli_quiet', ['-q', '-n', str(number), '-l', '16'], number, repeat)
+    _cli_case(results, 'cli_decorated', ['-n', str(cli_numbers[0]), '-l', '16'], cli_numbers[0], repeat)
+    return results
+
+
+def _result_key(result):
+    return result['name'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+
+def _git_commit():
+    """Текущий коммит или None вне репозитория git"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, results, max_regression):
+    """Сравнить скорость с сохраненными результатами; True, если регрессий нет"""
+    old = {_result_key(result): result for result in baseline['results']}
+    print(f"\nСравнение с {baseline['meta'].get('commit') or 'базой'} "
+          f"(порог регрессии {max_regression:.0%})")
+    ok = True
+    for result in results:
+        previous = old.get(_result_key(result))
+        if previous is None:
+            continue
+        ratio = result['per_sec'] / previous['per_sec']
+        regressed = ratio < 1 - max_regression
+        ok = ok and not regressed
+        mark = '❌' if regressed else '  '
+        print(f"{mark} {_result_key(result):70} {ratio:>6.2f}x")
+    return ok
+
+
+def check_entropy_budget(results, max_us):
+    """Сверить пакетную оценку энтропии с NumPy с порогом; True, если он соблюден"""
+    for result in results:
+        if result['name'] == 'calculate_strength_batch_entropy' and result['params']['numpy']:
+            us = 1e6 / result['per_sec']
+            ok = us <= max_us
+            print(f"\n{'  ' if ok else '❌'} Оценка энтропии пакетом: {us:.2f} мкс на пароль "
+                  f"(порог {max_us} мкс)")
+            return ok
+    print("\nNumPy не установлен: порог оценки энтропии не проверяется")
+    return True
+
+
+def run_suite(args):
+    """Сценарий suite: замеры, запись JSON и сравнение с базой"""
+    results = bench_suite(args.quick)
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nРезультаты записаны в {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare_results(baseline, results, args.max_regression):
+            sys.exit(1)
+    if args.max_entropy_us is not None and not check_entropy_budget(results, args.max_entropy_us):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки генератора паролей')
+    parser.add_argument('scenario', nargs='?', default='batch',
+                        choices=['batch', 'workers', 'startup', 'suite'],
+                        help='Сценарий: batch (пакет против цикла), workers (масштабирование по процессам), '
+                             'startup (время запуска), suite (полный набор с JSON-результатами)')
+    parser.add_argument('--max-count', type=int, default=10 ** 7,
+                        help='Максимальный размер пакета (по умолчанию: 10^7)')
+    parser.add_argument('--loop-limit', type=int, default=10 ** 6,
+                        help='Максимальный размер для поштучного цикла (по умолчанию: 10^6)')
+    parser.add_argument('-l', '--length', type=int, default=12,
+                        help='Длина пароля (по умолчанию: 12)')
+    parser.add_argument('-c', '--complexity', type=str, default='very-high',
+                        choices=['low', 'medium', 'high', 'very-high'],
+                        help='Уровень сложности (по умолчанию: very-high)')
+    parser.add_argument('--number', type=int, default=10 ** 7,
+                        help='Число паролей для сценария workers (по умолчанию: 10^7)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Число процессов для сценария workers (по умолчанию: 1 2 4 8)')
+    parser.add_argument('--runs', type=int, default=10,
+                        help='Число повторов для сценария startup (по умолчанию: 10)')
+    parser.add_argument('--max-import-ms', type=float, default=None,
+                        help='Порог времени импорта для сценария startup; превышение дает код 1')
+    parser.add_argument('--json', type=str, default=None,
+                        help='Файл для результатов сценария suite в JSON')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='JSON прошлого прогона suite; при регрессии код выхода 1')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Допустимое падение скорости для --compare (по умолчанию: 0.2)')
+    parser.add_argument('--max-entropy-us', type=float, default=ENTROPY_BUDGET_US,
+                        help='Порог пакетной оценки энтропии с NumPy в мкс на пароль для suite; '
+                             'превышение дает код 1 (по умолчанию: 5)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Сокращенный набор suite: одна длина, малые пакеты и объемы CLI')
+    args = parser.parse_args()
+
+    if args.scenario == 'suite':
+        run_suite(args)
+    elif args.scenario == 'startup':
+        bench_startup(args.runs, args.max_import_ms)
+    elif args.scenario == 'workers':
+        bench_workers(args.number, args.length, args.complexity, args.workers)
+    else:
+        bench_batch(args.max_count, args.loop_limit, args.length, args.complexity)
+
+
+if __name__ == "__main__":
+    main()
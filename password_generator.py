@@ -1,36 +1,2339 @@
-import random
-import string
-import argparse
 import sys
+import os
+import mmap
+import math
+import struct
+import time
+from array import array
 
-class PasswordGenerator:
+# Модули argparse, json, random, secrets, asyncio, collections, urllib и numpy
+# импортируются в местах использования: запуск CLI не платит за то,
+# что ему не нужно. Наборы символов повторяют модуль string, который
+# тянет за собой re.
+ASCII_LOWERCASE = 'abcdefghijklmnopqrstuvwxyz'
+ASCII_UPPERCASE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+ASCII_LETTERS = ASCII_LOWERCASE + ASCII_UPPERCASE
+DIGITS = '0123456789'
+PUNCTUATION = r"""!"#$%&'()*+,-./:;<=>?@[\]^_`{|}~"""
+
+AMBIGUOUS_CHARS = 'O0lI1'
+
+# Биты классов символов в ComplexityLevel.class_mask
+CLASS_LOWER = 1
+CLASS_UPPER = 2
+CLASS_DIGIT = 4
+CLASS_PUNCT = 8
+
+
+def _char_class(c):
+    """Бит класса ASCII-символа (0, если символ вне четырех классов)"""
+    if c in ASCII_LOWERCASE:
+        return CLASS_LOWER
+    if c in ASCII_UPPERCASE:
+        return CLASS_UPPER
+    if c in DIGITS:
+        return CLASS_DIGIT
+    if c in PUNCTUATION:
+        return CLASS_PUNCT
+    return 0
+
+
+# Бит класса для каждого байта: одна таблица bytes.translate вместо
+# четырех проходов any(...) по паролю
+_CLASS_TABLE = bytes(_char_class(chr(b)) if b < 128 else 0 for b in range(256))
+
+_numpy_module = None
+
+
+def _numpy():
+    """NumPy, если установлен; импорт откладывается до первого использования"""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy_module = numpy
+    return _numpy_module or None
+
+
+def _ascii_strength(raw):
+    """Оценка сложности ASCII-пароля в виде bytes за один проход по таблице"""
+    classes = set(raw.translate(_CLASS_TABLE))
+    classes.discard(0)
+    return len(classes) + min(len(raw) // 4, 3)
+
+
+def _strength_numpy(np, passwords):
+    """Оценка сложности списка ASCII-паролей через упакованный буфер NumPy"""
+    count = len(passwords)
+    lengths = np.fromiter(map(len, passwords), dtype=np.int64, count=count)
+    masks = np.zeros(count, dtype=np.uint8)
+    if lengths.any():
+        buf = np.frombuffer(''.join(passwords).encode('ascii'), dtype=np.uint8)
+        bits = np.frombuffer(_CLASS_TABLE, dtype=np.uint8)[buf]
+        starts = np.cumsum(lengths) - lengths
+        nonempty = lengths > 0
+        # Пустые пароли не дают сегментов, поэтому reduceat берем только по непустым
+        masks[nonempty] = np.bitwise_or.reduceat(bits, starts[nonempty])
+    popcount = np.array([bin(m).count('1') for m in range(16)], dtype=np.uint8)
+    scores = popcount[masks] + np.minimum(lengths // 4, 3).astype(np.uint8)
+    return array('B', scores.tobytes())
+
+
+AUDIT_WINDOW_SIZE = 16 * 1024 * 1024
+AUDIT_MIN_STRENGTH = 5
+
+
+def _audit_windows(mm, window_size):
+    """Разбить файл на окна, заканчивающиеся на границе строки"""
+    size = len(mm)
+    start = 0
+    while start < size:
+        end = start + window_size
+        if end >= size:
+            end = size
+        else:
+            newline = mm.rfind(b'\n', start, end)
+            if newline < 0:
+                # Строка длиннее окна: окно продлевается до ее конца
+                newline = mm.find(b'\n', end)
+            end = size if newline < 0 else newline + 1
+        yield start, end
+        start = end
+
+
+def _audit_window(mm, start, end, score_ascii, score_other):
+    """Оценить строки окна [start, end); возвращает пары (смещение, балл)"""
+    offset = start
+    for line in mm[start:end].split(b'\n'):
+        line_offset = offset
+        offset += len(line) + 1
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        if not line:
+            continue
+        if line.isascii():
+            yield line_offset, score_ascii(line)
+        else:
+            yield line_offset, score_other(line.decode('utf-8', 'replace'))
+
+
+def _audit_window_numpy(np, mm, start, end, score_other):
+    """Векторная оценка строк окна прямо по буферу mmap без копирования
+    
+    Возвращает массивы смещений и баллов непустых строк.
+    """
+    arr = np.frombuffer(mm, dtype=np.uint8, count=end - start, offset=start)
+    newlines = np.flatnonzero(arr == 10)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(arr)]))
+    lengths = ends - starts
+    has_cr = np.zeros(len(starts), dtype=bool)
+    nonzero = lengths > 0
+    has_cr[nonzero] = arr[ends[nonzero] - 1] == 13
+    lengths -= has_cr
+    
+    keep = lengths > 0
+    starts = starts[keep]
+    lengths = lengths[keep]
+    if not len(starts):
+        del arr
+        return starts, lengths.astype(np.uint8)
+    
+    # Сегмент reduceat тянется до начала следующей непустой строки; лишние
+    # байты (\r, \n, пустые строки) относятся к классу 0 и не влияют на маску
+    bits = np.frombuffer(_CLASS_TABLE, dtype=np.uint8)[arr]
+    masks = np.bitwise_or.reduceat(bits, starts)
+    high = np.maximum.reduceat(arr, starts) >= 128
+    popcount = np.array([bin(m).count('1') for m in range(16)], dtype=np.uint8)
+    scores = popcount[masks] + np.minimum(lengths // 4, 3).astype(np.uint8)
+    
+    # Строки с не-ASCII байтами оцениваются исходной моделью по символам
+    for i in np.flatnonzero(high):
+        line = bytes(arr[starts[i]:starts[i] + lengths[i]])
+        scores[i] = score_other(line.decode('utf-8', 'replace'))
+    del arr, bits
+    return starts + start, scores
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+PATTERN_DICTIONARIES = ('common_passwords.txt', 'english_words.txt')
+ENTROPY_BITS_PER_POINT = 10
+STRENGTH_MODES = ('classes', 'entropy')
+
+# Обратная замена l33t-символов перед поиском по словарю
+_UNLEET_TABLE = str.maketrans('4@3!10$57', 'aaeiiosst')
+
+# Бит класса для оценки перебора: пробел и управляющие символы, как
+# и в _bruteforce_cardinality, считаются спецсимволами. Сумма различных
+# битов пароля индексирует размер алфавита в _CARDINALITY
+_CARDINALITY_TABLE = bytes((_char_class(chr(b)) or CLASS_PUNCT) if b < 128 else 0 for b in range(256))
+_CARDINALITY = tuple(26 * bool(mask & CLASS_LOWER) + 26 * bool(mask & CLASS_UPPER)
+                     + 10 * bool(mask & CLASS_DIGIT) + 33 * bool(mask & CLASS_PUNCT)
+                     for mask in range(16))
+
+_KEYBOARD_ROWS = (
+    ("`1234567890-=", "~!@#$%^&*()_+", 0.0),
+    ("qwertyuiop[]\\", "QWERTYUIOP{}|", 1.5),
+    ("asdfghjkl;'", 'ASDFGHJKL:"', 1.75),
+    ("zxcvbnm,./", "ZXCVBNM<>?", 2.25),
+)
+
+
+_pattern_index_cache = None
+
+
+def _pattern_index():
+    """Частотный индекс словарей и множество их префиксов
+    
+    Загружается один раз при первой оценке энтропии. Множество префиксов
+    играет роль сжатого префиксного дерева: поиск слов с позиции пароля
+    прекращается, как только текущая подстрока перестает быть префиксом.
+    """
+    global _pattern_index_cache
+    if _pattern_index_cache is not None:
+        return _pattern_index_cache
+    ranks = {}
+    for name in PATTERN_DICTIONARIES:
+        with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+            for rank, word in enumerate(f.read().split(), 1):
+                if rank < ranks.get(word, rank + 1):
+                    ranks[word] = rank
+    # Перевернутые слова индексируются рядом с прямыми с удвоенным рангом,
+    # чтобы один проход по паролю находил оба варианта
+    for word, rank in list(ranks.items()):
+        reversed_word = word[::-1]
+        if 2 * rank < ranks.get(reversed_word, 2 * rank + 1):
+            ranks[reversed_word] = 2 * rank
+    prefixes = frozenset(word[:i] for word in ranks for i in range(1, len(word) + 1))
+    _pattern_index_cache = ranks, prefixes
+    return _pattern_index_cache
+
+
+_keyboard_graph_cache = None
+
+
+def _keyboard_graph():
+    """Соседи каждой клавиши QWERTY (с учетом Shift) и средняя степень графа"""
+    global _keyboard_graph_cache
+    if _keyboard_graph_cache is not None:
+        return _keyboard_graph_cache
+    positions = {}
+    for row, (plain, shifted, shift) in enumerate(_KEYBOARD_ROWS):
+        for col, (c, shifted_c) in enumerate(zip(plain, shifted)):
+            positions[c] = positions[shifted_c] = (row, col + shift)
+    neighbours = {}
+    for c, (row, x) in positions.items():
+        neighbours[c] = frozenset(
+            other for other, (other_row, other_x) in positions.items()
+            if other.lower() != c.lower() and (
+                (other_row == row and abs(other_x - x) == 1)
+                or (abs(other_row - row) == 1 and abs(other_x - x) <= 1)))
+    degree = sum(map(len, neighbours.values())) / len(neighbours) / 2
+    _keyboard_graph_cache = neighbours, len(positions) // 2, degree
+    return _keyboard_graph_cache
+
+
+# Виды шаблонов, которые могут начинаться с тройки символов
+_TRIGRAM_WORD = 1
+_TRIGRAM_REPEAT = 2
+_TRIGRAM_SEQUENCE = 4
+_TRIGRAM_KEYBOARD = 8
+# Тройка — трехсимвольное слово словаря целиком (только в _trigram_bitmap)
+_TRIGRAM_SHORT_WORD = 16
+
+_trigram_index_cache = None
+
+
+def _trigram_index():
+    """Тройки ASCII-символов, с которых начинается шаблон, и виды шаблонов
+    
+    Совпадения _find_matches не короче трех символов, поэтому каждое
+    начинается с тройки из индекса: словарное слово — с прообраза
+    трехсимвольного префикса словаря при lower() и обратной l33t-замене,
+    повтор, последовательность и прогулка по клавиатуре — с тройки своего
+    вида. Пароль без таких троек не содержит шаблонов вовсе.
+    """
+    global _trigram_index_cache
+    if _trigram_index_cache is not None:
+        return _trigram_index_cache
+    ranks, _ = _pattern_index()
+    neighbours, _, _ = _keyboard_graph()
+    ascii_chars = [chr(b) for b in range(128)]
+    index = {}
+    
+    def add(trigrams, kind):
+        for trigram in trigrams:
+            index[trigram] = index.get(trigram, 0) | kind
+    
+    add(_ascii_preimages({word[:3] for word in ranks if len(word) >= 3}), _TRIGRAM_WORD)
+    add((c * 3 for c in ascii_chars), _TRIGRAM_REPEAT)
+    add((chr(b - 1) + chr(b) + chr(b + 1) for b in range(1, 127)), _TRIGRAM_SEQUENCE)
+    add((chr(b + 1) + chr(b) + chr(b - 1) for b in range(1, 127)), _TRIGRAM_SEQUENCE)
+    add((a + b + c for a, after_a in neighbours.items() for b in after_a for c in neighbours[b]),
+        _TRIGRAM_KEYBOARD)
+    _trigram_index_cache = index
+    return index
+
+
+def _ascii_preimages(pieces):
+    """ASCII-строки, совпадающие с одной из pieces после lower() или еще и l33t-замены"""
+    import itertools
+    preimages = {}
+    for b in range(128):
+        c = chr(b)
+        lowered = c.lower()
+        preimages.setdefault((lowered, 1), []).append(c)
+        preimages.setdefault((lowered.translate(_UNLEET_TABLE), 2), []).append(c)
+    for piece in pieces:
+        for factor in (1, 2):
+            yield from map(''.join, itertools.product(*(preimages.get((c, factor), ()) for c in piece)))
+
+
+def _case_variations(word):
+    """Число вариантов регистра слова (как в zxcvbn)"""
+    upper = sum(1 for c in word if c.isupper())
+    if upper == 0:
+        return 1
+    lower = sum(1 for c in word if c.islower())
+    if lower == 0 or (upper == 1 and word[0].isupper()):
+        return 2
+    return sum(math.comb(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+
+def _bruteforce_cardinality(password):
+    """Размер алфавита перебора: сумма размеров классов, встречающихся в пароле"""
+    if password.isascii():
+        return _CARDINALITY[sum(set(password.encode().translate(_CARDINALITY_TABLE)))]
+    cardinality = 0
+    if any(c.islower() for c in password):
+        cardinality += 26
+    if any(c.isupper() for c in password):
+        cardinality += 26
+    if any(c.isdigit() for c in password):
+        cardinality += 10
+    if any(not c.isalnum() for c in password):
+        cardinality += 33
+    return cardinality
+
+
+def _find_matches(password):
+    """Найти шаблоны пароля: список (начало, конец, число попыток)
+    
+    Шаблон каждого вида ищется только с позиций, где начинается тройка
+    этого вида из _trigram_index; у пароля с не-ASCII символами
+    проверяются все позиции.
+    """
+    ranks, prefixes = _pattern_index()
+    n = len(password)
+    matches = []
+    if password.isascii():
+        index = _trigram_index()
+        kinds = [index.get(password[i:i + 3], 0) for i in range(n - 2)]
+        if not any(kinds):
+            return matches
+        starts = {_TRIGRAM_WORD: [], _TRIGRAM_REPEAT: [], _TRIGRAM_SEQUENCE: [], _TRIGRAM_KEYBOARD: []}
+        for i, found in enumerate(kinds):
+            if found:
+                for kind, positions in starts.items():
+                    if found & kind:
+                        positions.append(i)
+    else:
+        starts = dict.fromkeys((_TRIGRAM_WORD, _TRIGRAM_REPEAT, _TRIGRAM_SEQUENCE, _TRIGRAM_KEYBOARD),
+                               range(n - 2))
+    
+    # Словарные слова (прямые и перевернутые): как есть и без l33t-замен.
+    # Множество префиксов замкнуто, поэтому поиск начинается сразу с тройки
+    if starts[_TRIGRAM_WORD]:
+        lowered = password.lower()
+        variants = ((lowered, 1), (lowered.translate(_UNLEET_TABLE), 2))
+        for text, factor in variants:
+            if factor > 1 and text == lowered:
+                continue
+            for i in starts[_TRIGRAM_WORD]:
+                for j in range(i + 3, n + 1):
+                    piece = text[i:j]
+                    if piece not in prefixes:
+                        break
+                    rank = ranks.get(piece)
+                    if rank is not None:
+                        guesses = rank * _case_variations(password[i:j]) * factor
+                        matches.append((i, j, guesses))
+    
+    # Повторы одного символа, последовательности и прогулки по клавиатуре.
+    # Шаблон, найденный с позиции i, занимает ее до конца end, и следующий
+    # ищется не раньше end
+    end = 0
+    for i in starts[_TRIGRAM_REPEAT]:
+        if i < end:
+            continue
+        end = i + 1
+        while end < n and password[end] == password[i]:
+            end += 1
+        if end - i >= 3:
+            base = 10 if password[i].isdigit() else (26 if password[i].isalpha() else 33)
+            matches.append((i, end, base * (end - i)))
+    
+    end = 0
+    for i in starts[_TRIGRAM_SEQUENCE]:
+        if i < end:
+            continue
+        delta = ord(password[i + 1]) - ord(password[i])
+        j = i + 1
+        if abs(delta) == 1:
+            while j < n - 1 and ord(password[j + 1]) - ord(password[j]) == delta:
+                j += 1
+        if j - i >= 2:
+            first = password[i]
+            base = 4 if first in 'aAzZ019' else (10 if first.isdigit() else 26)
+            matches.append((i, j + 1, base * (j - i + 1) * (1 if delta > 0 else 2)))
+            end = j
+    
+    neighbours, keys, degree = _keyboard_graph()
+    end = 0
+    for i in starts[_TRIGRAM_KEYBOARD]:
+        if i < end:
+            continue
+        j = i
+        while j < n - 1 and password[j + 1] in neighbours.get(password[j], ()):
+            j += 1
+        length = j - i + 1
+        if length >= 3:
+            shifted = sum(1 for c in password[i:j + 1] if c.isupper() or c in '~!@#$%^&*()_+{}|:"<>?')
+            guesses = keys * degree ** (length - 1) * (2 if shifted else 1)
+            matches.append((i, j + 1, guesses))
+            end = j
+    return matches
+
+
+def estimate_entropy(password):
+    """Оценка энтропии пароля в битах с учетом шаблонов (в духе zxcvbn)
+    
+    Пароль разбивается на словарные слова, повторы, последовательности,
+    прогулки по клавиатуре и символы перебора так, чтобы суммарное число
+    попыток было минимальным. Результаты не кэшируются, чтобы пароли
+    не задерживались в памяти процесса.
+    """
+    n = len(password)
+    if n == 0:
+        return 0.0
+    matches = _find_matches(password)
+    char_bits = math.log2(_bruteforce_cardinality(password))
+    if not matches:
+        # Без шаблонов все символы оцениваются перебором
+        return n * char_bits
+    by_end = {}
+    for i, j, guesses in matches:
+        by_end.setdefault(j, []).append((i, math.log2(max(guesses, 1))))
+    
+    best = [0.0] + [math.inf] * n
+    for j in range(1, n + 1):
+        best[j] = best[j - 1] + char_bits
+        for i, bits in by_end.get(j, ()):
+            # Один бит на выбор типа шаблона для каждого сегмента
+            best[j] = min(best[j], best[i] + bits + 1)
+    return best[n]
+
+
+_trigram_bitmap_cache = None
+
+
+def _trigram_bitmap(np):
+    """Индекс троек для NumPy: виды шаблонов по коду тройки и коды четверок
+    
+    Код тройки ASCII-символов a, b, c — a << 14 | b << 7 | c. Тройка
+    словарного вида, которая сама не слово словаря, ведет к совпадению
+    только вместе со следующим символом, поэтому отдельно хранятся
+    отсортированные коды четырехсимвольных префиксов словаря.
+    """
+    global _trigram_bitmap_cache
+    if _trigram_bitmap_cache is not None:
+        return _trigram_bitmap_cache
+    ranks, _ = _pattern_index()
+    kinds = np.zeros(1 << 21, dtype=np.uint8)
+    for trigram, kind in _trigram_index().items():
+        kinds[ord(trigram[0]) << 14 | ord(trigram[1]) << 7 | ord(trigram[2])] = kind
+    for word in _ascii_preimages({word for word in ranks if len(word) == 3}):
+        kinds[ord(word[0]) << 14 | ord(word[1]) << 7 | ord(word[2])] |= _TRIGRAM_SHORT_WORD
+    quads = np.unique(np.array([ord(a) << 21 | ord(b) << 14 | ord(c) << 7 | ord(d) for a, b, c, d
+                                in _ascii_preimages({word[:4] for word in ranks if len(word) >= 4})],
+                               dtype=np.uint32))
+    _trigram_bitmap_cache = kinds, quads
+    return _trigram_bitmap_cache
+
+
+def _entropy_numpy(np, buffer, lengths, password_at):
+    """Баллы режима 'entropy' для ASCII-паролей, уложенных подряд в buffer
+    
+    Тройки всех позиций буфера проверяются по индексу _trigram_bitmap
+    одной операцией. Пароль без возможных шаблонов получает оценку
+    перебора len * log2(алфавит) векторно, остальные оцениваются
+    estimate_entropy по одному: password_at(i) возвращает i-й пароль.
+    """
+    kinds, quads = _trigram_bitmap(np)
+    count = len(lengths)
+    arr = np.frombuffer(buffer, dtype=np.uint8)
+    starts = np.cumsum(lengths) - lengths
+    ends = starts + lengths
+    masks = np.zeros(count, dtype=np.uint8)
+    nonempty = lengths > 0
+    if nonempty.any():
+        bits = np.frombuffer(_CARDINALITY_TABLE, dtype=np.uint8)[arr]
+        masks[nonempty] = np.bitwise_or.reduceat(bits, starts[nonempty])
+    char_bits = np.array([math.log2(c) if c else 0.0 for c in _CARDINALITY])
+    scores = np.minimum(lengths * char_bits[masks] // ENTROPY_BITS_PER_POINT, 8).astype(np.uint8)
+    if len(arr) < 3:
+        return array('B', scores.tobytes())
+    
+    # Тройка на позиции p относится к паролю, внутри которого лежит p + 2;
+    # тройки на стыке паролей отбрасываются. Начало слова длиннее трех
+    # символов проверяется еще и по четверке
+    wide = arr.astype(np.uint32)
+    codes = wide[:-2] << 14 | wide[1:-1] << 7 | wide[2:]
+    hits = np.flatnonzero(kinds[codes])
+    rows = np.searchsorted(starts, hits, side='right') - 1
+    keep = hits + 2 < ends[rows]
+    hits, rows = hits[keep], rows[keep]
+    dismissed = kinds[codes[hits]] == _TRIGRAM_WORD
+    if dismissed.any():
+        tails = hits[dismissed] + 3
+        inside = tails < ends[rows[dismissed]]
+        quad_codes = codes[hits[dismissed]] << 7 | wide[np.minimum(tails, len(arr) - 1)]
+        position = np.minimum(np.searchsorted(quads, quad_codes), len(quads) - 1)
+        dismissed[dismissed] = ~(inside & (quads[position] == quad_codes))
+    for i in np.unique(rows[~dismissed]).tolist():
+        scores[i] = min(int(estimate_entropy(password_at(i)) // ENTROPY_BITS_PER_POINT), 8)
+    return array('B', scores.tobytes())
+
+
+class ComplexityLevel:
+    """Неизменяемый уровень сложности с предвычисленными таблицами выборки
+    
+    При создании алфавит очищается от повторов и исключенных символов,
+    а для выборки заранее строятся таблица bytes.translate, набор
+    отбрасываемых байтов и порог rejection sampling.
+    """
+    __slots__ = ('name', 'description', 'chars', 'min_length',
+                 'alphabet', 'size', 'threshold', 'class_mask', 'table', 'reject')
+    
+    _FIELDS = ('name', 'description', 'chars', 'min_length')
+    
+    def __init__(self, name, description, chars, min_length, exclude=''):
+        chars = ''.join(dict.fromkeys(c for c in chars if c not in exclude))
+        if not chars:
+            raise ValueError(f"Пустой алфавит для уровня сложности: {name}")
+        if not chars.isascii():
+            raise ValueError(f"Алфавит уровня '{name}' должен состоять из ASCII-символов")
+        if min_length < 0:
+            raise ValueError("Минимальная длина не может быть отрицательной")
+        
+        size = len(chars)
+        threshold = 256 - 256 % size
+        class_mask = 0
+        for c in chars:
+            class_mask |= _char_class(c)
+        
+        init = object.__setattr__
+        init(self, 'name', name)
+        init(self, 'description', description)
+        init(self, 'chars', chars)
+        init(self, 'min_length', min_length)
+        init(self, 'alphabet', chars.encode('ascii'))
+        init(self, 'size', size)
+        init(self, 'threshold', threshold)
+        init(self, 'class_mask', class_mask)
+        init(self, 'table', bytes(ord(chars[b % size]) if b < threshold else 0 for b in range(256)))
+        init(self, 'reject', bytes(range(threshold, 256)))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Уровень сложности неизменяем")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Уровень сложности неизменяем")
+    
+    def __reduce__(self):
+        # Таблицы пересчитываются при распаковке в процессе-воркере
+        return (ComplexityLevel, (self.name, self.description, self.chars, self.min_length))
+    
+    def __getitem__(self, key):
+        """Словарный доступ level['chars'] для совместимости"""
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __repr__(self):
+        return f"ComplexityLevel({self.name!r}, size={self.size}, min_length={self.min_length})"
+
+
+class ComplexityRegistry:
+    """Реестр уровней сложности с индексом по имени и по номеру"""
+    __slots__ = ('_levels', '_by_name')
+    
+    def __init__(self, levels=()):
+        self._levels = []
+        self._by_name = {}
+        for level in levels:
+            self.register(level)
+    
+    def register(self, level):
+        """Добавить уровень; имена должны быть уникальны"""
+        if level.name in self._by_name:
+            raise ValueError(f"Уровень сложности уже существует: {level.name}")
+        self._levels.append(level)
+        self._by_name[level.name] = level
+        return level
+    
+    def by_name(self, name):
+        """Уровень по имени или None"""
+        return self._by_name.get(name)
+    
+    def names(self):
+        """Имена уровней в порядке регистрации"""
+        return [level.name for level in self._levels]
+    
+    def copy(self):
+        """Копия реестра; сами уровни неизменяемы и разделяются"""
+        registry = ComplexityRegistry()
+        registry._levels = list(self._levels)
+        registry._by_name = dict(self._by_name)
+        return registry
+    
+    def __getitem__(self, index):
+        return self._levels[index]
+    
+    def __len__(self):
+        return len(self._levels)
+    
+    def __iter__(self):
+        return iter(self._levels)
+
+
+DEFAULT_COMPLEXITY_LEVELS = ComplexityRegistry([
+    ComplexityLevel('low', 'Только буквы (нижний регистр)',
+                    ASCII_LOWERCASE, 4),
+    ComplexityLevel('medium', 'Буквы верхнего и нижнего регистра',
+                    ASCII_LETTERS, 6),
+    ComplexityLevel('high', 'Буквы + цифры',
+                    ASCII_LETTERS + DIGITS, 8),
+    ComplexityLevel('very-high', 'Буквы + цифры + специальные символы',
+                    ASCII_LETTERS + DIGITS + PUNCTUATION, 10),
+])
+
+
+def _sample_chars(level, n, read=os.urandom, stats=None):
+    """Отобразить n случайных байтов CSPRNG на алфавит уровня без смещения
+    
+    Байты выше порога (наибольшего кратного размеру алфавита) отбрасываются,
+    остальные отображаются по модулю. Обе операции выполняет bytes.translate
+    по предвычисленным таблицам уровня, так что на Python-уровне нет цикла
+    по символам. С stats замеряется отображение и считаются отброшенные
+    байты и повторные чтения.
+    """
+    table = level.table
+    reject = level.reject
+    threshold = level.threshold
+    
+    # Обычно хватает одного чтения: тогда результат — срез его отображения
+    # без промежуточного bytearray, что держит пик памяти больших пакетов
+    # около двух размеров результата
+    chunks = []
+    have = 0
+    while have < n:
+        need = n - have
+        # Запас ~3% покрывает разброс числа отброшенных байтов,
+        # поэтому повторное чтение практически не требуется
+        raw = read(need * 256 // threshold + need // 32 + 64)
+        if stats is None:
+            mapped = raw.translate(table, reject)
+        else:
+            start = time.perf_counter()
+            mapped = raw.translate(table, reject)
+            stats.observe('map', time.perf_counter() - start)
+            stats.count('rejected_bytes', len(raw) - len(mapped))
+        del raw
+        chunks.append(mapped)
+        have += len(mapped)
+    if stats is not None and len(chunks) > 1:
+        stats.count('rejection_retries', len(chunks) - 1)
+    out = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+    return out[:n] if len(out) > n else out
+
+
+def _sample_indices(size, n, read=os.urandom, stats=None):
+    """n равномерных случайных индексов в [0, size) для size до 65536
+    
+    Индексы берутся из 16-битных слов одного блока энтропии с тем же
+    отбрасыванием значений выше порога, что и в _sample_chars.
+    """
+    if not 0 < size <= 65536:
+        raise ValueError("Размер набора должен быть от 1 до 65536")
+    threshold = 65536 - 65536 % size
+    out = []
+    rounds = 0
+    while len(out) < n:
+        need = n - len(out)
+        words = array('H', read(2 * (need * 65536 // threshold + need // 32 + 16)))
+        out.extend(w % size for w in words if w < threshold)
+        rounds += 1
+    if stats is not None and rounds > 1:
+        stats.count('rejection_retries', rounds - 1)
+    del out[n:]
+    return out
+
+
+ENTROPY_SOURCES = ('os', 'secrets', 'seeded')
+ENTROPY_BUFFER_SIZE = 65536
+
+_fork_epoch = 0
+_fork_watched = False
+_urandom_fd_cache = None
+
+
+def _bump_fork_epoch():
+    global _fork_epoch
+    _fork_epoch += 1
+
+
+def _urandom_fd():
+    """Дескриптор /dev/urandom, один на процесс; -1, если открыть не удалось
+    
+    Неудача не запоминается: после временной нехватки дескрипторов
+    следующее заполнение буфера попробует снова, а пока берется os.urandom.
+    Дочерний процесс наследует дескриптор вместе с памятью модуля.
+    """
+    global _urandom_fd_cache
+    if _urandom_fd_cache is None:
+        try:
+            fd = os.open('/dev/urandom', os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+        except OSError:
+            return -1
+        if _urandom_fd_cache is None:
+            _urandom_fd_cache = fd
+        else:
+            os.close(fd)
+    return _urandom_fd_cache
+
+
+def _watch_forks():
+    """Один раз подписаться на fork, чтобы буферы энтропии не наследовались"""
+    global _fork_watched
+    if not _fork_watched:
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_bump_fork_epoch)
+        _fork_watched = True
+
+
+class OSEntropy:
+    """Буферизованная энтропия ОС
+    
+    Небольшие запросы обслуживаются из переиспользуемого bytearray, который
+    заполняется через os.readv из /dev/urandom прямо в буфер, без
+    промежуточных объектов bytes (где устройства нет — через os.urandom).
+    Запросы крупнее буфера читаются напрямую. После fork буфер
+    перезаполняется, чтобы процессы не выдали одинаковые байты: дочерний
+    процесс увеличивает счетчик _fork_epoch через os.register_at_fork.
+    Дескриптор /dev/urandom один на процесс и общий для всех экземпляров,
+    а при передаче в другой процесс источник заменяется общим источником
+    этого процесса с тем же размером буфера.
+    """
+    __slots__ = ('buffer_size', '_buffer', '_view', '_pos', '_epoch', '_lock')
+    
+    def __init__(self, buffer_size=ENTROPY_BUFFER_SIZE):
+        if buffer_size < 1:
+            raise ValueError("Размер буфера энтропии должен быть положительным")
+        # Низкоуровневая блокировка: threading тянет functools и замедляет запуск
+        from _thread import allocate_lock
+        
+        self.buffer_size = buffer_size
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._pos = buffer_size
+        self._epoch = _fork_epoch
+        self._lock = allocate_lock()
+        _watch_forks()
+    
+    def __reduce__(self):
+        # Буфер не передается: в другом процессе берется его общий источник
+        return (_shared_os_entropy, (self.buffer_size,))
+    
+    def _fill(self):
+        fd = _urandom_fd() if hasattr(os, 'readv') else -1
+        if fd >= 0:
+            filled = 0
+            while filled < self.buffer_size:
+                filled += os.readv(fd, [self._view[filled:]])
+        else:
+            self._buffer[:] = os.urandom(self.buffer_size)
+        self._pos = 0
+        self._epoch = _fork_epoch
+    
+    def read(self, n):
+        """n случайных байтов"""
+        if n > self.buffer_size:
+            return os.urandom(n)
+        with self._lock:
+            if self._epoch != _fork_epoch or self._pos + n > self.buffer_size:
+                self._fill()
+            start = self._pos
+            self._pos = end = start + n
+            return self._view[start:end].tobytes()
+    
+    def fork(self, key):
+        """Источник для другого процесса: там он заменится общим (см. __reduce__)"""
+        return self
+
+
+class SecretsEntropy:
+    """Энтропия через secrets.token_bytes, без буферизации"""
+    __slots__ = ('_token_bytes',)
+    
+    def __init__(self):
+        from secrets import token_bytes
+        self._token_bytes = token_bytes
+    
+    def __reduce__(self):
+        return (SecretsEntropy, ())
+    
+    def read(self, n):
+        """n случайных байтов"""
+        return self._token_bytes(n)
+    
+    def fork(self, key):
+        """Источник без состояния можно разделять между процессами"""
+        return self
+
+
+class SeededEntropy:
+    """Детерминированный источник для воспроизводимых тестов и бенчмарков
+    
+    Основан на Mersenne Twister и не годится для настоящих паролей:
+    по выводу можно восстановить состояние генератора.
+    """
+    __slots__ = ('seed', '_rng')
+    
+    def __init__(self, seed):
+        from random import Random
+        self.seed = seed
+        self._rng = Random(seed)
+    
+    def read(self, n):
+        """n псевдослучайных байтов"""
+        if n == 0:
+            return b''
+        return self._rng.getrandbits(8 * n).to_bytes(n, 'little')
+    
+    def fork(self, key):
+        """Детерминированный поток для пакета с ключом key"""
+        return SeededEntropy(f'{self.seed}:{key}')
+
+
+def make_entropy_source(name='os', seed=None):
+    """Источник энтропии по имени из ENTROPY_SOURCES"""
+    if name == 'os':
+        return OSEntropy()
+    if name == 'secrets':
+        return SecretsEntropy()
+    if name == 'seeded':
+        if seed is None:
+            raise ValueError("Для источника seeded нужно задать seed")
+        return SeededEntropy(seed)
+    raise ValueError(f"Неизвестный источник энтропии: {name}")
+
+
+_shared_os_sources = {}
+
+
+def _shared_os_entropy(buffer_size=ENTROPY_BUFFER_SIZE):
+    """Общий для процесса источник ОС с заданным буфером, создается при первом обращении"""
+    source = _shared_os_sources.get(buffer_size)
+    if source is None:
+        source = _shared_os_sources.setdefault(buffer_size, OSEntropy(buffer_size))
+    return source
+
+
+def _default_entropy():
+    """Общий буферизованный источник ОС"""
+    return _shared_os_entropy()
+
+
+WORDLIST_MAGIC = b'PWL1'
+_WORDLIST_HEADER = struct.Struct('<4sI')
+
+
+def build_wordlist(source, target):
+    """Собрать компактный файл словаря из текстового (по слову в строке)
+    
+    Формат: заголовок (магия, число слов), таблица из count + 1 смещений
+    uint32 и упакованные UTF-8 байты слов подряд.
+    """
+    with open(source, encoding='utf-8') as f:
+        words = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    packed = [word.encode('utf-8') for word in words]
+    offsets = array('I', [0])
+    for word in packed:
+        offsets.append(offsets[-1] + len(word))
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    with open(target, 'wb') as f:
+        f.write(_WORDLIST_HEADER.pack(WORDLIST_MAGIC, len(packed)))
+        f.write(offsets.tobytes())
+        f.write(b''.join(packed))
+    return len(packed)
+
+
+class WordList:
+    """Словарь для парольных фраз, отображенный в память
+    
+    Слово по номеру читается из mmap за O(1) через таблицу смещений,
+    так что файл никогда не загружается в память целиком.
+    """
+    __slots__ = ('path', '_file', '_mm', '_count', '_data_start')
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = _WORDLIST_HEADER.unpack_from(self._mm, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"Файл словаря поврежден: {path}")
+        if magic != WORDLIST_MAGIC or count == 0:
+            self.close()
+            raise ValueError(f"Файл словаря поврежден: {path}")
+        self._count = count
+        self._data_start = _WORDLIST_HEADER.size + 4 * (count + 1)
+    
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, end = struct.unpack_from('<II', self._mm, _WORDLIST_HEADER.size + 4 * index)
+        base = self._data_start
+        return self._mm[base + start:base + end].decode('utf-8')
+    
+    def take(self, indices):
+        """Слова по списку номеров (быстрый путь для пакетов)"""
+        mm = self._mm
+        unpack_from = struct.unpack_from
+        table = _WORDLIST_HEADER.size
+        base = self._data_start
+        words = []
+        append = words.append
+        for index in indices:
+            start, end = unpack_from('<II', mm, table + 4 * index)
+            append(mm[base + start:base + end])
+        return b'\0'.join(words).decode('utf-8').split('\0')
+    
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+_default_wordlist_cache = None
+
+
+def _default_wordlist():
+    """Встроенный словарь; открывается при первой генерации фразы"""
+    global _default_wordlist_cache
+    if _default_wordlist_cache is None:
+        _default_wordlist_cache = WordList(os.path.join(DATA_DIR, 'wordlist.bin'))
+    return _default_wordlist_cache
+
+
+STREAM_FORMATS = ('plain', 'jsonl', 'csv')
+STREAM_CHUNK_SIZE = 65536
+PASSPHRASE_WORDS = 6
+
+
+def _csv_field(value):
+    """Экранировать поле CSV по RFC 4180"""
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _write_stream(out, number, fmt, chunk_size, make_chunk):
+    """Записать number значений, получая их пакетами make_chunk(count)"""
+    if fmt == 'csv':
+        out.write('id,password\n')
+    first_id = 1
+    while first_id <= number:
+        count = min(chunk_size, number - first_id + 1)
+        out.write(_format_chunk(make_chunk(count), first_id, fmt))
+        first_id += count
+    out.flush()
+
+
+def _check_workers(workers):
+    """Проверить число процессов; None означает все ядра"""
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("Число процессов должно быть не меньше 1")
+    return workers
+
+
+def _format_chunk(passwords, first_id, fmt):
+    """Сформировать текст пакета паролей в формате plain, jsonl или csv"""
+    if not passwords:
+        return ''
+    if fmt == 'plain':
+        if isinstance(passwords, PasswordBatch):
+            return passwords.text()
+        return '\n'.join(passwords) + '\n'
+    if fmt == 'jsonl':
+        from json import dumps
+        return ''.join(f'{{"id": {i}, "password": {dumps(p)}}}\n'
+                       for i, p in enumerate(passwords, first_id))
+    return ''.join(f'{i},{_csv_field(p)}\n' for i, p in enumerate(passwords, first_id))
+
+
+PASSWORD_BATCH_BLOCK = 1 << 20
+
+
+class PasswordBatch:
+    """Пакет паролей одной длины в одном непрерывном буфере ASCII-байтов
+    
+    Последовательность строк без отдельного объекта str на пароль: буфер
+    из count * length байтов, пароль i — байты [i * length, (i + 1) * length).
+    Индексирование возвращает str, срез с шагом 1 — новый PasswordBatch
+    поверх того же буфера без копирования. Запись в поток, оценка
+    и итерация идут блоками по PASSWORD_BATCH_BLOCK байтов.
+    """
+    __slots__ = ('length', '_count', '_view')
+    
+    def __init__(self, buffer, length, count=None):
+        view = memoryview(buffer).cast('B')
+        if length < 0:
+            raise ValueError("Длина пароля не может быть отрицательной")
+        if count is None:
+            if not length:
+                raise ValueError("Для паролей нулевой длины нужно задать count")
+            count = len(view) // length
+        if len(view) != count * length:
+            raise ValueError("Размер буфера не равен count * length")
+        self.length = length
+        self._count = count
+        self._view = view
+    
+    def __reduce__(self):
+        return (PasswordBatch, (self._view.tobytes(), self.length, self._count))
+    
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, index):
+        length = self.length
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if step == 1:
+                count = max(stop - start, 0)
+                return PasswordBatch(self._view[start * length:(start + count) * length], length, count)
+            picked = range(start, stop, step)
+            view = self._view
+            return PasswordBatch(b''.join([view[i * length:(i + 1) * length] for i in picked]),
+                                 length, len(picked))
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("Индекс пароля вне пакета")
+        return str(self._view[index * length:(index + 1) * length], 'ascii')
+    
+    def __iter__(self):
+        length = self.length
+        if not length:
+            yield from [''] * self._count
+            return
+        view = self._view
+        step = max(PASSWORD_BATCH_BLOCK // length, 1) * length
+        for start in range(0, len(view), step):
+            text = str(view[start:start + step], 'ascii')
+            yield from [text[i:i + length] for i in range(0, len(text), length)]
+    
+    def __reversed__(self):
+        for i in range(self._count - 1, -1, -1):
+            yield self[i]
+    
+    def index(self, password):
+        """Номер первого вхождения пароля; ValueError, если его нет"""
+        length = self.length
+        if isinstance(password, str) and len(password) == length and password.isascii():
+            if not length:
+                if self._count:
+                    return 0
+            else:
+                raw = self._view.tobytes()
+                needle = password.encode('ascii')
+                position = raw.find(needle)
+                while position >= 0:
+                    if position % length == 0:
+                        return position // length
+                    position = raw.find(needle, position + 1)
+        raise ValueError("Пароля нет в пакете")
+    
+    def __contains__(self, password):
+        try:
+            self.index(password)
+        except ValueError:
+            return False
+        return True
+    
+    def count(self, password):
+        """Число вхождений пароля в пакет"""
+        return sum(1 for p in self if p == password)
+    
+    def __eq__(self, other):
+        if isinstance(other, PasswordBatch):
+            return (self.length == other.length and self._count == other._count
+                    and self._view == other._view)
+        if isinstance(other, list):
+            return len(other) == self._count and list(self) == other
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __add__(self, other):
+        return self.tolist() + list(other)
+    
+    def __radd__(self, other):
+        return list(other) + self.tolist()
+    
+    def __repr__(self):
+        return f"PasswordBatch(count={self._count}, length={self.length})"
+    
+    @property
+    def buffer(self):
+        """memoryview буфера пакета только для чтения"""
+        return self._view.toreadonly()
+    
+    def memory_bytes(self):
+        """Размер буфера паролей в байтах"""
+        return len(self._view)
+    
+    def tolist(self):
+        """Список строк (по объекту str на пароль)"""
+        return list(self)
+    
+    def _lines(self, start, stop):
+        """Пароли [start, stop) как байты с переводом строки после каждого
+        
+        При коротких паролях байты позиции переносятся одним срезом
+        с шагом length + 1 (срез bytes с шагом быстрее среза memoryview),
+        при длинных — пароли склеиваются целиком.
+        """
+        length = self.length
+        count = stop - start
+        if not count:
+            return b''
+        raw = self._view[start * length:stop * length].tobytes()
+        if length > count:
+            return b'\n'.join([raw[i:i + length] for i in range(0, len(raw), length)]) + b'\n'
+        out = bytearray(b'\n') * (count * (length + 1))
+        for p in range(length):
+            out[p::length + 1] = raw[p::length]
+        return out
+    
+    def _blocks(self):
+        """Блоки _lines не больше PASSWORD_BATCH_BLOCK байтов"""
+        step = max(PASSWORD_BATCH_BLOCK // (self.length + 1), 1)
+        for start in range(0, self._count, step):
+            yield self._lines(start, min(start + step, self._count))
+    
+    def text(self):
+        """Все пароли одной строкой, по паролю на строку"""
+        return str(self._lines(0, self._count), 'ascii')
+    
+    def tofile(self, f):
+        """Записать пароли по одному в строке в двоичный файл f"""
+        for block in self._blocks():
+            f.write(block)
+    
+    def write(self, out):
+        """Записать пароли по одному в строке в текстовый поток out"""
+        for block in self._blocks():
+            out.write(str(block, 'ascii'))
+    
+    def strengths(self, use_numpy=None):
+        """Оценки calculate_strength (режим 'classes') прямо по буферу
+        
+        Класс каждого байта берется одним bytes.translate на весь буфер,
+        с NumPy маски классов сворачиваются по строкам матрицы count x length.
+        """
+        length = self.length
+        bonus = min(length // 4, 3)
+        np = _numpy() if use_numpy is not False else None
+        if use_numpy and np is None:
+            raise ValueError("Для use_numpy=True требуется пакет numpy")
+        if not length:
+            return array('B', bytes(self._count))
+        
+        bits = self._view.tobytes().translate(_CLASS_TABLE)
+        if np is not None:
+            masks = np.bitwise_or.reduce(np.frombuffer(bits, dtype=np.uint8).reshape(self._count, length), axis=1)
+            popcount = np.array([bin(m).count('1') for m in range(16)], dtype=np.uint8)
+            return array('B', (popcount[masks] + bonus).astype(np.uint8).tobytes())
+        
+        scores = array('B')
+        append = scores.append
+        for i in range(0, len(bits), length):
+            classes = set(bits[i:i + length])
+            classes.discard(0)
+            append(len(classes) + bonus)
+        return scores
+
+
+def _make_passwords(level, count, length, read=os.urandom, stats=None):
+    """Один блок случайных символов как пакет count паролей длины length"""
+    return PasswordBatch(_sample_chars(level, count * length, read, stats), length, count)
+
+
+def _parallel_task(level, count, length, first_id, fmt, plan=None, entropy=None):
+    """Задача процесса-воркера: пакет паролей из собственного источника энтропии
+    
+    При fmt=None возвращает список паролей, иначе готовый текст пакета,
+    чтобы основной процесс только писал результат. С планом политики
+    пароли собираются по нему.
+    """
+    read = entropy.read if entropy is not None else os.urandom
+    if plan is not None:
+        passwords = _make_policy_passwords(plan, count, read)
+    else:
+        passwords = _make_passwords(level, count, length, read)
+    if fmt is None:
+        return passwords
+    return _format_chunk(passwords, first_id, fmt)
+
+
+def _run_parallel(level, number, length, workers, chunk_size, fmt, plan=None, entropy=None):
+    """Раздать генерацию number паролей пулу процессов
+    
+    Пакеты возвращаются в порядке готовности. В работе одновременно не более
+    2 * workers пакетов, поэтому память ограничена при любом number. Каждый
+    пакет получает entropy.fork(first_id): у детерминированного источника
+    содержимое пакета зависит только от его номера.
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        first_id = 1
+        while first_id <= number or pending:
+            while first_id <= number and len(pending) < 2 * workers:
+                count = min(chunk_size, number - first_id + 1)
+                task_entropy = entropy.fork(first_id) if entropy is not None else None
+                pending.add(pool.submit(_parallel_task, level, count, length, first_id, fmt,
+                                        plan, task_entropy))
+                first_id += count
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+EXPORT_HASHES = ('pbkdf2', 'scrypt')
+EXPORT_CHUNK_SIZE = 256
+EXPORT_BUFFER_SIZE = 1 << 20
+EXPORT_PBKDF2_ITERATIONS = 600000
+EXPORT_SCRYPT_N = 2 ** 14
+EXPORT_SALT_LENGTH = 22
+
+
+def _scrypt_maxmem(n, r=8, p=1):
+    """Лимит памяти scrypt: OpenSSL требует около 128 * r * (n + p + 2) байт, плюс 1 МиБ запаса"""
+    return 128 * r * (n + p + 2) + (1 << 20)
+
+
+def _hash_passwords(passwords, scheme, cost):
+    """Хэши паролей в формате PBKDF2PasswordHasher/ScryptPasswordHasher Django
+    
+    pbkdf2: 'pbkdf2_sha256$итерации$соль$base64(PBKDF2-HMAC-SHA256)',
+    scrypt: 'scrypt$n$соль$8$1$base64(scrypt, 64 байта)'. Соль — 22 случайных
+    буквы и цифры (~131 бит) на каждый пароль.
+    """
+    from hashlib import pbkdf2_hmac, scrypt
+    from binascii import b2a_base64
+    
+    salt_level = DEFAULT_COMPLEXITY_LEVELS.by_name('high')
+    salts = _sample_chars(salt_level, len(passwords) * EXPORT_SALT_LENGTH).decode('ascii')
+    hashes = []
+    for i, password in enumerate(passwords):
+        salt = salts[i * EXPORT_SALT_LENGTH:(i + 1) * EXPORT_SALT_LENGTH]
+        if scheme == 'pbkdf2':
+            digest = pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('ascii'), cost)
+            prefix = f'pbkdf2_sha256${cost}${salt}$'
+        else:
+            digest = scrypt(password.encode('utf-8'), salt=salt.encode('ascii'), n=cost, r=8, p=1,
+                            maxmem=_scrypt_maxmem(cost), dklen=64)
+            prefix = f'scrypt${cost}${salt}$8$1$'
+        hashes.append(prefix + b2a_base64(digest, newline=False).decode('ascii'))
+    return hashes
+
+
+def _export_chunk(passwords, first_id, fmt, scheme=None, cost=None):
+    """Текст пакета записей экспорта: id, пароль и, со scheme, его хэш
+    
+    Выполняется в процессах пула, поэтому основной процесс только
+    генерирует пароли и пишет готовый текст.
+    """
+    if scheme is None:
+        return _format_chunk(passwords, first_id, fmt)
+    hashes = _hash_passwords(passwords, scheme, cost)
+    if fmt == 'jsonl':
+        from json import dumps
+        return ''.join(f'{{"id": {i}, "password": {dumps(p)}, "hash": "{h}"}}\n'
+                       for i, (p, h) in enumerate(zip(passwords, hashes), first_id))
+    return ''.join(f'{i},{_csv_field(p)},{h}\n'
+                   for i, (p, h) in enumerate(zip(passwords, hashes), first_id))
+
+
+def _run_export(out, number, fmt, chunk_size, make_chunk, scheme=None, cost=None, workers=1):
+    """Записать number записей экспорта в out за один проход генерации
+    
+    Пакеты паролей готовит make_chunk(count) в основном процессе, а хэши
+    и текст записей — пул из workers процессов. В работе не больше
+    2 * workers пакетов, результаты пишутся в порядке номеров, поэтому
+    скорость ограничена хэшированием, а память — окном пакетов.
+    """
+    if fmt == 'csv':
+        out.write('id,password,hash\n' if scheme is not None else 'id,password\n')
+    chunks = ((first_id, min(chunk_size, number - first_id + 1))
+              for first_id in range(1, number + 1, chunk_size))
+    if scheme is None or workers == 1:
+        for first_id, count in chunks:
+            out.write(_export_chunk(make_chunk(count), first_id, fmt, scheme, cost))
+        out.flush()
+        return
+    
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for first_id, count in chunks:
+            if len(pending) >= 2 * workers:
+                out.write(pending.popleft().result())
+            pending.append(pool.submit(_export_chunk, make_chunk(count), first_id, fmt, scheme, cost))
+        while pending:
+            out.write(pending.popleft().result())
+    out.flush()
+
+
+_POLICY_CLASSES = (
+    (CLASS_LOWER, 'строчных букв'),
+    (CLASS_UPPER, 'заглавных букв'),
+    (CLASS_DIGIT, 'цифр'),
+    (CLASS_PUNCT, 'спецсимволов'),
+)
+
+
+def _longest_run(text):
+    """Длина самой длинной серии одинаковых символов подряд"""
+    longest = run = 0
+    prev = None
+    for c in text:
+        run = run + 1 if c == prev else 1
+        longest = max(longest, run)
+        prev = c
+    return longest
+
+
+def _count_with_minimums(length, sizes, minimums):
+    """Число строк длины length, где из группы i не меньше minimums[i] символов
+    
+    Группы алфавита размеров sizes не пересекаются. Считается динамикой
+    по группам: ways[n] — число строк длины n из уже учтенных групп,
+    новая группа добавляет k >= minimum символов на C(n, k) позиций.
+    Таблицы ways кэшируются в _minimum_table.
+    """
+    return _minimum_table(tuple(sizes), tuple(minimums), length)[length]
+
+
+class PasswordPolicy:
+    """Неизменяемый набор требований к паролю
+    
+    Минимумы задаются по классам символов, max_run ограничивает длину
+    серии одинаковых символов подряд, forbidden исключает символы из
+    алфавита, а prefix и suffix добавляются к паролю как есть и входят
+    в его длину. Символы префикса и суффикса засчитываются в минимумы.
+    """
+    __slots__ = ('min_lower', 'min_upper', 'min_digits', 'min_punct',
+                 'max_run', 'forbidden', 'prefix', 'suffix')
+    
+    def __init__(self, min_lower=0, min_upper=0, min_digits=0, min_punct=0,
+                 max_run=None, forbidden='', prefix='', suffix=''):
+        if min(min_lower, min_upper, min_digits, min_punct) < 0:
+            raise ValueError("Минимальное число символов не может быть отрицательным")
+        if max_run is not None and max_run < 1:
+            raise ValueError("Максимальная серия повторов должна быть не меньше 1")
+        if any(c in forbidden for c in prefix + suffix):
+            raise ValueError("Префикс и суффикс не должны содержать запрещенных символов")
+        if not (prefix + suffix).isascii():
+            raise ValueError("Префикс и суффикс должны состоять из ASCII-символов")
+        
+        init = object.__setattr__
+        init(self, 'min_lower', min_lower)
+        init(self, 'min_upper', min_upper)
+        init(self, 'min_digits', min_digits)
+        init(self, 'min_punct', min_punct)
+        init(self, 'max_run', max_run)
+        init(self, 'forbidden', ''.join(sorted(set(forbidden))))
+        init(self, 'prefix', prefix)
+        init(self, 'suffix', suffix)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Политика неизменяема")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Политика неизменяема")
+    
+    def _key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __eq__(self, other):
+        if not isinstance(other, PasswordPolicy):
+            return NotImplemented
+        return self._key() == other._key()
+    
+    def __hash__(self):
+        return hash(self._key())
+    
+    def __reduce__(self):
+        return (PasswordPolicy, self._key())
+    
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f"PasswordPolicy({fields})"
+    
+    def minimums(self):
+        """Минимумы по классам: {CLASS_*: число символов}"""
+        return {CLASS_LOWER: self.min_lower, CLASS_UPPER: self.min_upper,
+                CLASS_DIGIT: self.min_digits, CLASS_PUNCT: self.min_punct}
+
+
+class _PolicyPlan:
+    """Предвычисленный план генерации по политике для уровня и длины
+    
+    required — пары (уровень из символов класса, сколько символов взять),
+    free — число символов из всего разрешенного алфавита allowed,
+    groups — разрешенные символы по классам для замены при max_run.
+    """
+    __slots__ = ('allowed', 'required', 'free', 'groups', 'body_length',
+                 'max_run', 'prefix', 'suffix', 'prefix_run', 'suffix_run')
+    
+    def __init__(self, level, length, policy):
+        fixed = policy.prefix + policy.suffix
+        body_length = length - len(fixed)
+        if body_length < 0:
+            raise ValueError("Префикс и суффикс длиннее пароля")
+        
+        chars = ''.join(c for c in level.chars if c not in policy.forbidden)
+        if not chars and body_length:
+            raise ValueError("После исключения запрещенных символов алфавит пуст")
+        groups = {}
+        for c in chars:
+            groups[_char_class(c)] = groups.get(_char_class(c), '') + c
+        
+        required = []
+        for cls, title in _POLICY_CLASSES:
+            need = policy.minimums()[cls] - sum(_char_class(c) == cls for c in fixed)
+            if need <= 0:
+                continue
+            if cls not in groups:
+                raise ValueError(f"Политика требует {title}, но их нет в алфавите уровня '{level.name}'")
+            required.append((ComplexityLevel(f'{level.name}:{cls}', title, groups[cls], 0), need))
+        free = body_length - sum(need for _, need in required)
+        if free < 0:
+            raise ValueError(f"Длины {length} не хватает для минимумов политики")
+        
+        max_run = policy.max_run
+        if max_run is not None:
+            if _longest_run(policy.prefix) > max_run or _longest_run(policy.suffix) > max_run:
+                raise ValueError("Префикс или суффикс нарушает ограничение на серии повторов")
+            if not body_length and _longest_run(fixed) > max_run:
+                raise ValueError("Префикс и суффикс вместе нарушают ограничение на серии повторов")
+            # Замена символа исключает соседей слева и справа,
+            # поэтому в каждом классе нужно хотя бы три символа
+            if body_length and min(len(group) for group in groups.values()) < 3:
+                raise ValueError("Для ограничения серий в каждом классе алфавита нужно не менее 3 символов")
+        
+        prefix, suffix = policy.prefix, policy.suffix
+        self.allowed = ComplexityLevel(f'{level.name}:policy', level.description, chars, 0) if chars else None
+        self.required = required
+        self.free = free
+        self.groups = groups
+        self.body_length = body_length
+        self.max_run = max_run
+        self.prefix = prefix
+        self.suffix = suffix
+        self.prefix_run = len(prefix) - len(prefix.rstrip(prefix[-1])) if prefix else 0
+        self.suffix_run = len(suffix) - len(suffix.lstrip(suffix[0])) if suffix else 0
+
+
+def _limit_runs(plan, chars, read=os.urandom, stats=None):
+    """Разбить слишком длинные серии, заменяя символ на другой из того же класса
+    
+    Проход слева направо с учетом хвоста префикса и начала суффикса.
+    Замена берется из класса заменяемого символа, поэтому минимумы
+    политики сохраняются.
+    """
+    max_run = plan.max_run
+    prev = plan.prefix[-1:]
+    run = plan.prefix_run
+    last = len(chars) - 1
+    following = plan.suffix[:1]
+    for i, c in enumerate(chars):
+        run = run + 1 if c == prev else 1
+        tail = plan.suffix_run if i == last and c == following else 0
+        if run + tail > max_run:
+            exclude = (prev, following) if i == last else (prev,)
+            candidates = [x for x in plan.groups[_char_class(c)] if x not in exclude]
+            c = chars[i] = candidates[_sample_indices(len(candidates), 1, read, stats)[0]]
+            run = 1
+        prev = c
+
+
+def _make_policy_passwords(plan, count, read=os.urandom, stats=None):
+    """Собрать count паролей по плану за один проход без повторных попыток
+    
+    Обязательные символы каждого класса и свободные символы берутся
+    блоками из CSPRNG, затем позиции перемешиваются алгоритмом
+    Фишера–Йетса: для позиции i индекс j равномерен в [0, i], индексы
+    для всего пакета заранее выбираются через _sample_indices.
+    Результат — PasswordBatch: тела паролей склеиваются через suffix + prefix.
+    """
+    prefix, suffix, max_run = plan.prefix, plan.suffix, plan.max_run
+    length = plan.body_length
+    if length == 0 or count == 0:
+        return PasswordBatch((prefix + suffix).encode('ascii') * count, length + len(prefix + suffix), count)
+    
+    columns = [(_sample_chars(level, count * need, read, stats).decode('ascii'), need)
+               for level, need in plan.required]
+    if plan.free:
+        columns.append((_sample_chars(plan.allowed, count * plan.free, read, stats).decode('ascii'), plan.free))
+    positions = range(length - 1, 0, -1)
+    swaps = [_sample_indices(i + 1, count, read, stats) for i in positions]
+    
+    bodies = []
+    for p in range(count):
+        chars = []
+        for text, need in columns:
+            chars.extend(text[p * need:(p + 1) * need])
+        for i, picks in zip(positions, swaps):
+            j = picks[p]
+            chars[i], chars[j] = chars[j], chars[i]
+        if max_run is not None:
+            _limit_runs(plan, chars, read, stats)
+        bodies.append(''.join(chars))
+    text = prefix + (suffix + prefix).join(bodies) + suffix
+    return PasswordBatch(text.encode('ascii'), length + len(prefix + suffix), count)
+
+
+_KEYSPACE_CACHE_SIZE = 4096
+POLICY_ESTIMATE_MAX_LENGTH = 256
+_minimum_tables = {}
+_run_counts = {}
+_class_group_cache = {}
+
+
+def _minimum_table(sizes, minimums, length):
+    """Таблица ways[n] (n <= length) для _count_with_minimums с кэшем
+    
+    Ключ — пары (размер группы, минимум) в каноническом порядке, таблица
+    строится поверх таблицы без последней группы, поэтому наборы с общими
+    группами разделяют вычисления. Более длинная таблица отвечает и на
+    запросы меньших длин.
+    """
+    key = (sizes, minimums)
+    table = _minimum_tables.get(key)
+    if table is not None and len(table) > length:
+        return table
+    if not sizes:
+        table = [1] + [0] * length
+    else:
+        prev = _minimum_table(sizes[:-1], minimums[:-1], length)
+        size, minimum = sizes[-1], minimums[-1]
+        powers = [size ** k for k in range(length + 1)]
+        comb = math.comb
+        table = [sum(comb(n, k) * powers[k] * prev[n - k] for k in range(minimum, n + 1))
+                 for n in range(length + 1)]
+    if len(_minimum_tables) >= _KEYSPACE_CACHE_SIZE:
+        _minimum_tables.clear()
+    _minimum_tables[key] = table
+    return table
+
+
+def _count_with_runs(length, sizes, minimums, max_run, marks, start, end):
+    """Число строк с минимумами по группам и сериями не длиннее max_run
+    
+    Символы внутри группы равноправны, кроме отмеченных marks (индексы
+    групп последнего символа префикса и первого символа суффикса): для
+    остальных состояние — (группа, длина серии), для отмеченных — сам
+    символ. start = (номер отметки, серия префикса) задает серию перед
+    строкой, end — серию суффикса, которую продолжает последний символ.
+    Счетчики групп в состоянии ограничены сверху минимумами.
+    """
+    key = (length, sizes, minimums, max_run, marks, start, end)
+    result = _run_counts.get(key)
+    if result is not None:
+        return result
+    
+    generic = [size - marks.count(group) for group, size in enumerate(sizes)]
+    # Кандидаты следующего символа: (тождество, группа, число способов)
+    moves = [(('g', group), group, n) for group, n in enumerate(generic) if n]
+    moves += [(('d', i), group, 1) for i, group in enumerate(marks)]
+    
+    if start is not None:
+        states = {(('d', start[0]), start[1], (0,) * len(sizes)): 1}
+    else:
+        states = {(None, 0, (0,) * len(sizes)): 1}
+    for _ in range(length):
+        following = {}
+        for (ident, run, counts), ways in states.items():
+            for target, group, n in moves:
+                next_counts = counts
+                if counts[group] < minimums[group]:
+                    next_counts = counts[:group] + (counts[group] + 1,) + counts[group + 1:]
+                if target == ident:
+                    # Один из n символов продолжает серию, остальные начинают новую
+                    if run < max_run:
+                        state = (target, run + 1, next_counts)
+                        following[state] = following.get(state, 0) + ways
+                    n -= 1
+                if n:
+                    state = (target, 1, next_counts)
+                    following[state] = following.get(state, 0) + ways * n
+        states = following
+    
+    result = 0
+    for (ident, run, counts), ways in states.items():
+        if counts != minimums:
+            continue
+        if end is not None and ident == ('d', end[0]) and run + end[1] > max_run:
+            continue
+        result += ways
+    if len(_run_counts) >= _KEYSPACE_CACHE_SIZE:
+        _run_counts.clear()
+    _run_counts[key] = result
+    return result
+
+
+def _class_groups(chars, forbidden=''):
+    """Символы алфавита без forbidden по классам: {CLASS_*: строка}; с кэшем"""
+    key = (chars, forbidden)
+    groups = _class_group_cache.get(key)
+    if groups is None:
+        groups = {}
+        for c in chars:
+            if c not in forbidden:
+                groups[_char_class(c)] = groups.get(_char_class(c), '') + c
+        if len(_class_group_cache) >= _KEYSPACE_CACHE_SIZE:
+            _class_group_cache.clear()
+        _class_group_cache[key] = groups
+    return groups
+
+
+def policy_keyspace(level, length, policy=None):
+    """Точное число различных паролей уровня level и длины length по политике
+    
+    Считаются все строки из алфавита уровня без запрещенных символов
+    с заданными префиксом и суффиксом, выполняющие минимумы классов
+    (с учетом символов префикса и суффикса) и ограничение серий max_run.
+    Невыполнимая политика дает 0. Таблицы подсчета кэшируются, так что
+    повторные оценки с теми же классами и минимумами почти бесплатны.
+    """
+    if length < 0:
+        raise ValueError("Длина пароля не может быть отрицательной")
+    if policy is None:
+        return level.size ** length
+    
+    fixed = policy.prefix + policy.suffix
+    body_length = length - len(fixed)
+    if body_length < 0:
+        return 0
+    groups = _class_groups(level.chars, policy.forbidden)
+    
+    minimums = policy.minimums()
+    pairs = []
+    for cls, _ in _POLICY_CLASSES:
+        need = max(0, minimums[cls] - sum(_char_class(c) == cls for c in fixed))
+        size = len(groups.get(cls, ()))
+        if need > body_length or (need and not size):
+            return 0
+        if size:
+            pairs.append((cls, size, need))
+    
+    max_run = policy.max_run
+    if max_run is None:
+        pairs.sort(key=lambda pair: pair[1:])
+        sizes = tuple(size for _, size, _ in pairs)
+        needs = tuple(need for _, _, need in pairs)
+        return _minimum_table(sizes, needs, body_length)[body_length]
+    
+    if _longest_run(policy.prefix) > max_run or _longest_run(policy.suffix) > max_run:
+        return 0
+    if not body_length:
+        return 1 if _longest_run(fixed) <= max_run else 0
+    
+    order = {cls: i for i, (cls, _, _) in enumerate(pairs)}
+    marks = []
+    
+    def mark(c, run):
+        if not c or c not in groups.get(_char_class(c), ()):
+            return None
+        if c not in marks:
+            marks.append(c)
+        return marks.index(c), run
+    
+    prefix, suffix = policy.prefix, policy.suffix
+    start = mark(prefix[-1:], len(prefix) - len(prefix.rstrip(prefix[-1:])) if prefix else 0)
+    end = mark(suffix[:1], len(suffix) - len(suffix.lstrip(suffix[:1])) if suffix else 0)
+    return _count_with_runs(body_length, tuple(size for _, size, _ in pairs),
+                            tuple(need for _, _, need in pairs), max_run,
+                            tuple(order[_char_class(c)] for c in marks), start, end)
+
+
+UNIQUE_INDEX_MAGIC = b'PUI1'
+_UNIQUE_HEADER = struct.Struct('<4sQQQ16s')
+UNIQUE_MAX_LOAD = 0.75
+UNIQUE_BLOOM_HASHES = 5
+UNIQUE_MAX_STALLS = 100
+UNIQUE_MIN_CHUNK = 1024
+
+
+class UniqueIndex:
+    """Компактный индекс выданных значений для генерации без повторов
+    
+    Хранит не сами значения, а их 64-битные хэши blake2b с секретной солью
+    в таблице с открытой адресацией (линейное пробирование) поверх
+    array('Q'): 8 байт на ячейку, при заполнении не выше 75% — не больше
+    11 байт на значение, 10^8 значений занимают 1 ГиБ. Совпадение хэшей
+    разных значений лишь отбраковывает новое значение, но никогда не
+    пропускает повтор. Необязательный фильтр Блума (байт на ячейку)
+    отсекает заведомо новые значения при проверке `in` без обращения
+    к таблице.
+    """
+    __slots__ = ('_salt', '_hasher', '_table', '_mask', '_count', '_bloom', '_max_bytes')
+    
+    def __init__(self, capacity=1024, bloom=False, max_bytes=None, salt=None):
+        if salt is None:
+            salt = os.urandom(16)
+        if len(salt) != 16:
+            raise ValueError("Соль индекса должна быть длиной 16 байт")
+        from hashlib import blake2b
+        
+        self._salt = salt
+        self._hasher = blake2b(digest_size=8, key=salt)
+        self._max_bytes = max_bytes
+        self._count = 0
+        self._bloom = bytearray() if bloom else None
+        self._allocate(self._slots_for(capacity))
+    
+    @staticmethod
+    def _slots_for(entries):
+        """Наименьшая степень двойки, вмещающая entries при допустимом заполнении"""
+        slots = 1024
+        while slots * UNIQUE_MAX_LOAD < entries:
+            slots *= 2
+        return slots
+    
+    def _check_budget(self, slots):
+        bloom_bytes = slots if self._bloom is not None else 0
+        if self._max_bytes is not None and 8 * slots + bloom_bytes > self._max_bytes:
+            raise ValueError(f"Индекс уникальности превысил лимит памяти {self._max_bytes} байт")
+    
+    def _allocate(self, slots):
+        self._check_budget(slots)
+        self._table = array('Q', bytes(8 * slots))
+        self._mask = slots - 1
+        if self._bloom is not None:
+            self._bloom = bytearray(slots)
+    
+    def _hash(self, value):
+        hasher = self._hasher.copy()
+        hasher.update(value.encode('utf-8'))
+        # Ноль обозначает пустую ячейку
+        return int.from_bytes(hasher.digest(), 'little') or 1
+    
+    def _bloom_bits(self, h):
+        """Номера битов фильтра Блума по двойному хэшированию половин хэша"""
+        mask = len(self._bloom) * 8 - 1
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) & mask for i in range(UNIQUE_BLOOM_HASHES)]
+    
+    def _insert(self, h):
+        """Вставить хэш; False, если он уже есть"""
+        table, mask = self._table, self._mask
+        slot = h & mask
+        current = table[slot]
+        while current and current != h:
+            slot = (slot + 1) & mask
+            current = table[slot]
+        if current:
+            return False
+        table[slot] = h
+        self._count += 1
+        return True
+    
+    def reserve(self, entries):
+        """Заранее расширить таблицу под entries значений"""
+        slots = self._slots_for(entries)
+        if slots <= len(self._table):
+            return
+        old = self._table
+        self._allocate(slots)
+        self._count = 0
+        for h in old:
+            if h:
+                self._insert(h)
+                if self._bloom is not None:
+                    self._set_bloom(h)
+    
+    def _set_bloom(self, h):
+        bloom = self._bloom
+        for bit in self._bloom_bits(h):
+            bloom[bit >> 3] |= 1 << (bit & 7)
+    
+    def add(self, value):
+        """Запомнить значение; False, если оно уже выдавалось"""
+        return bool(self.filter((value,)))
+    
+    def filter(self, values, limit=None):
+        """Оставить из values только новые значения и запомнить их
+        
+        Основной путь для пакетов: таблица расширяется один раз на весь
+        пакет, а хэширование и пробирование идут в одном цикле. С limit
+        обработка останавливается после limit новых значений, остальные
+        не запоминаются.
+        """
+        if limit is None:
+            limit = len(values)
+        self.reserve(self._count + min(limit, len(values)))
+        table, mask = self._table, self._mask
+        hasher = self._hasher
+        from_bytes = int.from_bytes
+        set_bloom = self._set_bloom if self._bloom is not None else None
+        fresh = []
+        for value in values:
+            state = hasher.copy()
+            state.update(value.encode('utf-8'))
+            h = from_bytes(state.digest(), 'little') or 1
+            slot = h & mask
+            current = table[slot]
+            while current and current != h:
+                slot = (slot + 1) & mask
+                current = table[slot]
+            if current:
+                continue
+            table[slot] = h
+            fresh.append(value)
+            if set_bloom is not None:
+                set_bloom(h)
+            if len(fresh) == limit:
+                break
+        self._count += len(fresh)
+        return fresh
+    
+    def discard(self, values):
+        """Забыть значения, например записанные, но так и не выданные
+        
+        Ячейка освобождается обратным сдвигом следующих за ней значений
+        цепочки, поэтому пробирование остальных не нарушается. Биты фильтра
+        Блума не сбрасываются: он лишь реже отсекает проверку по таблице.
+        """
+        table, mask = self._table, self._mask
+        for value in values:
+            h = self._hash(value)
+            slot = h & mask
+            while table[slot] and table[slot] != h:
+                slot = (slot + 1) & mask
+            if not table[slot]:
+                continue
+            hole = slot
+            while True:
+                slot = (slot + 1) & mask
+                current = table[slot]
+                if not current:
+                    break
+                home = current & mask
+                # Значение остается, если его исходная ячейка лежит в (hole, slot]
+                if (home - hole - 1) & mask < (slot - hole) & mask:
+                    continue
+                table[hole] = current
+                hole = slot
+            table[hole] = 0
+            self._count -= 1
+    
+    def __contains__(self, value):
+        table, mask = self._table, self._mask
+        h = self._hash(value)
+        bloom = self._bloom
+        if bloom is not None:
+            for bit in self._bloom_bits(h):
+                if not bloom[bit >> 3] >> (bit & 7) & 1:
+                    return False
+        slot = h & mask
+        while table[slot]:
+            if table[slot] == h:
+                return True
+            slot = (slot + 1) & mask
+        return False
+    
+    def __len__(self):
+        return self._count
+    
+    def memory_bytes(self):
+        """Объем таблицы и фильтра Блума в байтах"""
+        return 8 * len(self._table) + (len(self._bloom) if self._bloom is not None else 0)
+    
+    def save(self, path):
+        """Атомарно сохранить индекс в файл (заголовок, таблица, фильтр Блума)"""
+        table = self._table
+        if sys.byteorder == 'big':
+            table = array('Q', table)
+            table.byteswap()
+        bloom = self._bloom if self._bloom is not None else b''
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_UNIQUE_HEADER.pack(UNIQUE_INDEX_MAGIC, len(table), self._count,
+                                        len(bloom), self._salt))
+            table.tofile(f)
+            f.write(bloom)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path, max_bytes=None):
+        """Загрузить индекс, сохраненный save()"""
+        with open(path, 'rb') as f:
+            header = f.read(_UNIQUE_HEADER.size)
+            if len(header) != _UNIQUE_HEADER.size:
+                raise ValueError("Файл индекса уникальности поврежден")
+            magic, slots, count, bloom_size, salt = _UNIQUE_HEADER.unpack(header)
+            if magic != UNIQUE_INDEX_MAGIC or slots & (slots - 1) or bloom_size not in (0, slots):
+                raise ValueError("Файл индекса уникальности поврежден")
+            index = cls(1024, bool(bloom_size), max_bytes, salt)
+            index._check_budget(slots)
+            table = array('Q')
+            try:
+                table.fromfile(f, slots)
+            except EOFError:
+                raise ValueError("Файл индекса уникальности поврежден") from None
+            if sys.byteorder == 'big':
+                table.byteswap()
+            index._table = table
+            index._mask = slots - 1
+            if bloom_size:
+                index._bloom = bytearray(f.read(bloom_size))
+                if len(index._bloom) != bloom_size:
+                    raise ValueError("Файл индекса уникальности поврежден")
+        index._count = count
+        return index
+
+
+def _check_unique_space(level, length, count, index, policy):
+    """Проверить, что пространство паролей вмещает count различных значений
+    
+    Размер пространства с учетом политики дает policy_keyspace. Занятые
+    значения индекса не вычитаются: в нем могут быть пароли другой длины,
+    уровня или политики. Исчерпание уже занятой части обнаруживает
+    _generate_unique_chunk по пределу UNIQUE_MAX_STALLS.
+    """
+    if policy_keyspace(level, length, policy) < count:
+        raise ValueError(f"Существует меньше {count} различных паролей длины {length} "
+                         f"уровня '{level.name}'")
+
+
+PATTERN_CLASSES = {
+    'l': ASCII_LOWERCASE,
+    'U': ASCII_UPPERCASE,
+    'L': ASCII_LETTERS,
+    'D': DIGITS,
+    'S': PUNCTUATION,
+    'A': ASCII_LETTERS + DIGITS,
+    '*': ASCII_LETTERS + DIGITS + PUNCTUATION,
+}
+PATTERN_MAX_LENGTH = 1024
+_PATTERN_CACHE_SIZE = 256
+_pattern_cache = {}
+
+
+def _parse_pattern_class(pattern, i):
+    """Разобрать набор [...] с позиции i после '['; вернуть символы и позицию после ']'"""
+    negate = pattern.startswith('^', i)
+    if negate:
+        i += 1
+    chars = []
+    while True:
+        if i >= len(pattern):
+            raise ValueError("Незакрытый набор символов '[' в маске")
+        c = pattern[i]
+        if c == ']' and chars:
+            i += 1
+            break
+        if c == '\\':
+            if i + 1 >= len(pattern):
+                raise ValueError("Маска заканчивается на '\\'")
+            c = pattern[i + 1]
+            i += 1
+        i += 1
+        if pattern.startswith('-', i) and i + 1 < len(pattern) and pattern[i + 1] != ']':
+            end = pattern[i + 1]
+            if end == '\\':
+                if i + 2 >= len(pattern):
+                    raise ValueError("Маска заканчивается на '\\'")
+                end = pattern[i + 2]
+                i += 1
+            if ord(end) < ord(c):
+                raise ValueError(f"Неверный диапазон {c}-{end} в маске")
+            chars.extend(chr(code) for code in range(ord(c), ord(end) + 1))
+            i += 2
+        else:
+            chars.append(c)
+    if negate:
+        excluded = set(chars)
+        chars = [c for c in PATTERN_CLASSES['*'] if c not in excluded]
+    chars = ''.join(dict.fromkeys(chars))
+    if not chars:
+        raise ValueError("Пустой набор символов в маске")
+    return chars, i
+
+
+def _parse_pattern(pattern):
+    """Разобрать маску в список алфавитов позиций
+    
+    Классы: l (строчные), U (заглавные), L (буквы), D (цифры),
+    S (спецсимволы), A (буквы и цифры), * (все). Набор [...] поддерживает
+    диапазоны a-z и отрицание [^...], {n} повторяет предыдущий элемент,
+    \\ экранирует следующий символ, остальные символы — литералы
+    (алфавит из одного символа). Длина пароля по маске ограничена
+    PATTERN_MAX_LENGTH; повтор проверяется до того, как будет развернут.
+    """
+    positions = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if i + 1 >= len(pattern):
+                raise ValueError("Маска заканчивается на '\\'")
+            positions.append(pattern[i + 1])
+            i += 2
+        elif c == '[':
+            chars, i = _parse_pattern_class(pattern, i + 1)
+            positions.append(chars)
+        elif c == '{':
+            end = pattern.find('}', i)
+            if end < 0:
+                raise ValueError("Незакрытый повтор '{' в маске")
+            count = pattern[i + 1:end]
+            if not count.isdigit():
+                raise ValueError(f"Повтор {{{count}}} в маске должен быть неотрицательным числом")
+            if not positions:
+                raise ValueError("Повтор {n} в маске без предшествующего элемента")
+            if len(positions) - 1 + int(count) > PATTERN_MAX_LENGTH:
+                raise ValueError(f"Маска задает пароль длиннее {PATTERN_MAX_LENGTH} символов")
+            last = positions.pop()
+            positions.extend([last] * int(count))
+            i = end + 1
+        else:
+            positions.append(PATTERN_CLASSES.get(c, c))
+            i += 1
+    if len(positions) > PATTERN_MAX_LENGTH:
+        raise ValueError(f"Маска задает пароль длиннее {PATTERN_MAX_LENGTH} символов")
+    return positions
+
+
+class PasswordPattern:
+    """Скомпилированная маска пароля
+    
+    Позиции с одинаковым алфавитом объединены в группы с общим уровнем
+    (таблицами выборки), литералы заранее записаны в шаблон строки.
+    keyspace — точное число различных паролей, entropy — его log2.
+    """
+    __slots__ = ('pattern', 'length', 'positions', 'groups', 'template', 'keyspace', 'entropy')
+    
+    def __init__(self, pattern):
+        if not pattern:
+            raise ValueError("Маска не может быть пустой")
+        if not pattern.isascii():
+            raise ValueError("Маска должна состоять из ASCII-символов")
+        positions = _parse_pattern(pattern)
+        if not positions:
+            raise ValueError("Маска не задает ни одной позиции")
+        
+        groups = {}
+        template = bytearray(len(positions))
+        for p, chars in enumerate(positions):
+            if len(chars) == 1:
+                template[p] = ord(chars)
+            else:
+                groups.setdefault(chars, []).append(p)
+        # Степень на группу вместо умножения по позициям: без квадратичного роста
+        keyspace = math.prod(len(chars) ** len(ps) for chars, ps in groups.items())
+        
+        self.pattern = pattern
+        self.length = len(positions)
+        self.positions = tuple(positions)
+        self.groups = tuple((ComplexityLevel(f'pattern:{chars}', 'Позиции маски', chars, 0), tuple(ps))
+                            for chars, ps in groups.items())
+        self.template = bytes(template)
+        self.keyspace = keyspace
+        self.entropy = math.log2(keyspace)
+    
+    def __repr__(self):
+        return f"PasswordPattern({self.pattern!r}, length={self.length}, entropy={self.entropy:.1f})"
+
+
+def compile_pattern(pattern):
+    """Скомпилировать маску с кэшированием последних _PATTERN_CACHE_SIZE масок
+    
+    Кэш — словарь в порядке использования: при попадании маска
+    переставляется в конец, при переполнении удаляется первая.
+    """
+    compiled = _pattern_cache.pop(pattern, None)
+    if compiled is None:
+        compiled = PasswordPattern(pattern)
+        if len(_pattern_cache) >= _PATTERN_CACHE_SIZE:
+            del _pattern_cache[next(iter(_pattern_cache))]
+    _pattern_cache[pattern] = compiled
+    return compiled
+
+
+def _make_pattern_passwords(plan, count, read=os.urandom, stats=None):
+    """Сгенерировать count паролей по скомпилированной маске
+    
+    Байты для всех групп берутся одним чтением источника энтропии; каждая
+    группа отображает свой участок через bytes.translate и только при
+    нехватке после отбраковки дочитывает остаток. Символы позиции
+    записываются в общий буфер расширенным срезом out[p::length],
+    который и становится буфером PasswordBatch.
+    """
+    length = plan.length
+    if not plan.groups or count == 0:
+        return PasswordBatch(plan.template * count, length, count)
+    
+    needs = [count * len(positions) for _, positions in plan.groups]
+    sizes = [need * 256 // level.threshold + need // 32 + 64
+             for (level, _), need in zip(plan.groups, needs)]
+    raw = read(sum(sizes))
+    
+    out = bytearray(plan.template * count)
+    offset = 0
+    for (level, positions), need, size in zip(plan.groups, needs, sizes):
+        if stats is not None:
+            start = time.perf_counter()
+        chars = raw[offset:offset + size].translate(level.table, level.reject)
+        if stats is not None:
+            stats.observe('map', time.perf_counter() - start)
+            stats.count('rejected_bytes', size - len(chars))
+        offset += size
+        if len(chars) < need:
+            chars += _sample_chars(level, need - len(chars), read, stats)
+        view = memoryview(chars)
+        for j, p in enumerate(positions):
+            out[p::length] = view[j * count:(j + 1) * count]
+    return PasswordBatch(out, length, count)
+
+
+STATS_BUCKETS = 40
+
+
+class Histogram:
+    """Гистограмма длительностей с корзинами по степеням двойки микросекунд
+    
+    Корзина i хранит замеры длительностью от 2^(i-1) до 2^i мкс, поэтому
+    запись — одно сложение без сортировки, а квантили приблизительны
+    с точностью до корзины.
+    """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * STATS_BUCKETS
+    
+    def record(self, seconds):
+        """Добавить замер в секундах"""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), STATS_BUCKETS - 1)] += 1
+    
+    def percentile(self, q):
+        """Верхняя граница корзины с квантилем q в микросекундах"""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return float(1 << i)
+        return 0.0
+    
+    def snapshot(self):
+        """Сводка: число замеров, сумма, среднее, p50, p99 и максимум"""
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1e3,
+            'mean_us': self.total * 1e6 / self.count if self.count else 0.0,
+            'p50_us': self.percentile(0.5),
+            'p99_us': self.percentile(0.99),
+            'max_us': self.max * 1e6,
+        }
+
+
+class GeneratorStats:
+    """Счетчики и гистограммы времени горячих участков генератора
+    
+    Заполняется только при PasswordGenerator(stats=True). Участки:
+    entropy_read (чтения источника энтропии), map (отображение байтов
+    на алфавит), generate (пакет целиком), score и score_batch (оценка
+    сложности), write (запись потокового вывода).
+    """
+    __slots__ = ('counters', 'histograms')
+    
     def __init__(self):
-        self.complexity_levels = [
-            {
-                'name': 'low',
-                'description': 'Только буквы (нижний регистр)',
-                'chars': string.ascii_lowercase,
-                'min_length': 4
-            },
-            {
-                'name': 'medium',
-                'description': 'Буквы верхнего и нижнего регистра',
-                'chars': string.ascii_letters,
-                'min_length': 6
-            },
-            {
-                'name': 'high',
-                'description': 'Буквы + цифры',
-                'chars': string.ascii_letters + string.digits,
-                'min_length': 8
-            },
-            {
-                'name': 'very-high',
-                'description': 'Буквы + цифры + специальные символы',
-                'chars': string.ascii_letters + string.digits + string.punctuation,
-                'min_length': 10
-            }
-        ]
+        self.counters = {}
+        self.histograms = {}
+    
+    def count(self, name, n=1):
+        """Увеличить счетчик name на n"""
+        self.counters[name] = self.counters.get(name, 0) + n
+    
+    def observe(self, name, seconds):
+        """Добавить замер времени участка name"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(seconds)
+    
+    def reset(self):
+        """Обнулить все счетчики и гистограммы"""
+        self.counters.clear()
+        self.histograms.clear()
+    
+    def snapshot(self):
+        """Счетчики и сводки гистограмм в виде словаря"""
+        return {
+            'counters': dict(self.counters),
+            'timings': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+    
+    def summary(self):
+        """Текстовая сводка для вывода при завершении"""
+        lines = ["📊 Статистика генератора:"]
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"   {name:20} {value:>14,}")
+        if self.histograms:
+            lines.append(f"   {'участок':20} {'вызовов':>10} {'всего, мс':>11} {'сред., мкс':>11} "
+                         f"{'p50, мкс':>10} {'p99, мкс':>10} {'макс., мкс':>11}")
+            for name, histogram in sorted(self.histograms.items()):
+                s = histogram.snapshot()
+                lines.append(f"   {name:20} {s['count']:>10,} {s['total_ms']:>11,.1f} {s['mean_us']:>11,.1f} "
+                             f"{s['p50_us']:>10,.0f} {s['p99_us']:>10,.0f} {s['max_us']:>11,.1f}")
+        return '\n'.join(lines)
+
+
+class _InstrumentedEntropy:
+    """Обертка источника энтропии, замеряющая чтения"""
+    __slots__ = ('source', 'stats')
+    
+    def __init__(self, source, stats):
+        self.source = source
+        self.stats = stats
+    
+    def read(self, n):
+        start = time.perf_counter()
+        data = self.source.read(n)
+        self.stats.observe('entropy_read', time.perf_counter() - start)
+        self.stats.count('entropy_bytes', n)
+        return data
+    
+    def fork(self, key):
+        # Процессы-воркеры статистику не собирают
+        return self.source.fork(key)
+
+
+class _InstrumentedWriter:
+    """Обертка потока вывода, замеряющая записи"""
+    __slots__ = ('out', 'stats')
+    
+    def __init__(self, out, stats):
+        self.out = out
+        self.stats = stats
+    
+    def write(self, text):
+        start = time.perf_counter()
+        result = self.out.write(text)
+        self.stats.observe('write', time.perf_counter() - start)
+        self.stats.count('written_chars', len(text))
+        return result
+    
+    def flush(self):
+        return self.out.flush()
+
+
+def profile_call(func, dump=None, out=None, memory=True, top=15):
+    """Выполнить func() под cProfile (и tracemalloc) и вывести отчет
+    
+    Отчет — top функций по суммарному времени и, при memory, top строк
+    по объему выделенной памяти и пиковый объем — печатается в out
+    (по умолчанию stderr). При dump профиль сохраняется в файл для
+    pstats или snakeviz. Возвращает результат func().
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+    
+    out = out if out is not None else sys.stderr
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            result = func()
+        finally:
+            profiler.disable()
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    
+    if dump:
+        profiler.dump_stats(dump)
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+    if memory:
+        print(f"Пик памяти: {peak / 1024:,.0f} КиБ", file=out)
+        for stat in snapshot.statistics('lineno')[:top]:
+            print(f"   {stat}", file=out)
+    return result
+
+
+class PasswordGenerator:
+    def __init__(self, entropy=None, stats=False):
+        # Уровни предвычислены при импорте; копия реестра позволяет
+        # добавлять собственные уровни, не затрагивая другие генераторы
+        self.complexity_levels = DEFAULT_COMPLEXITY_LEVELS.copy()
+        # Источник энтропии: объект с методами read(n) и fork(key) или имя
+        # из ENTROPY_SOURCES; по умолчанию общий буферизованный источник ОС
+        if entropy is None:
+            entropy = _default_entropy()
+        elif isinstance(entropy, str):
+            entropy = make_entropy_source(entropy)
+        # Инструментирование включается явно; выключенное стоит одной
+        # проверки на пакет или оценку
+        self._stats = GeneratorStats() if stats else None
+        if stats:
+            entropy = _InstrumentedEntropy(entropy, self._stats)
+        self.entropy = entropy
+        self._policy_plans = {}
     
     def get_complexity_by_index(self, index):
         """Получить уровень сложности по индексу"""
@@ -40,29 +2343,360 @@ class PasswordGenerator:
     
     def get_complexity_by_name(self, name):
         """Получить уровень сложности по имени"""
-        for level in self.complexity_levels:
-            if level['name'] == name:
-                return level
-        return None
+        return self.complexity_levels.by_name(name)
+    
+    def _resolve_level(self, name, count, length, stream=False):
+        """Уровень сложности по имени с проверкой количества и длины
+        
+        Для длины меньше рекомендуемой печатает предупреждение: в stdout
+        или, при stream (stdout занят данными), в stderr.
+        """
+        level = self.get_complexity_by_name(name)
+        if level is None:
+            raise ValueError(f"Неизвестный уровень сложности: {name}")
+        if count < 0 or length < 0:
+            raise ValueError("Количество и длина паролей не могут быть отрицательными")
+        if length < level.min_length:
+            print(f"⚠️  Внимание: для сложности '{name}' рекомендуется длина не менее {level.min_length} символов",
+                  file=sys.stderr if stream else sys.stdout)
+        return level
+    
+    def add_custom_complexity(self, name, description, chars, min_length,
+                              exclude='', exclude_ambiguous=False):
+        """Зарегистрировать собственный уровень сложности
+        
+        Символы из exclude (и AMBIGUOUS_CHARS при exclude_ambiguous)
+        удаляются из алфавита до предвычисления таблиц.
+        """
+        if exclude_ambiguous:
+            exclude += AMBIGUOUS_CHARS
+        level = ComplexityLevel(name, description, chars, min_length, exclude)
+        return self.complexity_levels.register(level)
+    
+    def generate_password(self, length, complexity_name, policy=None):
+        """Генерация пароля заданной длины и сложности
+        
+        С политикой PasswordPolicy пароль сразу собирается по ее требованиям.
+        """
+        if policy is not None:
+            return self.generate_policy_batch(1, length, complexity_name, policy)[0]
+        complexity = self._resolve_level(complexity_name, 1, length)
+        return self._generate_chunk(complexity, 1, length)[0]
+    
+    def generate_batch(self, count, length, complexity_name):
+        """Пакетная генерация count паролей за одно чтение энтропии"""
+        complexity = self._resolve_level(complexity_name, count, length)
+        return self._generate_chunk(complexity, count, length)
+    
+    def _generate_chunk(self, complexity, count, length, policy=None):
+        """Сгенерировать пакет без проверок и предупреждений"""
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+        if policy is not None:
+            passwords = _make_policy_passwords(self._policy_plan(complexity, length, policy), count,
+                                               self.entropy.read, stats)
+        else:
+            passwords = _make_passwords(complexity, count, length, self.entropy.read, stats)
+        if stats is not None:
+            stats.observe('generate', time.perf_counter() - start)
+            stats.count('passwords', count)
+        return passwords
+    
+    def _policy_plan(self, complexity, length, policy):
+        """План генерации по политике; кэшируется по уровню, длине и политике"""
+        key = (complexity.name, length, policy)
+        plan = self._policy_plans.get(key)
+        if plan is None:
+            if len(self._policy_plans) >= 256:
+                self._policy_plans.clear()
+            plan = self._policy_plans[key] = _PolicyPlan(complexity, length, policy)
+        return plan
+    
+    def generate_policy_batch(self, count, length, complexity_name, policy):
+        """Пакетная генерация count паролей, удовлетворяющих политике
+        
+        Каждый пароль строится за один проход: обязательные символы классов
+        и свободные символы выбираются без смещения и перемешиваются,
+        поэтому повторная генерация до выполнения требований не нужна.
+        """
+        complexity = self._resolve_level(complexity_name, count, length)
+        # План строится заранее только ради проверки политики; _generate_chunk возьмет его из кэша
+        self._policy_plan(complexity, length, policy)
+        return self._generate_chunk(complexity, count, length, policy)
+    
+    def generate_unique_batch(self, count, length, complexity_name, index, policy=None):
+        """Пакетная генерация count паролей, которых еще нет в индексе index
+        
+        Повторы (в том числе внутри пакета) отбрасываются и догенерируются,
+        выданные пароли запоминаются в индексе UniqueIndex.
+        """
+        complexity = self._resolve_level(complexity_name, count, length)
+        if policy is not None:
+            self._policy_plan(complexity, length, policy)
+        _check_unique_space(complexity, length, count, index, policy)
+        return self._generate_unique_chunk(complexity, count, length, index, policy)
+    
+    def _generate_unique_chunk(self, complexity, count, length, index, policy=None):
+        """Догенерировать пакет до count новых для индекса паролей
+        
+        Добор идет пакетами не меньше UNIQUE_MIN_CHUNK, чтобы почти
+        заполненное пространство не исчерпывало лимит попыток; лишние
+        пароли отбрасываются, не попадая в индекс. При ошибке уже
+        записанные в индекс пароли пакета удаляются из него. Новые пароли
+        собираются в один PasswordBatch.
+        """
+        passwords = []
+        stalls = 0
+        try:
+            while len(passwords) < count:
+                need = count - len(passwords)
+                fresh = index.filter(self._generate_chunk(complexity, max(need, UNIQUE_MIN_CHUNK), length, policy),
+                                     need)
+                stalls = 0 if fresh else stalls + 1
+                if stalls >= UNIQUE_MAX_STALLS:
+                    raise ValueError("Не удается получить новые пароли: пространство значений почти исчерпано")
+                passwords.extend(fresh)
+        except BaseException:
+            # Пакет не выдан: его пароли не должны считаться израсходованными
+            index.discard(passwords)
+            raise
+        return PasswordBatch(''.join(passwords).encode('ascii'), length, count)
+    
+    def keyspace(self, length, complexity_name, policy=None):
+        """Точное число различных паролей длины length уровня по политике policy"""
+        complexity = self.get_complexity_by_name(complexity_name)
+        if complexity is None:
+            raise ValueError(f"Неизвестный уровень сложности: {complexity_name}")
+        return policy_keyspace(complexity, length, policy)
+    
+    def entropy_bits(self, length, complexity_name, policy=None):
+        """log2 размера пространства паролей, удовлетворяющих политике
+        
+        Это энтропия равновероятного выбора из keyspace, а не энтропия
+        вывода генератора: сборка по политике (обязательные символы,
+        перемешивание, разбиение серий) выбирает допустимые пароли
+        неравновероятно, и ее энтропия может быть ниже. Без политики
+        генерация равновероятна и значения совпадают. Для невыполнимой
+        политики (пустого пространства) возвращается 0.
+        """
+        keyspace = self.keyspace(length, complexity_name, policy)
+        return math.log2(keyspace) if keyspace else 0.0
     
-    def generate_password(self, length, complexity_name):
-        """Генерация пароля заданной длины и сложности"""
+    def policy_retry_attempts(self, length, complexity_name, policy):
+        """Ожидаемое число генераций на один принятый пароль при переборе
+        
+        Считается точно для прежней схемы: пароль целиком из алфавита уровня,
+        повтор, пока не выполнены минимумы, запреты, префикс и суффикс.
+        Ограничение max_run не учитывается, так что с ним это нижняя оценка.
+        Сборка по политике всегда требует ровно одной генерации. Отношение
+        считается в целых числах; больше диапазона float — math.inf.
+        Для length > POLICY_ESTIMATE_MAX_LENGTH квадратичная динамика не
+        запускается, и возвращается нижняя оценка без учета минимумов.
+        """
         complexity = self.get_complexity_by_name(complexity_name)
         if complexity is None:
             raise ValueError(f"Неизвестный уровень сложности: {complexity_name}")
+        plan = self._policy_plan(complexity, length, policy)
+        fixed = policy.prefix + policy.suffix
+        if any(c not in complexity.chars for c in fixed):
+            return math.inf
+        
+        minimums = policy.minimums()
+        sizes, needs = [], []
+        for cls, group in plan.groups.items():
+            sizes.append(len(group))
+            needs.append(max(0, minimums.get(cls, 0) - sum(_char_class(c) == cls for c in fixed)))
+        if length > POLICY_ESTIMATE_MAX_LENGTH:
+            accepted = sum(sizes) ** plan.body_length
+        else:
+            accepted = _count_with_minimums(plan.body_length, sizes, needs)
+        if not accepted:
+            return math.inf
+        try:
+            return complexity.size ** length / accepted
+        except OverflowError:
+            return math.inf
+    
+    def generate_parallel(self, count, length, complexity_name, workers=None,
+                          chunk_size=STREAM_CHUNK_SIZE):
+        """Генерация count паролей пулом из workers процессов
+        
+        Возвращает итератор по пакетам PasswordBatch в порядке их
+        готовности. Каждый пакет получает собственную ветвь источника
+        энтропии генератора (entropy.fork).
+        """
+        workers = _check_workers(workers)
+        complexity = self._resolve_level(complexity_name, count, length)
+        return _run_parallel(complexity, count, length, workers, chunk_size, None,
+                             entropy=self.entropy)
+    
+    def stream_passwords(self, out, number, length, complexity_name, fmt='plain',
+                         chunk_size=STREAM_CHUNK_SIZE, workers=1, policy=None, unique=None):
+        """Потоковая запись number паролей в out пакетами по chunk_size
+        
+        Память не зависит от number: в каждый момент существует только
+        один пакет паролей и его текстовое представление. При workers > 1
+        пакеты готовят процессы пула, и номера записей в jsonl/csv идут
+        в порядке готовности пакетов, а не по возрастанию. С политикой
+        policy пароли собираются по ее требованиям, с индексом unique
+        выдаются только пароли, которых в нем еще нет.
+        """
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Неизвестный формат вывода: {fmt}")
+        workers = _check_workers(workers)
+        if unique is not None and workers > 1:
+            raise ValueError("Генерация без повторов не поддерживает несколько процессов")
+        complexity = self._resolve_level(complexity_name, number, length, stream=True)
+        plan = self._policy_plan(complexity, length, policy) if policy is not None else None
+        if unique is not None:
+            _check_unique_space(complexity, length, number, unique, policy)
+        if self._stats is not None:
+            out = _InstrumentedWriter(out, self._stats)
+        
+        if workers > 1:
+            if fmt == 'csv':
+                out.write('id,password\n')
+            for text in _run_parallel(complexity, number, length, workers, chunk_size, fmt, plan,
+                                      self.entropy):
+                out.write(text)
+            out.flush()
+            return
+        
+        if unique is not None:
+            make_chunk = lambda count: self._generate_unique_chunk(complexity, count, length, unique, policy)
+        else:
+            make_chunk = lambda count: self._generate_chunk(complexity, count, length, policy)
+        _write_stream(out, number, fmt, chunk_size, make_chunk)
+    
+    def export_passwords(self, out, number, length, complexity_name, fmt='jsonl', hash_name=None,
+                         hash_cost=None, workers=1, policy=None, unique=None, chunk_size=None):
+        """Экспорт number записей (id, пароль и необязательный хэш) в out
+        
+        Пароли генерируются пакетами в том же проходе, что и запись.
+        hash_name — 'pbkdf2' или 'scrypt', hash_cost — число итераций
+        PBKDF2 или параметр n scrypt (по умолчанию EXPORT_PBKDF2_ITERATIONS
+        и EXPORT_SCRYPT_N). Хэширование распределяется по workers процессам,
+        порядок записей сохраняется. По умолчанию пакет — EXPORT_CHUNK_SIZE
+        записей с хэшем или STREAM_CHUNK_SIZE без него.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+        if hash_name is not None and hash_name not in EXPORT_HASHES:
+            raise ValueError(f"Неизвестная схема хэширования: {hash_name}")
+        if chunk_size is None:
+            chunk_size = EXPORT_CHUNK_SIZE if hash_name is not None else STREAM_CHUNK_SIZE
+        if chunk_size < 1:
+            raise ValueError("Размер пакета должен быть не меньше 1")
+        workers = _check_workers(workers)
+        if hash_name is not None:
+            if hash_cost is None:
+                hash_cost = EXPORT_PBKDF2_ITERATIONS if hash_name == 'pbkdf2' else EXPORT_SCRYPT_N
+            if hash_cost < 1 or (hash_name == 'scrypt' and (hash_cost < 2 or hash_cost & (hash_cost - 1))):
+                raise ValueError("Стоимость хэширования: для pbkdf2 не меньше 1, для scrypt степень двойки не меньше 2")
+        complexity = self._resolve_level(complexity_name, number, length, stream=True)
+        if policy is not None:
+            self._policy_plan(complexity, length, policy)
+        if unique is not None:
+            _check_unique_space(complexity, length, number, unique, policy)
+        if self._stats is not None:
+            out = _InstrumentedWriter(out, self._stats)
+        
+        if unique is not None:
+            make_chunk = lambda count: self._generate_unique_chunk(complexity, count, length, unique, policy)
+        else:
+            make_chunk = lambda count: self._generate_chunk(complexity, count, length, policy)
+        _run_export(out, number, fmt, chunk_size, make_chunk, hash_name, hash_cost, workers)
+    
+    def generate_passphrase_batch(self, count, words=PASSPHRASE_WORDS, separator='-', wordlist=None):
+        """Пакетная генерация count парольных фраз из words слов
         
-        chars = complexity['chars']
-        min_length = complexity['min_length']
+        Номера слов для всего пакета берутся из одного блока энтропии,
+        а сами слова читаются из отображенного в память словаря.
+        """
+        if count < 0 or words < 1:
+            raise ValueError("Количество фраз не может быть отрицательным, а слов должно быть не меньше 1")
+        wordlist = wordlist if wordlist is not None else _default_wordlist()
+        if count == 0:
+            return []
+        picks = wordlist.take(_sample_indices(len(wordlist), count * words, self.entropy.read, self._stats))
+        join = separator.join
+        return [join(picks[i:i + words]) for i in range(0, count * words, words)]
+    
+    def generate_passphrase(self, words=PASSPHRASE_WORDS, separator='-', wordlist=None):
+        """Генерация одной парольной фразы (в духе diceware)"""
+        return self.generate_passphrase_batch(1, words, separator, wordlist)[0]
+    
+    def passphrase_entropy(self, words=PASSPHRASE_WORDS, wordlist=None):
+        """Энтропия парольной фразы в битах"""
+        wordlist = wordlist if wordlist is not None else _default_wordlist()
+        return words * math.log2(len(wordlist))
+    
+    def stream_passphrases(self, out, number, words=PASSPHRASE_WORDS, separator='-', fmt='plain',
+                           chunk_size=STREAM_CHUNK_SIZE, wordlist=None):
+        """Потоковая запись number парольных фраз в out пакетами по chunk_size"""
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Неизвестный формат вывода: {fmt}")
+        if number < 0:
+            raise ValueError("Количество фраз не может быть отрицательным")
+        if self._stats is not None:
+            out = _InstrumentedWriter(out, self._stats)
+        _write_stream(out, number, fmt, chunk_size,
+                      lambda count: self.generate_passphrase_batch(count, words, separator, wordlist))
+    
+    def generate_pattern_batch(self, count, pattern):
+        """Пакетная генерация count паролей по маске pattern
         
-        if length < min_length:
-            print(f"⚠️  Внимание: для сложности '{complexity_name}' рекомендуется длина не менее {min_length} символов")
+        Маска компилируется один раз (с кэшем), а символы всех позиций
+        пакета выбираются из одного блока энтропии.
+        """
+        if count < 0:
+            raise ValueError("Количество паролей не может быть отрицательным")
+        plan = compile_pattern(pattern)
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+        passwords = _make_pattern_passwords(plan, count, self.entropy.read, stats)
+        if stats is not None:
+            stats.observe('generate', time.perf_counter() - start)
+            stats.count('passwords', count)
+        return passwords
+    
+    def generate_from_pattern(self, pattern):
+        """Генерация одного пароля по маске (например, 'LLLL-DDDD-SSSS')"""
+        return self.generate_pattern_batch(1, pattern)[0]
+    
+    def stream_pattern_passwords(self, out, number, pattern, fmt='plain', chunk_size=STREAM_CHUNK_SIZE):
+        """Потоковая запись number паролей по маске pattern пакетами по chunk_size"""
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Неизвестный формат вывода: {fmt}")
+        if number < 0:
+            raise ValueError("Количество паролей не может быть отрицательным")
+        compile_pattern(pattern)
+        if self._stats is not None:
+            out = _InstrumentedWriter(out, self._stats)
+        _write_stream(out, number, fmt, chunk_size,
+                      lambda count: self.generate_pattern_batch(count, pattern))
+    
+    def calculate_strength(self, password, mode='classes'):
+        """Оценка сложности пароля
         
-        # Генерация пароля
-        password = ''.join(random.choice(chars) for _ in range(length))
-        return password
+        В режиме 'entropy' балл равен оценке энтропии estimate_entropy,
+        деленной на ENTROPY_BITS_PER_POINT (не более 8).
+        """
+        if self._stats is not None:
+            start = time.perf_counter()
+            score = self._score(password, mode)
+            self._stats.observe('score', time.perf_counter() - start)
+            return score
+        return self._score(password, mode)
     
-    def calculate_strength(self, password):
-        """Оценка сложности пароля"""
+    def _score(self, password, mode):
+        """Балл сложности без инструментирования"""
+        if mode == 'entropy':
+            return min(int(estimate_entropy(password) // ENTROPY_BITS_PER_POINT), 8)
+        if mode != 'classes':
+            raise ValueError(f"Неизвестный режим оценки: {mode}")
         strength = 0
         if any(c.islower() for c in password):
             strength += 1
@@ -70,66 +2704,878 @@ class PasswordGenerator:
             strength += 1
         if any(c.isdigit() for c in password):
             strength += 1
-        if any(c in string.punctuation for c in password):
+        if any(c in PUNCTUATION for c in password):
             strength += 1
         
         length_score = min(len(password) // 4, 3)  # Максимум 3 балла за длину
         return strength + length_score
     
+    def calculate_strength_batch(self, passwords, use_numpy=None, mode='classes'):
+        """Пакетная оценка сложности; возвращает array('B') с баллами 0-8
+        
+        Классы символов определяются по 256-элементной таблице за один
+        проход на пароль. При use_numpy=None NumPy используется, если он
+        установлен и все пароли состоят из ASCII-символов. В режиме
+        'entropy' NumPy отсеивает пароли без троек-шаблонов, и только
+        остальные разбираются estimate_entropy.
+        """
+        if self._stats is not None:
+            start = time.perf_counter()
+            scores = self._score_batch(passwords, use_numpy, mode)
+            self._stats.observe('score_batch', time.perf_counter() - start)
+            self._stats.count('scored', len(scores))
+            return scores
+        return self._score_batch(passwords, use_numpy, mode)
+    
+    def _score_batch(self, passwords, use_numpy, mode):
+        """Пакетная оценка без инструментирования"""
+        if mode not in STRENGTH_MODES:
+            raise ValueError(f"Неизвестный режим оценки: {mode}")
+        if mode == 'classes' and isinstance(passwords, PasswordBatch):
+            return passwords.strengths(use_numpy)
+        np = _numpy() if use_numpy is not False else None
+        if use_numpy and np is None:
+            raise ValueError("Для use_numpy=True требуется пакет numpy")
+        
+        if mode == 'entropy':
+            if np is not None and isinstance(passwords, PasswordBatch):
+                lengths = np.full(len(passwords), passwords.length, dtype=np.int64)
+                return _entropy_numpy(np, passwords.buffer, lengths, passwords.__getitem__)
+            passwords = list(passwords)
+            if np is not None and all(password.isascii() for password in passwords):
+                lengths = np.fromiter(map(len, passwords), dtype=np.int64, count=len(passwords))
+                return _entropy_numpy(np, ''.join(passwords).encode('ascii'), lengths,
+                                      passwords.__getitem__)
+            return array('B', (self._score(p, mode) for p in passwords))
+        
+        if np is not None:
+            passwords = list(passwords)
+            if all(password.isascii() for password in passwords):
+                return _strength_numpy(np, passwords)
+        
+        scores = array('B')
+        append = scores.append
+        for password in passwords:
+            if password.isascii():
+                append(_ascii_strength(password.encode('ascii')))
+            else:
+                append(self._score(password, 'classes'))
+        return scores
+    
+    def audit_file(self, path, min_strength=AUDIT_MIN_STRENGTH, on_weak=None,
+                   use_numpy=None, window_size=AUDIT_WINDOW_SIZE, mode='classes'):
+        """Оценить файл паролей (по одному в строке) через mmap
+        
+        Возвращает гистограмму из 9 счетчиков для баллов 0-8. Для каждой
+        строки с баллом ниже min_strength вызывается on_weak(смещение, балл).
+        Файл обрабатывается окнами по window_size байт, поэтому память
+        не зависит от его размера. Пустые строки пропускаются.
+        В режиме 'entropy' строки оцениваются по одной без NumPy.
+        """
+        if mode not in STRENGTH_MODES:
+            raise ValueError(f"Неизвестный режим оценки: {mode}")
+        np = _numpy() if use_numpy is not False and mode == 'classes' else None
+        if use_numpy and np is None:
+            raise ValueError("Для use_numpy=True требуется пакет numpy и режим 'classes'")
+        
+        def score_other(password):
+            return self.calculate_strength(password, mode)
+        
+        if mode == 'classes':
+            score_ascii = _ascii_strength
+        else:
+            def score_ascii(line):
+                return score_other(line.decode('ascii'))
+        
+        histogram = [0] * 9
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return histogram
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start, end in _audit_windows(mm, window_size):
+                    if np is not None:
+                        offsets, scores = _audit_window_numpy(np, mm, start, end, score_other)
+                        for score, count in enumerate(np.bincount(scores, minlength=9).tolist()):
+                            histogram[score] += count
+                        if on_weak is not None:
+                            for i in np.flatnonzero(scores < min_strength).tolist():
+                                on_weak(int(offsets[i]), int(scores[i]))
+                        continue
+                    for offset, score in _audit_window(mm, start, end, score_ascii, score_other):
+                        histogram[score] += 1
+                        if score < min_strength and on_weak is not None:
+                            on_weak(offset, score)
+        return histogram
+    
+    def stats(self, reset=False):
+        """Снимок счетчиков и гистограмм инструментирования
+        
+        Пустой словарь, если генератор создан без stats=True. С reset
+        статистика после снимка обнуляется.
+        """
+        if self._stats is None:
+            return {}
+        snapshot = self._stats.snapshot()
+        if reset:
+            self._stats.reset()
+        return snapshot
+    
+    def stats_summary(self):
+        """Текстовая сводка инструментирования или пустая строка"""
+        return self._stats.summary() if self._stats is not None else ''
+    
+    def profile_batch(self, count, length, complexity_name, dump=None, out=None, memory=True, top=15):
+        """Сгенерировать пакет под cProfile и tracemalloc и вывести отчет
+        
+        Параметры отчета — как у profile_call; возвращает пароли.
+        """
+        return profile_call(lambda: self.generate_batch(count, length, complexity_name),
+                            dump, out, memory, top)
+    
     def display_complexity_info(self):
         """Показать информацию о уровнях сложности"""
         print("\n📊 Уровни сложности паролей:")
         print("-" * 50)
         for i, level in enumerate(self.complexity_levels, 1):
-            print(f"{i}. {level['name']:12} - {level['description']} (мин. длина: {level['min_length']})")
+            bits = math.log2(level.size)
+            print(f"{i}. {level.name:12} - {level.description} (мин. длина: {level.min_length}, "
+                  f"{bits:.2f} бит/символ, {bits * level.min_length:.0f} бит при мин. длине)")
         print()
 
-def main():
+SERVICE_POOL_SIZE = 256
+SERVICE_MAX_POOLS = 64
+SERVICE_MAX_COUNT = 10000
+SERVICE_LATENCY_WINDOW = 10000
+
+_HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                 500: 'Internal Server Error'}
+
+
+class PasswordService:
+    """Локальный asyncio-сервис генерации паролей по HTTP (TCP или Unix-сокет)
+    
+    Одновременные запросы с одинаковыми длиной и сложностью объединяются
+    в одну пакетную генерацию на следующей итерации цикла событий. Для
+    каждой пары (сложность, длина) держится небольшой пул готовых паролей,
+    который пополняется в фоне. Задержки последних запросов хранятся в
+    ограниченном окне для расчета p50/p99.
+    """
+    
+    def __init__(self, generator=None, pool_size=SERVICE_POOL_SIZE,
+                 latency_window=SERVICE_LATENCY_WINDOW):
+        from collections import deque, OrderedDict
+        
+        self.generator = generator if generator is not None else PasswordGenerator()
+        self.pool_size = pool_size
+        self.requests = 0
+        self.batches = 0
+        self.pool_hits = 0
+        self._pools = OrderedDict()
+        self._pending = {}
+        self._refilling = set()
+        self._tasks = set()
+        self._latencies = deque(maxlen=latency_window)
+    
+    async def get_passwords(self, length, complexity_name, count=1):
+        """Получить count паролей: из пула или через объединенный пакет"""
+        import asyncio
+        
+        level = self.generator.get_complexity_by_name(complexity_name)
+        if level is None:
+            raise ValueError(f"Неизвестный уровень сложности: {complexity_name}")
+        if not 0 <= length <= 4096 or not 1 <= count <= SERVICE_MAX_COUNT:
+            raise ValueError(f"Длина должна быть от 0 до 4096, количество от 1 до {SERVICE_MAX_COUNT}")
+        
+        key = (complexity_name, length)
+        pool = self._pools.get(key)
+        if pool is not None and len(pool) >= count:
+            self._pools.move_to_end(key)
+            self.pool_hits += 1
+            passwords = [pool.popleft() for _ in range(count)]
+            self._schedule_refill(key, level)
+            return passwords
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((count, future))
+        if len(pending) == 1:
+            self._track(loop.create_task(self._flush(key, level)))
+        return await future
+    
+    async def _flush(self, key, level):
+        """Сгенерировать один пакет на все ожидающие запросы с ключом key
+        
+        Задача стартует на следующей итерации цикла событий, так что к ней
+        успевают присоединиться одновременные запросы. Генерация идет в
+        пуле потоков, чтобы не блокировать цикл; ошибка передается всем
+        ожидающим запросам.
+        """
+        import asyncio
+        
+        pending = self._pending.pop(key)
+        total = sum(count for count, _ in pending)
+        try:
+            passwords = await asyncio.get_running_loop().run_in_executor(
+                None, self.generator._generate_chunk, level, total + self.pool_size, key[1])
+        except BaseException as e:
+            for _, future in pending:
+                if not future.done():
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                    else:
+                        future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        self.batches += 1
+        
+        position = 0
+        for count, future in pending:
+            if not future.done():
+                future.set_result(passwords[position:position + count].tolist())
+            position += count
+        self._pool_for(key).extend(passwords[position:])
+    
+    def _pool_for(self, key):
+        """Пул ключа; самые давно использованные пулы вытесняются"""
+        from collections import deque
+        
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = deque()
+            while len(self._pools) > SERVICE_MAX_POOLS:
+                self._pools.popitem(last=False)
+        self._pools.move_to_end(key)
+        return pool
+    
+    def _schedule_refill(self, key, level):
+        """Пополнить пул в фоне, когда он опустел наполовину"""
+        import asyncio
+        
+        if key in self._refilling or len(self._pools[key]) >= self.pool_size // 2:
+            return
+        self._refilling.add(key)
+        
+        async def refill():
+            try:
+                need = self.pool_size - len(self._pools.get(key, ()))
+                if need > 0:
+                    loop = asyncio.get_running_loop()
+                    passwords = await loop.run_in_executor(
+                        None, self.generator._generate_chunk, level, need, key[1])
+                    self._pool_for(key).extend(passwords)
+            finally:
+                self._refilling.discard(key)
+        
+        self._track(asyncio.get_running_loop().create_task(refill()))
+    
+    def _track(self, task):
+        """Хранить ссылку на фоновую задачу, чтобы ее не собрал сборщик мусора"""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def stats(self):
+        """Счетчики сервиса и перцентили задержки в миллисекундах"""
+        latencies = sorted(self._latencies)
+        
+        def percentile(q):
+            if not latencies:
+                return 0.0
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+        
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'pool_hits': self.pool_hits,
+            'p50_ms': round(percentile(0.50), 3),
+            'p99_ms': round(percentile(0.99), 3),
+            'pools': {f"{name}:{length}": len(pool) for (name, length), pool in self._pools.items()},
+        }
+    
+    async def _route(self, method, target):
+        """Обработать запрос; возвращает (статус, тело-словарь)"""
+        from urllib.parse import urlsplit, parse_qs
+        
+        url = urlsplit(target)
+        if method != 'GET':
+            return 405, {'error': 'Поддерживается только GET'}
+        if url.path == '/stats':
+            return 200, self.stats()
+        if url.path != '/password':
+            return 404, {'error': f'Неизвестный путь: {url.path}'}
+        
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            length = int(query.get('length', 12))
+            count = int(query.get('count', 1))
+            passwords = await self.get_passwords(length, query.get('complexity', 'high'), count)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'Ошибка генерации: {e}'}
+        return 200, {'passwords': passwords}
+    
+    async def handle(self, reader, writer):
+        """Обработать соединение HTTP/1.1 (с поддержкой keep-alive)"""
+        from json import dumps
+        
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                started = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, body = 400, {'error': 'Неверная строка запроса'}
+                else:
+                    status, body = await self._route(parts[0], parts[1])
+                self.requests += 1
+                self._latencies.append(time.perf_counter() - started)
+                
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                payload = dumps(body, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {_HTTP_REASONS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                    + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """Запустить сервер на TCP-адресе или Unix-сокете"""
+        import asyncio
+        
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+INTERACTIVE_POOL_SIZE = 256
+INTERACTIVE_PAGE_SIZE = 20
+INTERACTIVE_DEFAULT_LENGTH = 12
+
+# Строки рейтинга для баллов 0-8 собираются один раз
+_STRENGTH_STARS = tuple("★" * score + "☆" * (8 - score) for score in range(9))
+
+
+class _PreviewPool:
+    """Пул готовых паролей одного уровня, пополняемый фоновым потоком
+    
+    Пул заполняется для предполагаемой длины сразу после выбора уровня,
+    пока пользователь вводит остальные параметры. Запрос, который пул
+    покрывает, обслуживается из него без генерации; смена длины
+    сбрасывает пул, а опустевший наполовину пул пополняется в фоне.
+    """
+    __slots__ = ('generator', 'complexity', 'length', 'size', '_ready', '_lock', '_thread')
+    
+    def __init__(self, generator, complexity, length, size=INTERACTIVE_POOL_SIZE):
+        import threading
+        
+        self.generator = generator
+        self.complexity = complexity
+        self.length = length
+        self.size = size
+        self._ready = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._refill()
+    
+    def _refill(self):
+        """Запустить пополнение, если оно еще не идет"""
+        import threading
+        
+        if self._thread is not None and self._thread.is_alive():
+            return
+        length = self.length
+        
+        def work():
+            passwords = self.generator._generate_chunk(self.complexity, self.size, length)
+            with self._lock:
+                if self.length == length:
+                    self._ready.extend(passwords)
+        
+        self._thread = threading.Thread(target=work, daemon=True)
+        self._thread.start()
+    
+    def take(self, count, length):
+        """count паролей длины length: из пула или, если его не хватает, новым пакетом
+        
+        Вызывающий берет пароли порциями (в интерактивном режиме — по
+        странице), так что новый пакет не больше одной порции.
+        """
+        with self._lock:
+            if length != self.length:
+                self.length = length
+                self._ready = []
+            if count <= len(self._ready):
+                passwords = self._ready[:count]
+                del self._ready[:count]
+            else:
+                passwords = None
+            low = len(self._ready) < self.size // 2
+        if passwords is None:
+            passwords = self.generator._generate_chunk(self.complexity, count, length)
+        if low:
+            self._refill()
+        return passwords
+
+
+def serve_mode(generator, args):
+    """Запустить локальный сервис до прерывания (Ctrl+C)"""
+    import asyncio
+    
+    service = PasswordService(generator, pool_size=args.pool_size)
+    
+    async def run():
+        server = await service.start(args.host, args.port, args.unix)
+        where = args.unix or f"http://{args.host}:{args.port}"
+        print(f"🚀 Сервис паролей запущен: {where}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def main(argv=None):
+    """Точка входа CLI; argv по умолчанию берется из sys.argv один раз"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        interactive_mode()
+        return
+    
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Генератор безопасных паролей')
     parser.add_argument('-l', '--length', type=int, default=12, 
                        help='Длина пароля (по умолчанию: 12)')
     parser.add_argument('-c', '--complexity', type=str, default='high',
-                       choices=['low', 'medium', 'high', 'very-high'],
+                       choices=DEFAULT_COMPLEXITY_LEVELS.names(),
                        help='Уровень сложности: low, medium, high, very-high')
     parser.add_argument('-n', '--number', type=int, default=1,
                        help='Количество генерируемых паролей')
     parser.add_argument('--info', action='store_true',
                        help='Показать информацию о уровнях сложности')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                       help='Выводить только пароли, по одному в строке (то же, что --stream)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Потоковый вывод: только пароли, без оформления')
+    parser.add_argument('--format', type=str, choices=STREAM_FORMATS, default=None,
+                       help='Формат потокового вывода: plain, jsonl, csv (включает --stream)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                       help='Число процессов для генерации (по умолчанию: 1; при N > 1 включает --stream)')
+    parser.add_argument('--exclude-ambiguous', action='store_true',
+                       help=f'Исключить неоднозначные символы ({AMBIGUOUS_CHARS})')
+    parser.add_argument('--mode', type=str, choices=['password', 'passphrase'], default='password',
+                       help='Что генерировать: password (символы) или passphrase (слова)')
+    parser.add_argument('--words', type=int, default=PASSPHRASE_WORDS,
+                       help=f'Число слов в парольной фразе (по умолчанию: {PASSPHRASE_WORDS})')
+    parser.add_argument('--separator', type=str, default='-',
+                       help="Разделитель слов в парольной фразе (по умолчанию: '-')")
+    parser.add_argument('--strength-mode', type=str, choices=STRENGTH_MODES, default='classes',
+                       help='Модель оценки: classes (классы символов и длина), entropy (энтропия с учетом шаблонов)')
+    policy_group = parser.add_argument_group('политика пароля')
+    policy_group.add_argument('--min-lower', type=int, default=0,
+                              help='Минимум строчных букв')
+    policy_group.add_argument('--min-upper', type=int, default=0,
+                              help='Минимум заглавных букв')
+    policy_group.add_argument('--min-digits', type=int, default=0,
+                              help='Минимум цифр')
+    policy_group.add_argument('--min-punct', type=int, default=0,
+                              help='Минимум спецсимволов')
+    policy_group.add_argument('--max-run', type=int, default=None,
+                              help='Максимальная длина серии одинаковых символов подряд')
+    policy_group.add_argument('--forbid', type=str, default='',
+                              help='Запрещенные символы')
+    policy_group.add_argument('--prefix', type=str, default='',
+                              help='Обязательный префикс (входит в длину)')
+    policy_group.add_argument('--suffix', type=str, default='',
+                              help='Обязательный суффикс (входит в длину)')
+    parser.add_argument('--pattern', type=str, default=None, metavar='MASK',
+                       help="Маска пароля, например 'LLLL-DDDD-SSSS' или '[A-Z]{3}[0-9]{4}[!@#]' "
+                            "(заменяет --length и --complexity)")
+    parser.add_argument('--entropy', action='store_true',
+                       help='Показать точное число вариантов и энтропию для длины, сложности, '
+                            'политики или маски вместо генерации')
+    parser.add_argument('--unique', action='store_true',
+                       help='Не выдавать повторов в пределах запуска')
+    parser.add_argument('--unique-index', type=str, default=None,
+                       help='Файл индекса выданных паролей: повторы исключаются между запусками (включает --unique)')
+    parser.add_argument('--unique-bloom', action='store_true',
+                       help='Добавить к новому индексу фильтр Блума')
+    parser.add_argument('--random-source', type=str, choices=ENTROPY_SOURCES, default=None,
+                       help='Источник энтропии: os (по умолчанию, буферизованный), secrets, '
+                            'seeded (детерминированный, только для тестов)')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Зерно детерминированного источника (включает --random-source seeded)')
+    export_group = parser.add_argument_group('экспорт')
+    export_group.add_argument('--export', type=str, default=None, metavar='FILE',
+                              help='Записать пароли в FILE (права 0600) вместо вывода на экран')
+    export_group.add_argument('--export-format', type=str, choices=EXPORT_FORMATS, default='jsonl',
+                              help='Формат экспорта: jsonl (по умолчанию) или csv')
+    export_group.add_argument('--hash', type=str, choices=EXPORT_HASHES, default=None,
+                              help='Добавить к записям хэш пароля: pbkdf2 (PBKDF2-SHA256) или scrypt')
+    export_group.add_argument('--hash-cost', type=int, default=None,
+                              help=f'Итерации PBKDF2 (по умолчанию: {EXPORT_PBKDF2_ITERATIONS}) '
+                                   f'или n для scrypt (по умолчанию: {EXPORT_SCRYPT_N})')
+    export_group.add_argument('--hash-workers', type=int, default=None,
+                              help='Число процессов для хэширования (по умолчанию: все ядра)')
+    parser.add_argument('--stats', action='store_true',
+                       help='Собирать счетчики и время горячих участков и вывести сводку в stderr')
+    parser.add_argument('--profile', type=str, default=None, metavar='FILE',
+                       help='Выполнить генерацию под cProfile и tracemalloc: отчет в stderr, профиль в FILE')
     
-    # Исправляем обработку аргументов
-    if len(sys.argv) == 1:
-        interactive_mode()
-        return
+    subparsers = parser.add_subparsers(dest='command')
+    audit_parser = subparsers.add_parser('audit', help='Оценить файл паролей (по одному в строке)')
+    audit_parser.add_argument('file', help='Путь к файлу паролей')
+    audit_parser.add_argument('--min-strength', type=int, default=AUDIT_MIN_STRENGTH,
+                              help=f'Пароли с оценкой ниже считаются слабыми (по умолчанию: {AUDIT_MIN_STRENGTH})')
+    audit_parser.add_argument('--show-weak', type=int, default=20,
+                              help='Сколько смещений слабых паролей вывести (по умолчанию: 20)')
+    audit_parser.add_argument('--strength-mode', dest='audit_strength_mode', type=str,
+                              choices=STRENGTH_MODES, default='classes',
+                              help='Модель оценки: classes или entropy (по умолчанию: classes)')
+    serve_parser = subparsers.add_parser('serve', help='Запустить локальный HTTP-сервис генерации')
+    serve_parser.add_argument('--host', default='127.0.0.1',
+                              help='Адрес для прослушивания (по умолчанию: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8765,
+                              help='Порт (по умолчанию: 8765)')
+    serve_parser.add_argument('--unix', default=None,
+                              help='Путь к Unix-сокету вместо TCP')
+    serve_parser.add_argument('--pool-size', type=int, default=SERVICE_POOL_SIZE,
+                              help=f'Размер пула готовых паролей на уровень (по умолчанию: {SERVICE_POOL_SIZE})')
     
-    args = parser.parse_args()
-    generator = PasswordGenerator()
+    args = parser.parse_args(argv)
+    source = args.random_source or ('seeded' if args.seed is not None else 'os')
+    try:
+        generator = PasswordGenerator(make_entropy_source(source, args.seed), stats=args.stats)
+    except ValueError as e:
+        parser.error(str(e))
+    if source == 'seeded':
+        print("⚠️  Внимание: детерминированный источник не годится для настоящих паролей",
+              file=sys.stderr)
     
     if args.info:
         generator.display_complexity_info()
         return
     
+    if args.command == 'audit':
+        audit_mode(generator, args)
+        return
+    
+    if args.command == 'serve':
+        serve_mode(generator, args)
+        return
+    
+    if args.exclude_ambiguous:
+        base = generator.get_complexity_by_name(args.complexity)
+        args.complexity = f"{base.name}-unambiguous"
+        generator.add_custom_complexity(args.complexity, f"{base.description} без {AMBIGUOUS_CHARS}",
+                                        base.chars, base.min_length, exclude_ambiguous=True)
+    
+    if args.entropy:
+        entropy_mode(generator, args)
+        return
+    
     try:
+        unique = unique_index_from_args(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        if args.profile:
+            profile_call(lambda: generate_mode(generator, args, unique), dump=args.profile)
+        else:
+            generate_mode(generator, args, unique)
+    finally:
+        if args.unique_index:
+            unique.save(args.unique_index)
+        if args.stats:
+            print(generator.stats_summary(), file=sys.stderr)
+
+def generate_mode(generator, args, unique=None):
+    """Генерация паролей или фраз: потоковая либо с оформлением"""
+    if args.export:
+        export_mode(generator, args, unique)
+        return
+    
+    if args.quiet or args.stream or args.format or args.workers > 1:
+        stream_mode(generator, args, unique)
+        return
+    
+    if args.mode == 'passphrase':
+        passphrase_mode(generator, args)
+        return
+    
+    if args.pattern is not None:
+        pattern_mode(generator, args, unique)
+        return
+    
+    try:
+        policy = policy_from_args(args)
         print(f"\n🔐 Генерация паролей:")
         print(f"   Длина: {args.length} символов")
         print(f"   Сложность: {args.complexity}")
         print(f"   Количество: {args.number}")
+        if policy is not None:
+            attempts = generator.policy_retry_attempts(args.length, args.complexity, policy)
+            lower = policy.max_run is not None or args.length > POLICY_ESTIMATE_MAX_LENGTH
+            print(f"   Политика: перебором {_format_attempts(attempts, lower)} генераций на пароль, по политике 1")
         print("-" * 40)
         
-        for i in range(args.number):
-            password = generator.generate_password(args.length, args.complexity)
-            strength = generator.calculate_strength(password)
-            strength_stars = "★" * strength + "☆" * (8 - strength)
-            
+        if unique is not None:
+            passwords = generator.generate_unique_batch(args.number, args.length, args.complexity,
+                                                        unique, policy)
+        else:
+            passwords = (generator.generate_password(args.length, args.complexity, policy=policy)
+                         for _ in range(args.number))
+        
+        for i, password in enumerate(passwords):
+            strength = generator.calculate_strength(password, args.strength_mode)
             print(f"Пароль {i+1}: {password}")
-            print(f"Сложность: {strength_stars} ({strength}/8)")
+            print(f"Сложность: {_STRENGTH_STARS[strength]} ({strength}/8)")
             print()
             
     except ValueError as e:
         print(f"❌ Ошибка: {e}")
         sys.exit(1)
 
+def export_mode(generator, args, unique=None):
+    """Экспорт паролей (и их хэшей) в файл
+    
+    Файл создается с правами 0600 под новым временным именем рядом с
+    целевым и заменяет прежний только после успешной записи.
+    """
+    import tempfile
+    
+    path = args.export
+    try:
+        if args.mode == 'passphrase' or args.pattern is not None:
+            raise ValueError("--export поддерживается только для паролей по уровню сложности")
+        fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp',
+                                   dir=os.path.dirname(path) or '.')
+        try:
+            os.fchmod(fd, 0o600)
+            with open(fd, 'w', encoding='utf-8', newline='', buffering=EXPORT_BUFFER_SIZE) as out:
+                generator.export_passwords(out, args.number, args.length, args.complexity,
+                                           args.export_format, args.hash, args.hash_cost,
+                                           args.hash_workers if args.hash else 1,
+                                           policy_from_args(args), unique)
+            os.replace(tmp, path)
+        except BaseException:
+            # Недописанный файл с паролями не оставляем и при Ctrl+C
+            os.remove(tmp)
+            raise
+    except (OSError, ValueError) as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    hashed = f", хэш {args.hash}" if args.hash else ""
+    print(f"✅ Экспортировано записей: {args.number} в {path} ({args.export_format}{hashed})",
+          file=sys.stderr)
+
+def _format_attempts(attempts, lower):
+    """Число генераций перебором для вывода; lower — это нижняя оценка"""
+    if math.isinf(attempts):
+        return '∞'
+    text = f'~{attempts:.2f}' if attempts < 1e6 else f'~{attempts:.2e}'
+    return f'не меньше {text}' if lower else text
+
+def entropy_mode(generator, args):
+    """Точное число вариантов и log2 размера пространства для параметров генерации"""
+    policy = None
+    try:
+        if args.pattern is not None:
+            check_pattern_args(args)
+            plan = compile_pattern(args.pattern)
+            keyspace, bits = plan.keyspace, plan.entropy
+        else:
+            policy = policy_from_args(args)
+            keyspace = generator.keyspace(args.length, args.complexity, policy)
+            bits = generator.entropy_bits(args.length, args.complexity, policy)
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    
+    print(f"\n🔢 Пространство паролей:")
+    if args.pattern is not None:
+        print(f"   Маска: {args.pattern}")
+    else:
+        print(f"   Длина: {args.length} символов")
+        print(f"   Сложность: {args.complexity}")
+    print(f"   Вариантов: {keyspace:,}".replace(',', ' '))
+    if keyspace and policy is not None:
+        print(f"   Энтропия пространства: {bits:.1f} бит (при равновероятном выборе; "
+              "сборка по политике неравновероятна, ее энтропия может быть ниже)")
+    elif keyspace:
+        print(f"   Энтропия: {bits:.1f} бит")
+    else:
+        print("   Политика невыполнима: подходящих паролей нет")
+
+def check_pattern_args(args, unique=None):
+    """Проверить, что --pattern не сочетается с несовместимыми флагами"""
+    if args.mode == 'passphrase':
+        raise ValueError("--pattern поддерживается только для паролей")
+    if policy_from_args(args) is not None:
+        raise ValueError("--pattern нельзя сочетать с флагами политики пароля")
+    if unique is not None:
+        raise ValueError("--pattern нельзя сочетать с --unique")
+    if args.workers > 1:
+        raise ValueError("--pattern не поддерживает несколько процессов")
+
+def pattern_mode(generator, args, unique=None):
+    """Генерация паролей по маске с оформлением"""
+    try:
+        check_pattern_args(args, unique)
+        plan = compile_pattern(args.pattern)
+        passwords = generator.generate_pattern_batch(args.number, args.pattern)
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    
+    print(f"\n🔐 Генерация паролей по маске:")
+    print(f"   Маска: {args.pattern}")
+    print(f"   Длина: {plan.length} символов")
+    print(f"   Энтропия: {plan.entropy:.1f} бит")
+    print(f"   Количество: {args.number}")
+    print("-" * 40)
+    
+    for i, password in enumerate(passwords):
+        strength = generator.calculate_strength(password, args.strength_mode)
+        print(f"Пароль {i+1}: {password}")
+        print(f"Сложность: {_STRENGTH_STARS[strength]} ({strength}/8)")
+        print()
+
+def policy_from_args(args):
+    """Политика из флагов CLI или None, если ни один флаг не задан"""
+    options = dict(min_lower=args.min_lower, min_upper=args.min_upper,
+                   min_digits=args.min_digits, min_punct=args.min_punct,
+                   max_run=args.max_run, forbidden=args.forbid,
+                   prefix=args.prefix, suffix=args.suffix)
+    if not any(value for value in options.values()):
+        return None
+    return PasswordPolicy(**options)
+
+def unique_index_from_args(args):
+    """Индекс для --unique/--unique-index или None
+    
+    Сохраненный индекс загружается из файла, иначе создается новый
+    с таблицей под args.number паролей.
+    """
+    if not (args.unique or args.unique_index):
+        return None
+    if args.mode == 'passphrase':
+        raise ValueError("--unique поддерживается только для паролей")
+    if args.unique_index and os.path.exists(args.unique_index):
+        return UniqueIndex.load(args.unique_index)
+    return UniqueIndex(args.number, bloom=args.unique_bloom)
+
+def stream_mode(generator, args, unique=None):
+    """Потоковая генерация для конвейеров (| head, > file)"""
+    try:
+        if args.pattern is not None:
+            check_pattern_args(args, unique)
+            generator.stream_pattern_passwords(sys.stdout, args.number, args.pattern,
+                                               args.format or 'plain')
+        elif args.mode == 'passphrase':
+            if args.workers > 1:
+                raise ValueError("--workers поддерживается только для паролей")
+            generator.stream_passphrases(sys.stdout, args.number, args.words,
+                                         args.separator, args.format or 'plain')
+        else:
+            generator.stream_passwords(sys.stdout, args.number, args.length,
+                                       args.complexity, args.format or 'plain',
+                                       workers=args.workers, policy=policy_from_args(args),
+                                       unique=unique)
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        # Читатель закрыл канал: перенаправляем stdout в /dev/null,
+        # чтобы интерпретатор не упал при финальном сбросе буфера
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+def passphrase_mode(generator, args):
+    """Генерация парольных фраз с оформлением"""
+    try:
+        passphrases = generator.generate_passphrase_batch(args.number, args.words, args.separator)
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    
+    print(f"\n🔐 Генерация парольных фраз:")
+    print(f"   Слов: {args.words}")
+    print(f"   Энтропия: {generator.passphrase_entropy(args.words):.1f} бит")
+    print(f"   Количество: {args.number}")
+    print("-" * 40)
+    
+    for i, passphrase in enumerate(passphrases):
+        print(f"Фраза {i+1}: {passphrase}")
+    print()
+
+def audit_mode(generator, args):
+    """Аудит файла паролей: гистограмма оценок и смещения слабых строк"""
+    shown = []
+    
+    def on_weak(offset, score):
+        if len(shown) < args.show_weak:
+            shown.append((offset, score))
+    
+    try:
+        histogram = generator.audit_file(args.file, args.min_strength, on_weak,
+                                         mode=args.audit_strength_mode)
+    except OSError as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    total = sum(histogram)
+    weak = sum(histogram[:max(args.min_strength, 0)])
+    print(f"\n🔎 Аудит файла: {args.file}")
+    print(f"   Паролей: {total}")
+    print(f"   Слабых (оценка < {args.min_strength}): {weak}")
+    print("-" * 40)
+    width = max(histogram) or 1
+    for score, count in enumerate(histogram):
+        bar = "█" * round(30 * count / width)
+        print(f"{score}/8 {count:>12} {bar}")
+    
+    if shown:
+        print(f"\nСмещения слабых паролей (первые {len(shown)}):")
+        for offset, score in shown:
+            print(f"   {offset}: {score}/8")
+
 def interactive_mode():
-    """Интерактивный режим с выбором параметров"""
+    """Интерактивный режим с выбором параметров
+    
+    Сразу после выбора уровня фоновый поток заполняет пул паролей для
+    длины по умолчанию, поэтому вывод и запросы «еще» обычно не ждут
+    генерации. Большое количество выводится страницами, и пароли каждой
+    страницы берутся из пула только перед ее выводом.
+    """
     generator = PasswordGenerator()
     
     print("🎯 Интерактивный генератор паролей")
@@ -143,17 +3589,22 @@ def interactive_mode():
             choice = int(input("Выберите уровень сложности (введите номер 1-4): "))
             complexity = generator.get_complexity_by_index(choice - 1)
             if complexity:
-                complexity_name = complexity['name']
+                complexity_name = complexity.name
                 break
             print("❌ Неверный номер. Попробуйте снова.")
         except ValueError:
             print("❌ Введите число от 1 до 4.")
     
+    # Пул готовится, пока вводятся длина и количество
+    min_length = complexity.min_length
+    default_length = max(INTERACTIVE_DEFAULT_LENGTH, min_length)
+    pool = _PreviewPool(generator, complexity, default_length)
+    
     # Выбор длины
-    min_length = complexity['min_length']
     while True:
         try:
-            length = int(input(f"Введите длину пароля (мин. {min_length}): "))
+            answer = input(f"Введите длину пароля (мин. {min_length}, Enter — {default_length}): ")
+            length = int(answer) if answer.strip() else default_length
             if length >= min_length:
                 break
             print(f"❌ Длина должна быть не менее {min_length} символов.")
@@ -163,29 +3614,40 @@ def interactive_mode():
     # Количество паролей
     while True:
         try:
-            count = int(input("Сколько паролей сгенерировать? (1-20): "))
-            if 1 <= count <= 20:
+            count = int(input("Сколько паролей сгенерировать? "))
+            if count >= 1:
                 break
-            print("❌ Введите число от 1 до 20.")
+            print("❌ Введите число не меньше 1.")
         except ValueError:
             print("❌ Введите число.")
     
-    # Генерация
     print(f"\n🔐 Результаты:")
     print(f"   Сложность: {complexity_name}")
     print("-" * 40)
     
-    for i in range(count):
-        password = generator.generate_password(length, complexity_name)
-        strength = generator.calculate_strength(password)
-        strength_stars = "★" * strength + "☆" * (8 - strength)
-        
-        print(f"Пароль {i+1}: {password}")
-        print(f"Сложность: {strength_stars} ({strength}/8)")
-        print()
+    number = 0
+    while True:
+        shown = 0
+        while shown < count:
+            # Пароли берутся постранично, поэтому память не зависит от count
+            page = pool.take(min(INTERACTIVE_PAGE_SIZE, count - shown), length)
+            scores = generator.calculate_strength_batch(page)
+            print(''.join(f"Пароль {number + i}: {password}\n"
+                          f"Сложность: {_STRENGTH_STARS[score]} ({score}/8)\n\n"
+                          for i, (password, score) in enumerate(zip(page, scores), shown + 1)), end='')
+            shown += len(page)
+            if shown < count and not _confirm(f"Показано {shown} из {count}. Enter — дальше, q — хватит: "):
+                break
+        number += shown
+        if not _confirm(f"Enter — еще {count}, q — выход: "):
+            break
+
+def _confirm(prompt):
+    """Спросить о продолжении: Enter — да, q или конец ввода — нет"""
+    try:
+        return input(prompt).strip().lower() != 'q'
+    except EOFError:
+        return False
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        interactive_mode()
-    else:
-        main()
\ No newline at end of file
+    main()
\ No newline at end of file
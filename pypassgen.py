@@ -0,0 +1,13 @@
+"""Быстрый запуск CLI генератора паролей
+
+При запуске `python password_generator.py` интерпретатор каждый раз заново
+компилирует весь модуль, потому что для __main__ байт-код не кэшируется.
+Этот лаунчер импортирует password_generator как обычный модуль, и тот
+загружается из __pycache__.
+
+    python pypassgen.py -q -n 5
+"""
+from password_generator import main
+
+if __name__ == "__main__":
+    main()
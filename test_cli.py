@@ -2,7 +2,12 @@ import pytest
 import subprocess
 import sys
 import os
-from password_generator import main, interactive_mode
+import io
+import csv
+import json
+import re
+import string
+from password_generator import main, interactive_mode, AMBIGUOUS_CHARS, PasswordGenerator, _PreviewPool
 from unittest.mock import patch, MagicMock, call
 
 # Добавляем путь к модулю
@@ -70,20 +75,442 @@ class TestCLI:
         # Может вернуть 0 или не 0 в зависимости от обработки ошибок
         assert 'error' in result.stderr.lower() or 'Ошибка' in result.stderr or result.returncode != 0
     
+    def test_cli_stream_plain(self):
+        """Тест потокового вывода: только пароли, по одному в строке"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py',
+            '--stream', '--length', '10', '--complexity', 'high', '--number', '1000'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 1000
+        assert all(len(line) == 10 for line in lines)
+    
+    def test_cli_stream_jsonl(self):
+        """Тест потокового вывода в формате JSONL"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py',
+            '--format', 'jsonl', '--length', '16', '--complexity', 'very-high', '--number', '50'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        records = [json.loads(line) for line in result.stdout.splitlines()]
+        assert [r['id'] for r in records] == list(range(1, 51))
+        assert all(len(r['password']) == 16 for r in records)
+    
+    def test_cli_stream_csv(self):
+        """Тест потокового вывода в формате CSV с экранированием"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py',
+            '--format', 'csv', '--length', '16', '--complexity', 'very-high', '--number', '200'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        rows = list(csv.reader(io.StringIO(result.stdout)))
+        assert rows[0] == ['id', 'password']
+        assert len(rows) == 201
+        assert all(len(row[1]) == 16 for row in rows[1:])
+    
+    def test_cli_workers(self):
+        """Тест генерации несколькими процессами через CLI"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py',
+            '--workers', '2', '--length', '12', '--number', '5000'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 5000
+        assert len(set(lines)) == 5000
+    
+    def test_cli_exclude_ambiguous(self):
+        """Тест исключения неоднозначных символов через CLI"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--stream', '--exclude-ambiguous',
+            '--complexity', 'high', '--length', '64', '--number', '200'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert not set('O0lI1') & set(result.stdout)
+    
+    def test_cli_policy(self):
+        """Тест флагов политики через CLI"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--stream', '--complexity', 'very-high',
+            '--length', '12', '--number', '200', '--min-digits', '2', '--min-punct', '2',
+            '--max-run', '1', '--forbid', AMBIGUOUS_CHARS, '--prefix', 'X-'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 200
+        for line in lines:
+            assert len(line) == 12 and line.startswith('X-')
+            assert sum(c.isdigit() for c in line) >= 2
+            assert not set(AMBIGUOUS_CHARS) & set(line)
+            assert all(x != y for x, y in zip(line, line[1:]))
+    
+    def test_cli_policy_decorated(self):
+        """Тест вывода числа генераций при переборе в оформленном режиме"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--complexity', 'very-high',
+            '--min-lower', '1', '--min-upper', '1', '--min-digits', '1', '--min-punct', '1'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert 'перебором ~1.43 генераций' in result.stdout
+    
+    @pytest.mark.parametrize("extra,expected", [
+        ([], 'перебором ∞ генераций'),
+        (['--length', '40'], 'перебором ~6.96e+54 генераций'),
+        (['--length', '40', '--max-run', '3'], 'перебором не меньше ~6.96e+54'),
+    ])
+    def test_cli_policy_huge_retry_estimate(self, extra, expected):
+        """Тест что огромное число генераций перебором выводится без переполнения"""
+        keep = set('abcd')
+        forbid = ''.join(c for c in string.ascii_letters + string.digits + string.punctuation if c not in keep)
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--complexity', 'very-high', '--length', '300',
+            '--forbid', forbid, '-n', '1'] + extra, capture_output=True, text=True)
+        
+        assert result.returncode == 0, result.stderr
+        assert expected in result.stdout
+    
+    def test_cli_policy_unsatisfiable(self):
+        """Тест ошибки невыполнимой политики"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--stream', '--complexity', 'low',
+            '--min-digits', '1'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 1
+        assert 'Ошибка' in result.stderr
+    
+    def test_cli_pattern(self):
+        """Тест генерации по маске через CLI"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-q', '--number', '50',
+            '--pattern', '[A-Z]{3}[0-9]{4}[!@#]'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 50
+        assert all(re.fullmatch(r'[A-Z]{3}[0-9]{4}[!@#]', line) for line in lines)
+        
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--pattern', 'LLLL-DDDD-SSSS'
+        ], capture_output=True, text=True)
+        assert result.returncode == 0
+        assert 'Энтропия: 56.1 бит' in result.stdout
+    
+    def test_cli_entropy(self):
+        """Тест вывода точного пространства паролей"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--entropy', '-c', 'high', '-l', '10'
+        ], capture_output=True, text=True)
+        assert result.returncode == 0
+        assert f"Вариантов: {62 ** 10:,}".replace(',', ' ') in result.stdout
+        assert 'Энтропия: 59.5 бит' in result.stdout
+        
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--entropy', '-c', 'low', '--min-digits', '1'
+        ], capture_output=True, text=True)
+        assert result.returncode == 0
+        assert 'Политика невыполнима' in result.stdout
+        
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--entropy', '-c', 'high', '-l', '10',
+            '--min-digits', '2'
+        ], capture_output=True, text=True)
+        assert result.returncode == 0
+        assert 'Энтропия пространства: ' in result.stdout
+        assert 'сборка по политике неравновероятна' in result.stdout
+    
+    def test_cli_pattern_errors(self):
+        """Тест ошибок маски и несовместимых флагов"""
+        for extra in (['--pattern', '[abc'], ['--pattern', 'DDDD', '--min-digits', '1'],
+                      ['--pattern', 'DDDD', '--workers', '2']):
+            result = subprocess.run([sys.executable, 'password_generator.py', '-q'] + extra,
+                                    capture_output=True, text=True)
+            assert result.returncode == 1
+            assert 'Ошибка' in result.stderr
+    
+    def test_cli_export(self, tmp_path):
+        """Тест экспорта в файл с хэшами и правами 0600"""
+        path = tmp_path / 'accounts.csv'
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-n', '50', '-l', '16', '--export', str(path),
+            '--export-format', 'csv', '--hash', 'pbkdf2', '--hash-cost', '1000', '--hash-workers', '2'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert 'Экспортировано' in result.stderr
+        assert result.stdout == ''
+        assert path.stat().st_mode & 0o777 == 0o600
+        assert list(tmp_path.iterdir()) == [path]
+        rows = list(csv.reader(path.open(newline='')))
+        assert rows[0] == ['id', 'password', 'hash']
+        assert [int(row[0]) for row in rows[1:]] == list(range(1, 51))
+        assert all(len(row[1]) == 16 and row[2].startswith('pbkdf2_sha256$1000$') for row in rows[1:])
+    
+    def test_cli_export_ignores_stale_tmp(self, tmp_path):
+        """Тест что чужой файл .tmp рядом не влияет на права и не подменяется"""
+        path = tmp_path / 'accounts.jsonl'
+        stale = tmp_path / 'accounts.jsonl.tmp'
+        stale.write_text('old')
+        stale.chmod(0o644)
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-n', '5', '--export', str(path)
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert path.stat().st_mode & 0o777 == 0o600
+        assert stale.read_text() == 'old'
+        assert sorted(tmp_path.iterdir()) == [path, stale]
+    
+    def test_cli_export_error(self, tmp_path):
+        """Тест ошибки экспорта без временного файла"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--export', str(tmp_path / 'x.jsonl'),
+            '--mode', 'passphrase'
+        ], capture_output=True, text=True)
+        assert result.returncode == 1
+        assert 'Ошибка' in result.stderr
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_cli_unique_index(self, tmp_path):
+        """Тест что повторные запуски с индексом не выдают прежние пароли"""
+        index = str(tmp_path / 'codes.idx')
+        runs = []
+        for _ in range(2):
+            result = subprocess.run([
+                sys.executable, 'password_generator.py', '-q', '--complexity', 'low',
+                '--length', '3', '--number', '8000', '--unique-index', index
+            ], capture_output=True, text=True)
+            assert result.returncode == 0
+            runs.append(result.stdout.splitlines())
+        
+        assert len(set(runs[0]) | set(runs[1])) == 16000
+        
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-q', '--complexity', 'low',
+            '--length', '3', '--number', '2000', '--unique-index', index
+        ], capture_output=True, text=True)
+        assert result.returncode == 1
+        assert 'исчерпано' in result.stderr
+    
+    def test_cli_seed(self):
+        """Тест воспроизводимого вывода с --seed"""
+        outputs = []
+        for _ in range(2):
+            result = subprocess.run([
+                sys.executable, 'password_generator.py', '-q', '--seed', '7', '--number', '5'
+            ], capture_output=True, text=True)
+            assert result.returncode == 0
+            assert 'детерминированный' in result.stderr
+            outputs.append(result.stdout)
+        
+        assert outputs[0] == outputs[1]
+        assert len(outputs[0].splitlines()) == 5
+    
+    def test_cli_random_source(self):
+        """Тест выбора источника энтропии"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-q', '--random-source', 'secrets', '-n', '3'
+        ], capture_output=True, text=True)
+        assert result.returncode == 0
+        assert len(result.stdout.splitlines()) == 3
+        
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-q', '--random-source', 'seeded'
+        ], capture_output=True, text=True)
+        assert result.returncode == 2
+    
+    def test_cli_stats(self):
+        """Тест вывода статистики в stderr при --stats"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-q', '--stats', '--number', '1000'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert len(result.stdout.splitlines()) == 1000
+        assert 'Статистика генератора' in result.stderr
+        assert 'entropy_read' in result.stderr
+    
+    def test_cli_profile(self, tmp_path):
+        """Тест профилирования генерации через --profile"""
+        dump = tmp_path / 'cli.prof'
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '-q', '--profile', str(dump), '--number', '1000'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert len(result.stdout.splitlines()) == 1000
+        assert dump.stat().st_size > 0
+        assert 'stream_passwords' in result.stderr
+    
+    def test_cli_audit(self, tmp_path):
+        """Тест подкоманды audit"""
+        path = tmp_path / 'passwords.txt'
+        path.write_text('abc\nPassword1!\nAb1!Ab1!Ab1!\n')
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', 'audit', str(path)
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert 'Паролей: 3' in result.stdout
+        assert 'Слабых (оценка < 5): 1' in result.stdout
+        assert '   0: 1/8' in result.stdout
+    
+    def test_cli_audit_entropy_mode(self, tmp_path):
+        """Тест аудита с оценкой по энтропии"""
+        path = tmp_path / 'passwords.txt'
+        path.write_text('Password1!\n')
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', 'audit', str(path), '--strength-mode', 'entropy'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert '   0: 1/8' in result.stdout
+    
+    def test_cli_audit_missing_file(self, tmp_path):
+        """Тест аудита несуществующего файла"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', 'audit', str(tmp_path / 'missing.txt')
+        ], capture_output=True, text=True)
+        
+        assert result.returncode != 0
+        assert 'Ошибка' in result.stderr
+    
+    def test_cli_passphrase(self):
+        """Тест генерации парольных фраз через CLI"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py',
+            '--mode', 'passphrase', '--words', '4', '--stream', '--number', '20'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 20
+        assert all(len(line.split('-')) == 4 for line in lines)
+    
+    def test_cli_passphrase_decorated(self):
+        """Тест вывода парольных фраз с оформлением"""
+        result = subprocess.run([
+            sys.executable, 'password_generator.py', '--mode', 'passphrase', '--number', '2'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        assert 'Энтропия: 66.0 бит' in result.stdout
+        assert result.stdout.count('Фраза') == 2
+    
+    @pytest.mark.parametrize("script", ['password_generator.py', 'pypassgen.py'])
+    def test_cli_quiet(self, script):
+        """Тест режима -q: только пароли, без заголовков"""
+        result = subprocess.run([
+            sys.executable, script, '-q', '--length', '14', '--number', '3'
+        ], capture_output=True, text=True)
+        
+        assert result.returncode == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 3
+        assert all(len(line) == 14 for line in lines)
+    
+    def test_cli_lazy_imports(self):
+        """Тест что импорт модуля не тянет argparse, json, random и string"""
+        result = subprocess.run([
+            sys.executable, '-c',
+            'import sys, password_generator; '
+            'print(sorted(m for m in ("argparse", "json", "random", "string", "asyncio") if m in sys.modules))'
+        ], capture_output=True, text=True)
+        
+        assert result.stdout.strip() == '[]'
+    
+    def test_cli_stream_broken_pipe(self):
+        """Тест что закрытие канала читателем не приводит к трассировке"""
+        process = subprocess.Popen([
+            sys.executable, 'password_generator.py', '--stream', '--number', '10000000'
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process.stdout.readline()
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.wait(timeout=60)
+        process.stderr.close()
+        
+        assert b'Traceback' not in stderr
+    
     @patch('builtins.input')
     @patch('builtins.print')
     def test_interactive_mode(self, mock_print, mock_input):
         """Тест интерактивного режима"""
-        # Мокируем ввод пользователя: выбор сложности (1-4), длина, количество
-        mock_input.side_effect = ['2', '12', '2']  # medium complexity
+        # Мокируем ввод пользователя: выбор сложности (1-4), длина, количество, выход
+        mock_input.side_effect = ['2', '12', '2', 'q']  # medium complexity
         
         # Запускаем интерактивный режим
         interactive_mode()
         
         # Проверяем что были вызовы input с ожидаемыми сообщениями
-        assert mock_input.call_count == 3
+        assert mock_input.call_count == 4
         # Проверяем что print вызывался (не проверяем конкретный вывод)
         assert mock_print.call_count > 0
+    
+    @patch('builtins.input')
+    def test_interactive_pages_and_more(self, mock_input, capsys):
+        """Тест постраничного вывода без ограничения количества и запроса «еще»"""
+        # Длина по умолчанию, 45 паролей: две паузы между страницами, затем еще 45 и выход
+        mock_input.side_effect = ['3', '', '45', '', '', '', '', '', 'q']
+        interactive_mode()
+        
+        out = capsys.readouterr().out
+        assert out.count('Пароль ') == 90
+        assert 'Пароль 90: ' in out
+        assert 'Сложность: ★' in out
+        assert mock_input.call_count == 9
+    
+    @patch('builtins.input')
+    def test_interactive_huge_count_paged(self, mock_input, capsys):
+        """Тест что огромное количество генерируется постранично, а нумерация идет по показанным"""
+        mock_input.side_effect = ['3', '', '1000000000', 'q', '', 'q', 'q']
+        sizes = []
+        original = PasswordGenerator._generate_chunk
+        
+        def spy(self, complexity, count, length, policy=None):
+            sizes.append(count)
+            return original(self, complexity, count, length, policy)
+        
+        with patch.object(PasswordGenerator, '_generate_chunk', spy):
+            interactive_mode()
+        
+        out = capsys.readouterr().out
+        assert out.count('Пароль ') == 40
+        assert 'Пароль 21: ' in out and 'Пароль 41: ' not in out
+        assert max(sizes) <= 256
+    
+    @patch('builtins.input')
+    def test_interactive_end_of_input(self, mock_input, capsys):
+        """Тест что конец ввода на запросе «еще» завершает режим без ошибки"""
+        mock_input.side_effect = ['1', '8', '1', EOFError]
+        interactive_mode()
+        assert 'Пароль 1: ' in capsys.readouterr().out
+    
+    def test_preview_pool(self):
+        """Тест что пул отдает готовые пароли и сбрасывается при смене длины"""
+        generator = PasswordGenerator()
+        level = generator.get_complexity_by_name('high')
+        pool = _PreviewPool(generator, level, 12, size=64)
+        pool._thread.join()
+        
+        passwords = pool.take(10, 12)
+        assert len(passwords) == 10 and all(len(p) == 12 for p in passwords)
+        assert len(pool._ready) == 54
+        
+        longer = pool.take(5, 20)
+        assert all(len(p) == 20 for p in longer)
+        pool._thread.join()
+        assert all(len(p) == 20 for p in pool._ready)
+        assert len(pool.take(1000, 20)) == 1000
 
 
 class TestMainFunction:
@@ -113,6 +540,16 @@ class TestMainFunction:
         assert mock_generate.call_count == 2
         assert mock_strength.call_count == 2
     
+    @patch('password_generator.PasswordGenerator.generate_password')
+    def test_main_explicit_argv(self, mock_generate, capsys):
+        """Тест что main принимает argv явно и не читает sys.argv"""
+        with patch('sys.argv', ['password_generator']):
+            main(['--quiet', '--number', '2', '--length', '9'])
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 2
+        assert all(len(line) == 9 for line in lines)
+        mock_generate.assert_not_called()
+    
     @patch('password_generator.PasswordGenerator.display_complexity_info')
     @patch('sys.argv', ['password_generator', '--info'])
     def test_main_info_flag(self, mock_display):
@@ -1,6 +1,23 @@
 import pytest
 import string
-from password_generator import PasswordGenerator
+import io
+import pickle
+import math
+import subprocess
+import asyncio
+import json
+import itertools
+import collections
+import csv
+import re
+from array import array
+from password_generator import (PasswordGenerator, AMBIGUOUS_CHARS, estimate_entropy,
+                                PasswordPolicy, UniqueIndex, OSEntropy, SecretsEntropy, SeededEntropy,
+                                make_entropy_source, GeneratorStats, Histogram, _sample_chars,
+                                compile_pattern, _make_pattern_passwords, _pattern_cache, _PATTERN_CACHE_SIZE,
+                                _minimum_tables, PasswordBatch, _find_matches,
+                                WordList, build_wordlist, DATA_DIR, _sample_indices, PasswordService,
+                                CLASS_LOWER, CLASS_UPPER, CLASS_DIGIT, CLASS_PUNCT)
 import sys
 import os
 
@@ -125,6 +142,100 @@ class TestPasswordGenerator:
         """Тест оценки сложности пароля"""
         assert generator.calculate_strength(password) == expected_strength
     
+    @pytest.mark.parametrize("complexity_name,expected_chars", [
+        ('low', string.ascii_lowercase),
+        ('medium', string.ascii_letters),
+        ('high', string.ascii_letters + string.digits),
+        ('very-high', string.ascii_letters + string.digits + string.punctuation)
+    ])
+    def test_generate_batch(self, generator, complexity_name, expected_chars):
+        """Тест пакетной генерации: количество, длина и алфавит"""
+        passwords = generator.generate_batch(50, 16, complexity_name)
+        assert len(passwords) == 50
+        for password in passwords:
+            assert len(password) == 16
+            assert all(char in expected_chars for char in password)
+    
+    @pytest.mark.parametrize("count,length", [(0, 12), (5, 0), (1, 1)])
+    def test_generate_batch_edge_sizes(self, generator, count, length):
+        """Тест пакетной генерации на граничных размерах"""
+        passwords = generator.generate_batch(count, length, 'low')
+        assert len(passwords) == count
+        assert all(len(password) == length for password in passwords)
+    
+    def test_generate_batch_invalid(self, generator):
+        """Тест ошибок пакетной генерации"""
+        with pytest.raises(ValueError, match="Неизвестный уровень сложности"):
+            generator.generate_batch(10, 10, 'invalid')
+        with pytest.raises(ValueError):
+            generator.generate_batch(-1, 10, 'low')
+    
+    def test_short_length_warning(self, generator, capsys):
+        """Тест что предупреждение о длине идет в stdout, а при потоковой записи — в stderr"""
+        generator.generate_batch(3, 2, 'low')
+        captured = capsys.readouterr()
+        assert "рекомендуется длина не менее 4" in captured.out and not captured.err
+        generator.stream_passwords(io.StringIO(), 3, 2, 'low')
+        captured = capsys.readouterr()
+        assert "рекомендуется длина не менее 4" in captured.err and not captured.out
+    
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+    def test_stream_passwords_chunking(self, generator, chunk_size):
+        """Тест что разбиение на пакеты не влияет на число и нумерацию записей"""
+        out = io.StringIO()
+        generator.stream_passwords(out, 25, 12, 'high', fmt='csv', chunk_size=chunk_size)
+        lines = out.getvalue().splitlines()
+        assert lines[0] == 'id,password'
+        assert [line.split(',')[0] for line in lines[1:]] == [str(i) for i in range(1, 26)]
+    
+    def test_stream_passwords_invalid_format(self, generator):
+        """Тест ошибки при неизвестном формате вывода"""
+        with pytest.raises(ValueError, match="формат"):
+            generator.stream_passwords(io.StringIO(), 1, 12, 'high', fmt='xml')
+    
+    def test_generate_parallel(self, generator):
+        """Тест генерации пулом процессов: все пакеты доходят до читателя"""
+        chunks = list(generator.generate_parallel(1000, 12, 'high', workers=2, chunk_size=128))
+        passwords = [p for chunk in chunks for p in chunk]
+        assert len(passwords) == 1000
+        assert len(set(passwords)) == 1000
+        assert all(len(p) == 12 for p in passwords)
+    
+    def test_stream_passwords_parallel_ids(self, generator):
+        """Тест что при нескольких процессах номера записей уникальны и полны"""
+        out = io.StringIO()
+        generator.stream_passwords(out, 300, 10, 'medium', fmt='csv', chunk_size=64, workers=2)
+        ids = sorted(int(line.split(',')[0]) for line in out.getvalue().splitlines()[1:])
+        assert ids == list(range(1, 301))
+    
+    def test_generate_parallel_invalid_workers(self, generator):
+        """Тест ошибки при неверном числе процессов"""
+        with pytest.raises(ValueError, match="процессов"):
+            generator.generate_parallel(10, 12, 'high', workers=0)
+    
+    STRENGTH_SAMPLES = ['', 'abc', 'abcd', 'abcABC', 'abc123', 'abcABC123',
+                        'abcABC123!', 'a' * 12, 'aA1!' * 4, ' ', 'пароль', 'Пар0ль!']
+    
+    @pytest.mark.parametrize("use_numpy", [False, None])
+    def test_calculate_strength_batch(self, generator, use_numpy):
+        """Тест что пакетная оценка совпадает с поштучной"""
+        passwords = self.STRENGTH_SAMPLES + generator.generate_batch(200, 12, 'very-high')
+        scores = generator.calculate_strength_batch(iter(passwords), use_numpy=use_numpy)
+        assert isinstance(scores, array)
+        assert list(scores) == [generator.calculate_strength(p) for p in passwords]
+    
+    def test_calculate_strength_batch_numpy(self, generator):
+        """Тест пакетной оценки через NumPy, включая пустые пароли"""
+        pytest.importorskip('numpy')
+        passwords = [p for p in self.STRENGTH_SAMPLES if p.isascii()]
+        passwords += generator.generate_batch(200, 7, 'high')
+        scores = generator.calculate_strength_batch(passwords, use_numpy=True)
+        assert list(scores) == [generator.calculate_strength(p) for p in passwords]
+    
+    def test_calculate_strength_batch_empty(self, generator):
+        """Тест пакетной оценки пустого набора"""
+        assert len(generator.calculate_strength_batch([])) == 0
+    
     def test_display_complexity_info(self, generator, capsys):
         """Тест отображения информации о сложности"""
         generator.display_complexity_info()
@@ -134,6 +245,1040 @@ class TestPasswordGenerator:
         assert "4." in captured.out  # Проверяем нумерацию
 
 
+class TestPasswordBatch:
+    """Тесты компактного пакета паролей"""
+    
+    @pytest.fixture
+    def batch(self):
+        return PasswordBatch(b'aaaaBBBB1234!!!!cdef', 4)
+    
+    def test_sequence(self, batch):
+        """Тест индексирования, итерации и поиска"""
+        assert len(batch) == 5
+        assert batch[0] == 'aaaa' and batch[-1] == 'cdef'
+        assert list(batch) == ['aaaa', 'BBBB', '1234', '!!!!', 'cdef']
+        assert list(reversed(batch))[0] == 'cdef'
+        assert batch.index('1234') == 2
+        assert 'aaBB' not in batch and '!!!!' in batch
+        assert batch.count('BBBB') == 1
+        with pytest.raises(IndexError):
+            batch[5]
+    
+    def test_slices_share_buffer(self, batch):
+        """Тест что срез с шагом 1 не копирует буфер"""
+        part = batch[1:3]
+        assert isinstance(part, PasswordBatch)
+        assert part == ['BBBB', '1234']
+        assert part.buffer.obj is batch.buffer.obj
+        assert batch[::2] == ['aaaa', '1234', 'cdef']
+        assert batch[10:] == []
+    
+    def test_write(self, batch):
+        """Тест записи в текстовый и двоичный поток"""
+        text, binary = io.StringIO(), io.BytesIO()
+        batch.write(text)
+        batch.tofile(binary)
+        assert text.getvalue() == 'aaaa\nBBBB\n1234\n!!!!\ncdef\n'
+        assert binary.getvalue() == text.getvalue().encode('ascii')
+        assert batch.text() == text.getvalue()
+    
+    def test_long_passwords_and_blocks(self, monkeypatch):
+        """Тест записи длинных паролей и разбиения на блоки"""
+        monkeypatch.setattr('password_generator.PASSWORD_BATCH_BLOCK', 10)
+        batch = PasswordGenerator().generate_batch(7, 30, 'high')
+        out = io.StringIO()
+        batch.write(out)
+        assert out.getvalue().splitlines() == list(batch)
+        assert len(list(batch)) == 7
+    
+    def test_generate_batch(self):
+        """Тест что generate_batch возвращает пакет и он ведет себя как список"""
+        generator = PasswordGenerator()
+        batch = generator.generate_batch(1000, 12, 'very-high')
+        assert isinstance(batch, PasswordBatch)
+        assert batch.memory_bytes() == 12000
+        assert ['x'] + batch[:2] == ['x', batch[0], batch[1]]
+        assert pickle.loads(pickle.dumps(batch)) == batch
+        assert generator.generate_batch(3, 0, 'low') == ['', '', '']
+    
+    @pytest.mark.parametrize("make", [
+        lambda g, n: g.generate_policy_batch(n, 10, 'very-high', PasswordPolicy(1, 1, 1, 1, prefix='id-', suffix='!')),
+        lambda g, n: g.generate_policy_batch(n, 4, 'low', PasswordPolicy(prefix='ab', suffix='cd')),
+        lambda g, n: g.generate_unique_batch(n, 10, 'high', UniqueIndex()),
+        lambda g, n: g.generate_unique_batch(n, 10, 'high', UniqueIndex(), PasswordPolicy(prefix='x')),
+        lambda g, n: g.generate_pattern_batch(n, 'LLL-DDD'),
+        lambda g, n: g.generate_pattern_batch(n, 'abc'),
+    ])
+    @pytest.mark.parametrize("count", [0, 1, 50])
+    def test_other_batches(self, make, count):
+        """Тест что пакеты по политике, уникальные и по маске тоже PasswordBatch"""
+        batch = make(PasswordGenerator(), count)
+        assert isinstance(batch, PasswordBatch)
+        assert len(batch) == count
+        assert len({len(p) for p in batch}) <= 1
+    
+    def test_policy_prefix_must_be_ascii(self):
+        """Тест что префикс и суффикс политики — ASCII, как и весь пакет"""
+        with pytest.raises(ValueError, match="ASCII"):
+            PasswordPolicy(prefix='пароль-')
+        with pytest.raises(ValueError, match="ASCII"):
+            PasswordPolicy(suffix='№1')
+    
+    @pytest.mark.parametrize("use_numpy", [False, None])
+    def test_strengths(self, use_numpy):
+        """Тест оценки пакета по буферу без строк"""
+        generator = PasswordGenerator()
+        batch = generator.generate_batch(500, 7, 'very-high')
+        expected = [generator.calculate_strength(p) for p in batch]
+        assert list(generator.calculate_strength_batch(batch, use_numpy=use_numpy)) == expected
+        assert list(PasswordBatch(b'', 0, 2).strengths(use_numpy)) == [0, 0]
+    
+    def test_invalid(self):
+        """Тест ошибок размеров буфера"""
+        with pytest.raises(ValueError):
+            PasswordBatch(b'abc', 2, 2)
+        with pytest.raises(ValueError):
+            PasswordBatch(b'', 0)
+
+
+class TestComplexityRegistry:
+    """Тесты реестра уровней сложности"""
+    
+    @pytest.fixture
+    def generator(self):
+        return PasswordGenerator()
+    
+    def test_level_precomputed_tables(self, generator):
+        """Тест предвычисленных таблиц уровня"""
+        level = generator.get_complexity_by_name('very-high')
+        assert level.size == 94
+        assert level.alphabet == level.chars.encode('ascii')
+        assert level.threshold == 188
+        assert level.class_mask == CLASS_LOWER | CLASS_UPPER | CLASS_DIGIT | CLASS_PUNCT
+        assert len(level.table) == 256
+        assert level.reject == bytes(range(188, 256))
+    
+    def test_level_immutable(self, generator):
+        """Тест что уровень нельзя изменить"""
+        level = generator.get_complexity_by_name('low')
+        with pytest.raises(AttributeError):
+            level.chars = 'abc'
+        with pytest.raises(AttributeError):
+            level.extra = 1
+    
+    def test_level_pickle_roundtrip(self, generator):
+        """Тест что уровень передается в процессы-воркеры"""
+        level = generator.get_complexity_by_name('high')
+        restored = pickle.loads(pickle.dumps(level))
+        assert restored.chars == level.chars
+        assert restored.table == level.table
+    
+    def test_add_custom_complexity(self, generator):
+        """Тест регистрации собственного уровня"""
+        level = generator.add_custom_complexity('hex', 'Шестнадцатеричные цифры', '0123456789ABCDEF', 8)
+        assert generator.get_complexity_by_name('hex') is level
+        assert generator.get_complexity_by_index(4) is level
+        assert level.class_mask == CLASS_UPPER | CLASS_DIGIT
+        password = generator.generate_password(16, 'hex')
+        assert all(char in '0123456789ABCDEF' for char in password)
+        assert all(len(p) == 16 for p in generator.generate_batch(10, 16, 'hex'))
+    
+    def test_custom_complexity_not_shared(self, generator):
+        """Тест что собственные уровни не попадают в другие генераторы"""
+        generator.add_custom_complexity('digits', 'Цифры', string.digits, 6)
+        assert PasswordGenerator().get_complexity_by_name('digits') is None
+    
+    def test_exclude_ambiguous(self, generator):
+        """Тест исключения неоднозначных символов"""
+        level = generator.add_custom_complexity('clear', 'Без неоднозначных',
+                                                string.ascii_letters + string.digits, 8,
+                                                exclude_ambiguous=True)
+        assert level.size == 62 - len(AMBIGUOUS_CHARS)
+        assert not set(AMBIGUOUS_CHARS) & set(''.join(generator.generate_batch(100, 50, 'clear')))
+    
+    @pytest.mark.parametrize("name,chars", [
+        ('low', 'abc'),  # Имя уже занято
+        ('empty', ''),  # Пустой алфавит
+        ('cyrillic', 'абв'),  # Не ASCII
+    ])
+    def test_add_custom_complexity_invalid(self, generator, name, chars):
+        """Тест ошибок регистрации уровня"""
+        with pytest.raises(ValueError):
+            generator.add_custom_complexity(name, 'Описание', chars, 4)
+    
+    def test_duplicate_chars_removed(self, generator):
+        """Тест что повторы в алфавите не смещают распределение"""
+        level = generator.add_custom_complexity('dup', 'Повторы', 'aab', 4)
+        assert level.chars == 'ab'
+
+
+class TestPasswordPolicy:
+    """Тесты генерации по политике"""
+    
+    @pytest.fixture
+    def generator(self):
+        return PasswordGenerator()
+    
+    def test_minimums_guaranteed(self, generator):
+        """Тест что минимумы классов выполняются в каждом пароле"""
+        policy = PasswordPolicy(min_lower=1, min_upper=2, min_digits=3, min_punct=1)
+        passwords = generator.generate_policy_batch(2000, 10, 'very-high', policy)
+        assert len(passwords) == 2000
+        for password in passwords:
+            assert len(password) == 10
+            assert sum(c.islower() for c in password) >= 1
+            assert sum(c.isupper() for c in password) >= 2
+            assert sum(c.isdigit() for c in password) >= 3
+            assert sum(c in string.punctuation for c in password) >= 1
+    
+    def test_forbidden_prefix_suffix(self, generator):
+        """Тест запрещенных символов, префикса и суффикса"""
+        policy = PasswordPolicy(min_digits=2, forbidden=AMBIGUOUS_CHARS, prefix='id-', suffix='!')
+        for password in generator.generate_policy_batch(500, 16, 'very-high', policy):
+            assert len(password) == 16
+            assert password.startswith('id-') and password.endswith('!')
+            assert not set(AMBIGUOUS_CHARS) & set(password)
+            assert sum(c.isdigit() for c in password) >= 2
+    
+    def test_max_run(self, generator):
+        """Тест ограничения серий одинаковых символов, в том числе на стыке с префиксом"""
+        generator.add_custom_complexity('abc', 'Три буквы', 'abc', 1)
+        policy = PasswordPolicy(max_run=1, prefix='a', suffix='c')
+        for password in generator.generate_policy_batch(500, 20, 'abc', policy):
+            assert all(x != y for x, y in zip(password, password[1:]))
+    
+    def test_placement_unbiased(self, generator):
+        """Тест что обязательный символ равновероятно попадает в любую позицию"""
+        generator.add_custom_complexity('ab1', 'Буквы и цифра', 'ab1', 1)
+        policy = PasswordPolicy(min_digits=1, min_lower=3)
+        positions = [password.index('1')
+                     for password in generator.generate_policy_batch(8000, 4, 'ab1', policy)]
+        counts = [positions.count(i) for i in range(4)]
+        # Ожидается ~2000 на позицию
+        assert min(counts) > 1800
+        assert max(counts) < 2200
+    
+    def test_retry_attempts_exact(self, generator):
+        """Тест точного числа генераций при переборе против полного перечисления"""
+        generator.add_custom_complexity('ab12', 'Две буквы и две цифры', 'ab12', 1)
+        policy = PasswordPolicy(min_lower=1, min_digits=2)
+        accepted = sum(sum(c.islower() for c in p) >= 1 and sum(c.isdigit() for c in p) >= 2
+                       for p in map(''.join, itertools.product('ab12', repeat=5)))
+        assert generator.policy_retry_attempts(5, 'ab12', policy) == pytest.approx(4 ** 5 / accepted)
+        assert generator.policy_retry_attempts(
+            12, 'very-high', PasswordPolicy(1, 1, 1, 1)) == pytest.approx(1.4289, abs=1e-4)
+    
+    def test_retry_attempts_long_is_bound(self, generator, monkeypatch):
+        """Тест что для длинных паролей динамика не запускается и дается нижняя оценка"""
+        monkeypatch.setattr('password_generator.POLICY_ESTIMATE_MAX_LENGTH', 8)
+        _minimum_tables.clear()
+        policy = PasswordPolicy(1, 1, 1, 1, forbidden='O0lI1')
+        bound = generator.policy_retry_attempts(9, 'very-high', policy)
+        assert _minimum_tables == {}
+        assert bound == pytest.approx((94 / 89) ** 9)
+        monkeypatch.setattr('password_generator.POLICY_ESTIMATE_MAX_LENGTH', 9)
+        assert generator.policy_retry_attempts(9, 'very-high', policy) > bound
+    
+    def test_stream_and_workers(self, generator):
+        """Тест политики в потоковом режиме и в пуле процессов"""
+        policy = PasswordPolicy(min_punct=4)
+        for workers in (1, 2):
+            out = io.StringIO()
+            generator.stream_passwords(out, 300, 8, 'very-high', chunk_size=64,
+                                       workers=workers, policy=policy)
+            lines = out.getvalue().splitlines()
+            assert len(lines) == 300
+            assert all(sum(c in string.punctuation for c in line) >= 4 for line in lines)
+    
+    @pytest.mark.parametrize("length,complexity_name,options", [
+        (4, 'very-high', dict(min_digits=3, min_upper=2)),
+        (10, 'medium', dict(min_digits=1)),
+        (10, 'low', dict(forbidden=string.ascii_lowercase)),
+        (3, 'high', dict(prefix='abcd')),
+        (10, 'high', dict(prefix='aaa', max_run=2)),
+    ])
+    def test_unsatisfiable_policy(self, generator, length, complexity_name, options):
+        """Тест ошибок для невыполнимых политик"""
+        with pytest.raises(ValueError):
+            generator.generate_policy_batch(1, length, complexity_name, PasswordPolicy(**options))
+    
+    @pytest.mark.parametrize("options", [
+        dict(min_digits=-1), dict(max_run=0), dict(forbidden='!', suffix='!'),
+    ])
+    def test_invalid_policy(self, options):
+        """Тест проверки параметров политики"""
+        with pytest.raises(ValueError):
+            PasswordPolicy(**options)
+    
+    def test_policy_immutable_and_hashable(self):
+        """Тест неизменяемости политики и ее использования как ключа кэша"""
+        policy = PasswordPolicy(min_digits=1, forbidden='ba')
+        assert policy == PasswordPolicy(min_digits=1, forbidden='ab')
+        assert hash(policy) == hash(pickle.loads(pickle.dumps(policy)))
+        with pytest.raises(AttributeError):
+            policy.max_run = 3
+
+
+class TestKeyspace:
+    """Тесты точного подсчета пространства паролей"""
+    
+    @staticmethod
+    def brute_force(level, length, policy):
+        body = length - len(policy.prefix) - len(policy.suffix)
+        chars = [c for c in level.chars if c not in policy.forbidden]
+        if body < 0:
+            return 0
+        classes = {CLASS_LOWER: str.islower, CLASS_UPPER: str.isupper,
+                   CLASS_DIGIT: str.isdigit, CLASS_PUNCT: lambda c: c in string.punctuation}
+        total = 0
+        for body_chars in itertools.product(chars, repeat=body):
+            password = policy.prefix + ''.join(body_chars) + policy.suffix
+            if any(sum(map(classes[cls], password)) < need for cls, need in policy.minimums().items()):
+                continue
+            runs = [len(list(group)) for _, group in itertools.groupby(password)]
+            if policy.max_run is not None and max(runs, default=0) > policy.max_run:
+                continue
+            total += 1
+        return total
+    
+    def test_without_policy(self):
+        """Тест что без политики пространство равно size ** length"""
+        generator = PasswordGenerator()
+        assert generator.keyspace(12, 'very-high') == 94 ** 12
+        assert generator.entropy_bits(12, 'high') == pytest.approx(12 * math.log2(62))
+    
+    @pytest.mark.parametrize('length, options', [
+        (5, dict(min_lower=1, min_upper=1, min_digits=1)),
+        (6, dict(min_lower=2, min_punct=1, forbidden='b')),
+        (5, dict(max_run=1, prefix='a', suffix='a')),
+        (6, dict(min_digits=2, max_run=2, prefix='11', suffix='!')),
+        (4, dict(min_upper=2, max_run=1, forbidden='A', suffix='B')),
+        (3, dict(min_lower=4)),
+    ])
+    def test_matches_brute_force(self, length, options):
+        """Тест точного совпадения с полным перебором на малом алфавите"""
+        generator = PasswordGenerator()
+        generator.add_custom_complexity('tiny', 'Малый алфавит', 'abcAB12!?', 0)
+        policy = PasswordPolicy(**options)
+        level = generator.get_complexity_by_name('tiny')
+        assert generator.keyspace(length, 'tiny', policy) == self.brute_force(level, length, policy)
+    
+    def test_consistent_with_retry_attempts(self):
+        """Тест что доля подходящих паролей согласована с числом генераций перебором"""
+        generator = PasswordGenerator()
+        policy = PasswordPolicy(1, 1, 1, 1)
+        share = generator.keyspace(12, 'very-high', policy) / 94 ** 12
+        assert 1 / share == pytest.approx(generator.policy_retry_attempts(12, 'very-high', policy))
+    
+    def test_unsatisfiable(self):
+        """Тест нулевого пространства для невыполнимой политики"""
+        generator = PasswordGenerator()
+        assert generator.keyspace(12, 'low', PasswordPolicy(min_digits=1)) == 0
+        assert generator.keyspace(3, 'high', PasswordPolicy(prefix='abcd')) == 0
+        assert generator.keyspace(8, 'high', PasswordPolicy(max_run=1, prefix='aa')) == 0
+        assert generator.entropy_bits(12, 'low', PasswordPolicy(min_digits=1)) == 0.0
+        with pytest.raises(ValueError):
+            generator.keyspace(-1, 'high')
+    
+    def test_cached_tables(self):
+        """Тест что таблицы минимумов переиспользуются для меньших длин"""
+        generator = PasswordGenerator()
+        policy = PasswordPolicy(2, 2, 2, 2)
+        generator.keyspace(32, 'very-high', policy)
+        tables = dict(_minimum_tables)
+        generator.keyspace(16, 'very-high', policy)
+        assert _minimum_tables == tables
+
+
+class TestUniqueIndex:
+    """Тесты генерации без повторов"""
+    
+    @pytest.fixture
+    def generator(self):
+        return PasswordGenerator()
+    
+    def test_discard(self):
+        """Тест удаления значений без нарушения цепочек пробирования"""
+        index = UniqueIndex(capacity=64)
+        values = [f'v{i}' for i in range(40)]
+        index.filter(values)
+        index.discard(values[::3] + ['missing'])
+        kept = set(values) - set(values[::3])
+        assert len(index) == len(kept)
+        assert all((value in index) == (value in kept) for value in values)
+        assert index.filter(values) == values[::3]
+    
+    def test_policy_space_checked_up_front(self, generator):
+        """Тест что нехватка пространства политики видна до генерации и не тратит индекс"""
+        index = UniqueIndex()
+        with pytest.raises(ValueError, match="Существует меньше 30"):
+            generator.generate_unique_batch(30, 2, 'low', index, PasswordPolicy(prefix='a'))
+        assert len(index) == 0
+    
+    def test_unrelated_index_entries_not_counted(self, generator):
+        """Тест что значения другой длины в индексе не уменьшают пространство политики"""
+        index = UniqueIndex()
+        index.filter([f'other{i}' for i in range(5000)])
+        policy = PasswordPolicy(forbidden=string.ascii_lowercase[2:])
+        passwords = generator.generate_unique_batch(10, 12, 'low', index, policy)
+        assert len(set(passwords)) == 10
+        assert all(set(password) <= set('ab') for password in passwords)
+    
+    def test_failed_batch_not_recorded(self, generator, monkeypatch):
+        """Тест что пароли неудавшегося пакета не остаются в индексе"""
+        monkeypatch.setattr('password_generator.UNIQUE_MAX_STALLS', 2)
+        monkeypatch.setattr(generator, '_generate_chunk', lambda *args: ['aa', 'ab'] * 4)
+        index = UniqueIndex()
+        index.add('zz')
+        with pytest.raises(ValueError, match="исчерпано"):
+            generator.generate_unique_batch(5, 2, 'low', index)
+        assert len(index) == 1 and 'zz' in index and 'aa' not in index
+    
+    @pytest.mark.parametrize("bloom", [False, True])
+    def test_filter_and_contains(self, bloom):
+        """Тест отбраковки повторов и проверки принадлежности"""
+        index = UniqueIndex(capacity=16, bloom=bloom)
+        values = [f'code{i % 3000}' for i in range(5000)]
+        fresh = index.filter(values)
+        assert fresh == values[:3000]
+        assert len(index) == 3000
+        assert 'code42' in index and 'code3000' not in index
+        assert not index.add('code7')
+        assert index.add('code3000')
+        assert index.filter(['x', 'y', 'z'], limit=1) == ['x']
+        assert 'y' not in index
+    
+    @pytest.mark.parametrize("bloom", [False, True])
+    def test_save_load_roundtrip(self, tmp_path, bloom):
+        """Тест сохранения и загрузки индекса"""
+        path = str(tmp_path / 'codes.idx')
+        index = UniqueIndex(bloom=bloom)
+        index.filter(['alpha', 'beta', 'gamma'])
+        index.save(path)
+        loaded = UniqueIndex.load(path)
+        assert len(loaded) == 3
+        assert 'beta' in loaded and 'delta' not in loaded
+        assert loaded.filter(['alpha', 'delta']) == ['delta']
+        assert loaded.memory_bytes() == index.memory_bytes()
+    
+    def test_load_corrupted(self, tmp_path):
+        """Тест загрузки поврежденного индекса"""
+        path = tmp_path / 'codes.idx'
+        UniqueIndex().save(str(path))
+        path.write_bytes(path.read_bytes()[:-8])
+        with pytest.raises(ValueError):
+            UniqueIndex.load(str(path))
+    
+    def test_memory_budget(self):
+        """Тест ограничения памяти индекса"""
+        index = UniqueIndex(max_bytes=16 * 1024)
+        index.filter([str(i) for i in range(1000)])
+        with pytest.raises(ValueError):
+            index.filter([str(i) for i in range(1000, 2000)])
+    
+    def test_generate_unique_batch_exhausts_space(self, generator):
+        """Тест что выдаются все различные пароли, а затем сообщается об исчерпании"""
+        index = UniqueIndex()
+        passwords = generator.generate_unique_batch(26 * 26, 2, 'low', index)
+        assert len(set(passwords)) == 26 * 26
+        with pytest.raises(ValueError):
+            generator.generate_unique_batch(1, 2, 'low', index)
+    
+    def test_stream_unique(self, generator):
+        """Тест потоковой генерации без повторов"""
+        index = UniqueIndex()
+        out = io.StringIO()
+        generator.stream_passwords(out, 17000, 3, 'low', chunk_size=1000, unique=index)
+        lines = out.getvalue().splitlines()
+        assert len(lines) == len(set(lines)) == len(index) == 17000
+        with pytest.raises(ValueError):
+            generator.stream_passwords(io.StringIO(), 10, 3, 'low', workers=2, unique=index)
+
+
+class TestEntropySources:
+    """Тесты источников энтропии"""
+    
+    def test_seeded_reproducible(self):
+        """Тест воспроизводимости детерминированного источника"""
+        results = []
+        for _ in range(2):
+            generator = PasswordGenerator(SeededEntropy(42))
+            results.append((generator.generate_password(16, 'very-high'),
+                            generator.generate_batch(100, 12, 'high'),
+                            generator.generate_policy_batch(10, 12, 'very-high', PasswordPolicy(1, 1, 1, 1)),
+                            generator.generate_passphrase(4)))
+        assert results[0] == results[1]
+        other = PasswordGenerator(SeededEntropy(43)).generate_password(16, 'very-high')
+        assert other != results[0][0]
+    
+    def test_seeded_workers_reproducible(self):
+        """Тест что пакеты воркеров зависят только от зерна и номера пакета"""
+        outputs = []
+        for _ in range(2):
+            out = io.StringIO()
+            PasswordGenerator(SeededEntropy(7)).stream_passwords(out, 500, 10, 'high', fmt='jsonl',
+                                                                 chunk_size=100, workers=2)
+            outputs.append(sorted(out.getvalue().splitlines()))
+        assert outputs[0] == outputs[1]
+        assert len(outputs[0]) == 500
+    
+    @pytest.mark.parametrize("n", [0, 1, 50, 64, 1000])
+    def test_os_entropy_read(self, n):
+        """Тест чтения через буфер, на его границе и в обход буфера"""
+        source = OSEntropy(buffer_size=64)
+        chunks = [source.read(n) for _ in range(5)]
+        assert all(len(chunk) == n for chunk in chunks)
+        if n >= 16:
+            assert len(set(chunks)) == 5
+    
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason="нужен fork")
+    def test_os_entropy_fork(self):
+        """Тест что после fork дочерний процесс не повторяет байты родителя"""
+        source = OSEntropy()
+        source.read(16)
+        reader, writer = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(writer, source.read(32))
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert os.read(reader, 32) != source.read(32)
+    
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="нужен /proc")
+    def test_os_entropy_shares_descriptor(self):
+        """Тест что источники не открывают по дескриптору и пакеты берут общий источник"""
+        import password_generator
+        OSEntropy(buffer_size=64).read(8)
+        before = len(os.listdir('/proc/self/fd'))
+        for _ in range(100):
+            source = pickle.loads(pickle.dumps(OSEntropy().fork(1)))
+            OSEntropy(buffer_size=64).read(8)
+        assert len(os.listdir('/proc/self/fd')) == before
+        assert source is password_generator._default_entropy()
+    
+    def test_sources_by_name(self):
+        """Тест выбора источника по имени"""
+        assert isinstance(PasswordGenerator('secrets').entropy, SecretsEntropy)
+        assert isinstance(PasswordGenerator('os').entropy, OSEntropy)
+        assert len(PasswordGenerator('secrets').generate_password(20, 'low')) == 20
+        assert isinstance(pickle.loads(pickle.dumps(OSEntropy())), OSEntropy)
+        with pytest.raises(ValueError):
+            make_entropy_source('seeded')
+        with pytest.raises(ValueError):
+            PasswordGenerator('mt19937')
+
+
+class TestInstrumentation:
+    """Тесты инструментирования и профилирования"""
+    
+    def test_disabled_by_default(self):
+        """Тест что без stats=True ничего не собирается"""
+        generator = PasswordGenerator('secrets')
+        generator.generate_batch(10, 12, 'high')
+        assert generator.stats() == {}
+        assert generator.stats_summary() == ''
+        assert isinstance(generator.entropy, SecretsEntropy)
+    
+    def test_counters_and_timings(self):
+        """Тест счетчиков и гистограмм горячих участков"""
+        generator = PasswordGenerator(stats=True)
+        passwords = generator.generate_batch(1000, 16, 'very-high')
+        generator.calculate_strength(passwords[0])
+        generator.calculate_strength_batch(passwords, use_numpy=False)
+        generator.stream_passwords(io.StringIO(), 100, 8, 'low')
+        
+        stats = generator.stats()
+        counters, timings = stats['counters'], stats['timings']
+        assert counters['passwords'] == 1100
+        assert counters['scored'] == 1000
+        assert counters['written_chars'] == 900
+        assert counters['entropy_bytes'] >= 1000 * 16 + 100 * 8
+        assert counters['rejected_bytes'] > 0
+        for name in ('entropy_read', 'map', 'generate', 'score', 'score_batch', 'write'):
+            assert timings[name]['count'] >= 1
+            assert timings[name]['p50_us'] <= timings[name]['p99_us']
+        assert 'Статистика генератора' in generator.stats_summary()
+        
+        generator.stats(reset=True)
+        assert generator.stats() == {'counters': {}, 'timings': {}}
+    
+    def test_rejection_retries(self):
+        """Тест подсчета повторных чтений при нехватке байтов"""
+        stats = GeneratorStats()
+        level = PasswordGenerator().get_complexity_by_name('very-high')
+        chars = _sample_chars(level, 1000, read=lambda n: os.urandom(n // 4 + 1), stats=stats)
+        assert len(chars) == 1000
+        assert stats.counters['rejection_retries'] >= 3
+    
+    def test_histogram_percentiles(self):
+        """Тест корзин гистограммы по степеням двойки"""
+        histogram = Histogram()
+        for micros in [3] * 90 + [1000] * 10:
+            histogram.record(micros / 1e6)
+        assert histogram.percentile(0.5) == 4
+        assert histogram.percentile(0.99) == 1024
+        assert histogram.snapshot()['count'] == 100
+    
+    def test_profile_batch(self, tmp_path):
+        """Тест профилирования пакета с сохранением профиля"""
+        out = io.StringIO()
+        dump = tmp_path / 'batch.prof'
+        passwords = PasswordGenerator().profile_batch(1000, 12, 'high', dump=str(dump), out=out)
+        assert len(passwords) == 1000
+        assert dump.stat().st_size > 0
+        report = out.getvalue()
+        assert 'generate_batch' in report
+        assert 'Пик памяти' in report
+
+
+class TestPasswordPattern:
+    """Тесты генерации по маске"""
+    
+    def test_named_classes(self):
+        """Тест маски из именованных классов и литералов"""
+        passwords = PasswordGenerator().generate_pattern_batch(500, 'LLLL-DDDD-SSSS')
+        regex = re.compile(r'[A-Za-z]{4}-[0-9]{4}-[' + re.escape(string.punctuation) + ']{4}')
+        assert len(passwords) == 500
+        assert all(regex.fullmatch(p) for p in passwords)
+    
+    def test_regex_like_mask(self):
+        """Тест наборов, диапазонов, повторов и экранирования"""
+        generator = PasswordGenerator()
+        for password in generator.generate_pattern_batch(500, '[A-Z]{3}[0-9]{4}[!@#]'):
+            assert re.fullmatch(r'[A-Z]{3}[0-9]{4}[!@#]', password)
+        for password in generator.generate_pattern_batch(200, r'\L\{[^a-zA-Z0-9]{2}[a\-]'):
+            assert password[:3] == 'L{' + password[2] and password[2] in string.punctuation
+            assert password[3] in string.punctuation and password[4] in 'a-'
+        assert generator.generate_from_pattern('ab{3}') == 'abbb'
+    
+    def test_plan(self):
+        """Тест скомпилированного плана: длина, группы и энтропия"""
+        plan = compile_pattern('UUU-DD')
+        assert plan.length == 6
+        assert plan.template[3:4] == b'-'
+        assert plan.keyspace == 26 ** 3 * 10 ** 2
+        assert plan.entropy == pytest.approx(math.log2(26 ** 3 * 100))
+        assert sorted(len(positions) for _, positions in plan.groups) == [2, 3]
+        assert compile_pattern('D{1024}').keyspace == 10 ** 1024
+    
+    def test_uniform_positions(self):
+        """Тест равномерности символов на каждой позиции"""
+        passwords = PasswordGenerator().generate_pattern_batch(20000, 'DD[abcd]')
+        for p, size in ((0, 10), (1, 10), (2, 4)):
+            counts = collections.Counter(password[p] for password in passwords)
+            assert len(counts) == size
+            expected = 20000 / size
+            assert all(abs(n - expected) < 0.15 * expected for n in counts.values())
+    
+    def test_shortfall_top_up(self):
+        """Тест дочитывания энтропии при нехватке байтов после отбраковки"""
+        plan = compile_pattern('SSSS')
+        passwords = _make_pattern_passwords(plan, 100, read=lambda n: os.urandom(n // 8 + 1))
+        assert len(passwords) == 100
+        assert all(len(p) == 4 and set(p) <= set(string.punctuation) for p in passwords)
+    
+    @pytest.mark.parametrize('mask', ['', '[abc', '[]', 'D{x}', '{3}', 'a\\', '[z-a]', 'x{0}', 'Ж',
+                                      'D{3000000000}', 'DD{1024}', 'A' * 1025])
+    def test_invalid_masks(self, mask):
+        """Тест ошибок разбора маски"""
+        with pytest.raises(ValueError):
+            compile_pattern(mask)
+    
+    def test_cache(self):
+        """Тест LRU-кэша скомпилированных масок"""
+        _pattern_cache.clear()
+        first = compile_pattern('DDDD')
+        assert compile_pattern('DDDD') is first
+        for i in range(_PATTERN_CACHE_SIZE):
+            compile_pattern(f'D{{{i + 1}}}')
+        assert 'DDDD' not in _pattern_cache
+        assert len(_pattern_cache) == _PATTERN_CACHE_SIZE
+        assert compile_pattern('DDDD') is not first
+    
+    def test_stream(self):
+        """Тест потоковой записи по маске"""
+        out = io.StringIO()
+        PasswordGenerator().stream_pattern_passwords(out, 1000, 'UD', fmt='plain', chunk_size=300)
+        lines = out.getvalue().splitlines()
+        assert len(lines) == 1000
+        assert all(re.fullmatch('[A-Z][0-9]', line) for line in lines)
+
+
+class TestExport:
+    """Тесты экспорта записей с хэшами"""
+    
+    @staticmethod
+    def verify(password, encoded):
+        """Проверить хэш по его записи, как это делает Django"""
+        import hashlib
+        import base64
+        parts = encoded.split('$')
+        if parts[0] == 'pbkdf2_sha256':
+            _, iterations, salt, digest = parts
+            expected = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), int(iterations))
+        else:
+            _, n, salt, r, p, digest = parts
+            expected = hashlib.scrypt(password.encode(), salt=salt.encode(), n=int(n), r=int(r),
+                                      p=int(p), dklen=64)
+        return base64.b64decode(digest) == expected and len(salt) == 22
+    
+    def test_jsonl_pbkdf2(self):
+        """Тест записей jsonl с хэшами PBKDF2"""
+        out = io.StringIO()
+        PasswordGenerator().export_passwords(out, 20, 14, 'very-high', hash_name='pbkdf2',
+                                             hash_cost=100, chunk_size=7)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r['id'] for r in records] == list(range(1, 21))
+        assert all(self.verify(r['password'], r['hash']) for r in records)
+        assert all(r['hash'].startswith('pbkdf2_sha256$100$') for r in records)
+    
+    def test_csv_scrypt_parallel_order(self):
+        """Тест что хэширование пулом процессов сохраняет порядок записей"""
+        out = io.StringIO()
+        PasswordGenerator().export_passwords(out, 30, 10, 'high', fmt='csv', hash_name='scrypt',
+                                             hash_cost=16, workers=2, chunk_size=4)
+        lines = out.getvalue().splitlines()
+        assert lines[0] == 'id,password,hash'
+        rows = [line.split(',') for line in lines[1:]]
+        assert [int(row[0]) for row in rows] == list(range(1, 31))
+        assert all(self.verify(password, encoded) for _, password, encoded in rows)
+    
+    @pytest.mark.parametrize('cost', [2, 4])
+    def test_scrypt_smallest_cost(self, cost):
+        """Тест наименьших допустимых параметров scrypt"""
+        out = io.StringIO()
+        PasswordGenerator().export_passwords(out, 3, 10, 'high', hash_name='scrypt', hash_cost=cost)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert all(self.verify(r['password'], r['hash']) for r in records)
+    
+    def test_without_hash(self):
+        """Тест экспорта без хэшей с политикой и индексом без повторов"""
+        out = io.StringIO()
+        index = UniqueIndex()
+        PasswordGenerator().export_passwords(out, 500, 12, 'very-high', fmt='csv',
+                                             policy=PasswordPolicy(min_digits=3), unique=index)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        assert rows[0] == ['id', 'password']
+        passwords = [password for _, password in rows[1:]]
+        assert len(set(passwords)) == 500 and len(index) == 500
+        assert all(sum(c.isdigit() for c in p) >= 3 for p in passwords)
+    
+    @pytest.mark.parametrize('options', [
+        dict(fmt='xml'), dict(hash_name='md5'), dict(hash_name='scrypt', hash_cost=1000),
+        dict(hash_name='pbkdf2', hash_cost=0), dict(workers=0), dict(chunk_size=0),
+    ])
+    def test_invalid(self, options):
+        """Тест ошибок параметров экспорта"""
+        with pytest.raises(ValueError):
+            PasswordGenerator().export_passwords(io.StringIO(), 10, 12, 'high', **options)
+
+
+class TestEntropyEstimator:
+    """Тесты оценки энтропии с учетом шаблонов"""
+    
+    @pytest.fixture
+    def generator(self):
+        return PasswordGenerator()
+    
+    @pytest.mark.parametrize("password", [
+        'Password1!',  # Словарное слово + цифра + символ
+        'P@ssw0rd',  # l33t-замены
+        'drowssap',  # Перевернутое слово
+        'qwertyuiop',  # Прогулка по клавиатуре
+        'aaaaaaaaaa',  # Повтор
+        'abcdefghij',  # Последовательность
+        '1qaz2wsx3edc',  # Вертикальная прогулка
+    ])
+    def test_patterns_are_weak(self, generator, password):
+        """Тест что шаблонные пароли получают низкую оценку"""
+        assert estimate_entropy(password) < 30
+        assert generator.calculate_strength(password, mode='entropy') <= 2
+    
+    def test_random_password_is_strong(self, generator):
+        """Тест что случайный пароль оценивается по размеру алфавита"""
+        password = 'Xk9#mQ2$vL7!'
+        assert estimate_entropy(password) == pytest.approx(12 * math.log2(95))
+        assert generator.calculate_strength(password, mode='entropy') == 7
+    
+    def test_entropy_strength_lower_than_classes(self, generator):
+        """Тест что 'Password1!' перестает считаться сильным"""
+        assert generator.calculate_strength('Password1!') == 6
+        assert generator.calculate_strength('Password1!', mode='entropy') == 1
+    
+    def test_empty_password(self, generator):
+        """Тест оценки пустого пароля"""
+        assert estimate_entropy('') == 0
+        assert generator.calculate_strength('', mode='entropy') == 0
+    
+    def test_batch_and_invalid_mode(self, generator):
+        """Тест пакетной оценки в режиме entropy и неверного режима"""
+        passwords = ['Password1!', 'Xk9#mQ2$vL7!']
+        assert list(generator.calculate_strength_batch(passwords, mode='entropy')) == [1, 7]
+        with pytest.raises(ValueError, match="режим"):
+            generator.calculate_strength('abc', mode='magic')
+    
+    @pytest.mark.parametrize("use_numpy", [False, None])
+    def test_batch_matches_single(self, generator, use_numpy):
+        """Тест что пакетная оценка совпадает с поштучной, в том числе
+        для шаблонов на стыке паролей и в конце пароля"""
+        passwords = ['', 'ab', 'xyz', 'q', 'we', 'Pass', 'xxPass', 'Xk9#mQ2$vL7!qwe',
+                     'Пароль123', 'p@ss', 'p@s', '\x00\x01\x02', ' ~~~']
+        passwords += list(generator.generate_batch(500, 12, 'very-high'))
+        expected = [generator.calculate_strength(p, mode='entropy') for p in passwords]
+        scores = generator.calculate_strength_batch(passwords, use_numpy=use_numpy, mode='entropy')
+        assert list(scores) == expected
+    
+        batch = generator.generate_batch(500, 8, 'very-high')
+        expected = [generator.calculate_strength(p, mode='entropy') for p in batch]
+        assert list(generator.calculate_strength_batch(batch, use_numpy=use_numpy, mode='entropy')) == expected
+    
+    def test_trigram_prefilter(self):
+        """Тест что пароль без троек-шаблонов оценивается перебором без поиска"""
+        assert _find_matches('Xk9#mQ2$vL7!') == []
+        assert [m[:2] for m in _find_matches('Xk9#mQ2$vL7!pass')] == [(12, 16), (12, 16)]
+        # Не-ASCII пароль проверяется со всех позиций
+        assert (6, 9, 12) in _find_matches('Пароль123')
+    
+    def test_index_loaded_lazily(self):
+        """Тест что словари не загружаются при импорте модуля"""
+        result = subprocess.run([
+            sys.executable, '-c',
+            'import password_generator as pg; print(pg._pattern_index_cache is None)'
+        ], capture_output=True, text=True)
+        assert result.stdout.strip() == 'True'
+
+
+class TestPassphrase:
+    """Тесты парольных фраз и словаря в mmap"""
+    
+    @pytest.fixture
+    def generator(self):
+        return PasswordGenerator()
+    
+    @pytest.fixture
+    def words(self):
+        with open(os.path.join(DATA_DIR, 'wordlist.txt'), encoding='utf-8') as f:
+            return f.read().split()
+    
+    def test_wordlist_in_sync(self, tmp_path, words):
+        """Тест что собранный data/wordlist.bin соответствует wordlist.txt"""
+        target = tmp_path / 'wordlist.bin'
+        assert build_wordlist(os.path.join(DATA_DIR, 'wordlist.txt'), target) == len(words)
+        with open(os.path.join(DATA_DIR, 'wordlist.bin'), 'rb') as f:
+            assert target.read_bytes() == f.read()
+    
+    def test_wordlist_random_access(self, tmp_path):
+        """Тест доступа к словам по номеру, включая не-ASCII"""
+        source = tmp_path / 'words.txt'
+        source.write_text('alpha\nбета\n\ngamma\nalpha\n', encoding='utf-8')
+        build_wordlist(source, tmp_path / 'words.bin')
+        wordlist = WordList(tmp_path / 'words.bin')
+        try:
+            assert len(wordlist) == 3
+            assert [wordlist[i] for i in range(3)] == ['alpha', 'бета', 'gamma']
+            assert wordlist.take([2, 0, 1]) == ['gamma', 'alpha', 'бета']
+            with pytest.raises(IndexError):
+                wordlist[3]
+        finally:
+            wordlist.close()
+    
+    def test_wordlist_corrupted(self, tmp_path):
+        """Тест ошибки при поврежденном файле словаря"""
+        path = tmp_path / 'broken.bin'
+        path.write_bytes(b'NOPE\x00\x00\x00\x00')
+        with pytest.raises(ValueError, match="поврежден"):
+            WordList(path)
+    
+    def test_generate_passphrase(self, generator, words):
+        """Тест что фраза состоит из заданного числа слов словаря"""
+        known = set(words)
+        passphrase = generator.generate_passphrase(words=5, separator=' ')
+        parts = passphrase.split(' ')
+        assert len(parts) == 5
+        assert all(part in known for part in parts)
+    
+    def test_generate_passphrase_batch(self, generator):
+        """Тест пакетной генерации фраз"""
+        passphrases = generator.generate_passphrase_batch(500, words=6)
+        assert len(passphrases) == 500
+        assert len(set(passphrases)) == 500
+        assert all(p.count('-') == 5 for p in passphrases)
+        assert generator.generate_passphrase_batch(0) == []
+    
+    def test_passphrase_entropy(self, generator, words):
+        """Тест энтропии фразы"""
+        assert generator.passphrase_entropy(6) == pytest.approx(6 * math.log2(len(words)))
+    
+    def test_sample_indices_unbiased(self):
+        """Тест равномерности выбора номеров слов"""
+        indices = _sample_indices(3, 30000)
+        assert all(0 <= i < 3 for i in indices)
+        assert all(9000 < indices.count(i) < 11000 for i in range(3))
+
+
+class TestPasswordService:
+    """Тесты asyncio-сервиса"""
+    
+    @staticmethod
+    async def _request(port, target):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f"GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body)
+    
+    def test_http_endpoints(self):
+        """Тест выдачи паролей, ошибок и статистики по HTTP"""
+        async def scenario():
+            service = PasswordService(pool_size=8)
+            server = await service.start('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                status, body = await self._request(port, '/password?length=16&complexity=very-high&count=3')
+                assert status == 200
+                assert [len(p) for p in body['passwords']] == [16, 16, 16]
+                
+                status, body = await self._request(port, '/password?complexity=invalid')
+                assert status == 400
+                assert 'Неизвестный уровень сложности' in body['error']
+                
+                status, _ = await self._request(port, '/missing')
+                assert status == 404
+                
+                status, body = await self._request(port, '/stats')
+                assert status == 200
+                assert body['requests'] == 3
+                assert body['p99_ms'] >= body['p50_ms'] >= 0
+        
+        asyncio.run(scenario())
+    
+    def test_requests_are_coalesced(self):
+        """Тест объединения одновременных запросов в один пакет"""
+        async def scenario():
+            service = PasswordService(pool_size=0)
+            results = await asyncio.gather(*(service.get_passwords(12, 'high', 2) for _ in range(50)))
+            passwords = [p for result in results for p in result]
+            assert len(set(passwords)) == 100
+            assert service.batches == 1
+        
+        asyncio.run(scenario())
+    
+    def test_flush_runs_in_executor_and_reports_errors(self, monkeypatch):
+        """Тест что пакет генерируется вне цикла событий, а ошибка доходит до запросов"""
+        import threading
+        
+        async def scenario():
+            service = PasswordService(pool_size=0)
+            threads = []
+            generate = service.generator._generate_chunk
+            
+            def record(*args):
+                threads.append(threading.current_thread())
+                return generate(*args)
+            
+            monkeypatch.setattr(service.generator, '_generate_chunk', record)
+            assert len(await service.get_passwords(12, 'high', 3)) == 3
+            assert threads and threads[0] is not threading.main_thread()
+            
+            def fail(*args):
+                raise MemoryError("нет памяти")
+            
+            monkeypatch.setattr(service.generator, '_generate_chunk', fail)
+            results = await asyncio.wait_for(asyncio.gather(
+                *(service.get_passwords(12, 'high') for _ in range(3)), return_exceptions=True), 5)
+            assert all(isinstance(result, MemoryError) for result in results)
+            assert service._pending == {}
+            status, body = await service._route('GET', '/password?length=8')
+            assert status == 500 and 'нет памяти' in body['error']
+        
+        asyncio.run(scenario())
+    
+    def test_pool_serves_and_refills(self):
+        """Тест выдачи из пула и фонового пополнения"""
+        async def scenario():
+            service = PasswordService(pool_size=10)
+            await service.get_passwords(12, 'high')
+            assert service.stats()['pools'] == {'high:12': 10}
+            for _ in range(6):
+                await service.get_passwords(12, 'high')
+            assert service.pool_hits == 6
+            await asyncio.gather(*service._tasks)
+            assert service.stats()['pools'] == {'high:12': 10}
+            assert service.batches == 1
+        
+        asyncio.run(scenario())
+    
+    def test_unix_socket(self, tmp_path):
+        """Тест работы через Unix-сокет"""
+        if not hasattr(asyncio, 'open_unix_connection'):
+            pytest.skip('Unix-сокеты недоступны')
+        path = str(tmp_path / 'service.sock')
+        
+        async def scenario():
+            service = PasswordService()
+            server = await service.start(unix_path=path)
+            async with server:
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b"GET /password?length=8&complexity=low HTTP/1.1\r\nConnection: close\r\n\r\n")
+                response = await reader.read()
+                writer.close()
+                assert b'200 OK' in response
+        
+        asyncio.run(scenario())
+
+
+class TestAudit:
+    """Тесты аудита файла паролей"""
+    
+    LINES = [b'abc\r', b'Password1!', b'', b'', 'пароль'.encode('utf-8'), b'Ab1!Ab1!Ab1!', b'zz']
+    
+    @pytest.fixture
+    def generator(self):
+        return PasswordGenerator()
+    
+    @pytest.fixture
+    def password_file(self, tmp_path):
+        path = tmp_path / 'passwords.txt'
+        path.write_bytes(b'\n'.join(self.LINES))
+        return path
+    
+    @pytest.mark.parametrize("use_numpy", [False, True])
+    @pytest.mark.parametrize("window_size", [3, 1024])
+    def test_audit_file(self, generator, password_file, use_numpy, window_size):
+        """Тест гистограммы и смещений слабых паролей при разных окнах"""
+        if use_numpy:
+            pytest.importorskip('numpy')
+        weak = []
+        histogram = generator.audit_file(password_file, min_strength=5,
+                                         on_weak=lambda offset, score: weak.append((offset, score)),
+                                         use_numpy=use_numpy, window_size=window_size)
+        expected = [0] * 9
+        for line in self.LINES:
+            password = line.decode('utf-8').rstrip('\r')
+            if password:
+                expected[generator.calculate_strength(password)] += 1
+        assert histogram == expected
+        assert weak == [(0, 1), (18, 2), (44, 1)]
+    
+    def test_audit_matches_strength_model(self, generator, tmp_path):
+        """Тест что аудит совпадает с calculate_strength на случайных паролях"""
+        passwords = generator.generate_batch(500, 9, 'very-high')
+        path = tmp_path / 'generated.txt'
+        path.write_text('\n'.join(passwords) + '\n')
+        expected = [0] * 9
+        for password in passwords:
+            expected[generator.calculate_strength(password)] += 1
+        assert generator.audit_file(path) == expected
+    
+    def test_audit_empty_file(self, generator, tmp_path):
+        """Тест аудита пустого файла"""
+        path = tmp_path / 'empty.txt'
+        path.write_bytes(b'')
+        assert generator.audit_file(path) == [0] * 9
+
+
 class TestPasswordGeneratorIntegration:
     """Интеграционные тесты"""
     
@@ -147,6 +1292,20 @@ class TestPasswordGeneratorIntegration:
         unique_passwords = set(passwords)
         assert len(unique_passwords) == 10  # Все пароли должны быть уникальными
     
+    def test_batch_passwords_unique(self, generator):
+        """Тест что пакетная генерация дает уникальные пароли"""
+        passwords = generator.generate_batch(1000, 12, 'high')
+        assert len(set(passwords)) == 1000
+    
+    def test_batch_distribution_unbiased(self, generator):
+        """Тест равномерности отображения байтов на алфавит"""
+        chars = string.ascii_letters + string.digits + string.punctuation
+        sample = ''.join(generator.generate_batch(1, 94 * 1000, 'very-high'))
+        counts = [sample.count(char) for char in chars]
+        # При равномерном распределении ожидается ~1000 на символ
+        assert min(counts) > 800
+        assert max(counts) < 1200
+    
     def test_password_randomness(self, generator):
         """Тест случайности генерации (статистический)"""
         passwords = [generator.generate_password(100, 'very-high') for _ in range(5)]